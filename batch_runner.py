@@ -0,0 +1,325 @@
+"""
+batch_runner.py - Runs compute_statistics.py, convert_numbers.py or word_count.py over
+many input files.
+
+Inputs are files, directories (every file directly inside them) or glob patterns. Each
+input is processed in its own worker process, with at most --jobs inputs in flight, so
+many small files keep all the cores busy. Every input gets its own results file in the
+output directory, named after the input (data.txt -> data.StatisticsResults.txt), plus a
+.log file with what the tool printed. A run that raises an exception is reported with the
+error status and its traceback in the .log file; the other runs are not affected. An
+aggregated summary of all the runs is printed and written to BatchSummary.json.
+
+With --cache-dir the workers share a result cache (see result_cache.py): the inputs that
+did not change since an earlier batch with the same options are not processed again, and
+the summary reports the cache hits and misses.
+
+Usage:
+python batch_runner.py statistics "data/*.txt" --output-dir results
+python batch_runner.py convert data/ --output-dir results --jobs 8 --bits 32
+python batch_runner.py wordcount books/ --output-dir results --top 100
+python batch_runner.py statistics "data/*.txt" --output-dir results --cache-dir cache
+"""
+import argparse
+import asyncio
+import contextlib
+import glob
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import compute_statistics
+import convert_numbers
+import word_count
+from result_cache import (DEFAULT_MAX_BYTES, ResultCache,
+                          add_arguments as add_cache_arguments)
+
+# Name of the results file of each tool, used as the suffix of the per-input files.
+RESULT_NAMES = {
+    'statistics': "StatisticsResults",
+    'convert': "ConvertionResults",
+    'wordcount': "WordCountResults",
+}
+
+SUMMARY_FILE = "BatchSummary.json"
+
+
+def expand_inputs(patterns):
+    """
+    Expands files, directories and glob patterns into a list of files.
+
+     :param patterns: Iterable of paths or glob patterns.
+     :return: Sorted list of distinct file paths; directories contribute the
+              files they contain directly.
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            paths = glob.glob(pattern) or [pattern]
+        files.extend(path for path in paths if not os.path.isdir(path))
+    return sorted(set(files))
+
+
+def output_paths(input_files, tool, output_dir):
+    """
+    Chooses the results file of every input, so inputs with the same name in
+    different directories do not overwrite each other.
+
+     :param input_files: List of input file paths.
+     :param tool: 'statistics', 'convert' or 'wordcount'.
+     :param output_dir: Directory of the results files.
+     :return: List of result file paths, in the order of input_files.
+    """
+    used_names = set()
+    paths = []
+    for input_file in input_files:
+        stem = os.path.splitext(os.path.basename(input_file))[0]
+        name = stem
+        copy = 1
+        while name in used_names:
+            copy += 1
+            name = f"{stem}-{copy}"
+        used_names.add(name)
+        paths.append(os.path.join(output_dir, f"{name}.{RESULT_NAMES[tool]}.txt"))
+    return paths
+
+
+def run_tool(tool, input_file, output_file, options, summary, result_cache=None):
+    """
+    Runs one tool over one input, adding its totals to the run summary.
+
+     :param tool: 'statistics', 'convert' or 'wordcount'.
+     :param input_file: Path of the input file.
+     :param output_file: Path of the results file.
+     :param options: Dictionary of tool options.
+     :param summary: Dictionary of the run summary, updated in place.
+     :param result_cache: Optional ResultCache.
+     :return: True if the tool produced results.
+    """
+    if tool == 'statistics':
+        statistic_data = compute_statistics.compute_statistics(
+            input_file, stream=options.get('stream', False),
+            approximate=options.get('approximate', False),
+            percentiles=options.get('percentiles', ()),
+            output_file=output_file, result_cache=result_cache)
+        if statistic_data is None:
+            return False
+        summary['records'] = statistic_data['total_records']
+        summary['mean'] = statistic_data['mean']
+        return True
+    if tool == 'convert':
+        counts = convert_numbers.convert_file(
+            input_file, output_file, bits=options.get('bits'), echo="summary",
+            result_cache=result_cache)
+        if not counts['records']:
+            return False
+        summary['records'] = counts['records']
+        summary['invalid'] = counts['invalid']
+        if 'out_of_range' in counts:
+            summary['out_of_range'] = counts['out_of_range']
+        return True
+
+    cache_key = cached = None
+    if result_cache is not None:
+        cache_key = word_count.result_cache_key(result_cache, input_file, options.get('top'))
+        cached = result_cache.get(cache_key, output_file) if cache_key else None
+    if cached is not None:
+        summary['distinct_words'] = cached['distinct_words']
+        return True
+    start = time.time()
+    words = word_count.count_words(input_file,
+                                   tokenizer=options.get('tokenizer', "simple"),
+                                   top=options.get('top'),
+                                   store=options.get('store', "dict"))
+    if words is None:
+        return False
+    word_count.save_results(words, time.time() - start, output_file)
+    summary['distinct_words'] = len(words)
+    if cache_key:
+        result_cache.put(cache_key, {'distinct_words': len(words)},
+                         input_file, output_file)
+    return True
+
+
+def run_job(tool, input_file, output_file, options):
+    """
+    Runs one tool over one input. It is executed in a worker process. An
+    exception raised by the tool fails only this run: its traceback is written
+    to the log and the status is 'error'.
+
+     :param tool: 'statistics', 'convert' or 'wordcount'.
+     :param input_file: Path of the input file.
+     :param output_file: Path of the results file; the tool output is written
+                         next to it with the .log extension.
+     :param options: Dictionary of tool options.
+     :return: Dictionary with the outcome of the run.
+    """
+    start_time = time.perf_counter()
+    summary = {'tool': tool, 'input': input_file, 'output': output_file}
+    log_file = os.path.splitext(output_file)[0] + ".log"
+    result_cache = None
+    succeeded = False
+    with open(log_file, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        try:
+            if options.get('cache_dir'):
+                result_cache = ResultCache(options['cache_dir'],
+                                           options.get('cache_max_bytes', DEFAULT_MAX_BYTES))
+            succeeded = run_tool(tool, input_file, output_file, options, summary,
+                                 result_cache)
+        except Exception as error:  # pylint: disable=broad-except
+            traceback.print_exc(file=log)
+            summary['error'] = f"{type(error).__name__}: {error}"
+    if result_cache is not None:
+        summary['cache_hits'] = result_cache.hits
+        summary['cache_misses'] = result_cache.misses
+    summary['status'] = "ok" if succeeded else "error"
+    summary['log'] = log_file
+    summary['elapsed_time'] = time.perf_counter() - start_time
+    return summary
+
+
+async def run_batch(tool, input_files, output_dir, options, jobs):
+    """
+    Runs a tool over every input, with at most `jobs` inputs in flight.
+
+     :param tool: 'statistics', 'convert' or 'wordcount'.
+     :param input_files: List of input file paths.
+     :param output_dir: Directory of the results files.
+     :param options: Dictionary of tool options.
+     :param jobs: Number of worker processes.
+     :return: List of run summaries, in the order of input_files.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(jobs)
+
+    async def run_one(input_file, output_file):
+        async with semaphore:
+            start_time = time.perf_counter()
+            try:
+                summary = await loop.run_in_executor(executor, run_job, tool, input_file,
+                                                     output_file, options)
+            except Exception as error:  # pylint: disable=broad-except
+                # The worker could not run the job at all, for example the log
+                # file could not be created or the worker process died.
+                summary = {'tool': tool, 'input': input_file, 'output': output_file,
+                           'status': "error", 'error': f"{type(error).__name__}: {error}",
+                           'elapsed_time': time.perf_counter() - start_time}
+        print(f"[{summary['status']}] {input_file} -> {output_file} "
+              f"({summary['elapsed_time']:.3f} s)")
+        return summary
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return await asyncio.gather(*(
+            run_one(input_file, output_file) for input_file, output_file
+            in zip(input_files, output_paths(input_files, tool, output_dir))))
+
+
+def aggregate(summaries, elapsed_time):
+    """
+    Builds the aggregated summary of a batch.
+
+     :param summaries: List of run summaries returned by run_job.
+     :param elapsed_time: Wall time of the whole batch in seconds.
+     :return: Dictionary with the totals and the individual runs.
+    """
+    succeeded = [summary for summary in summaries if summary['status'] == "ok"]
+    totals = {
+        'files': len(summaries),
+        'succeeded': len(succeeded),
+        'failed': len(summaries) - len(succeeded),
+        'elapsed_time': elapsed_time,
+        'cpu_time': sum(summary['elapsed_time'] for summary in summaries),
+    }
+    for key in ('records', 'invalid', 'out_of_range', 'distinct_words'):
+        if any(key in summary for summary in succeeded):
+            totals[key] = sum(summary.get(key, 0) for summary in succeeded)
+    for key in ('cache_hits', 'cache_misses'):
+        if any(key in summary for summary in summaries):
+            totals[key] = sum(summary.get(key, 0) for summary in summaries)
+    return {'totals': totals, 'runs': summaries}
+
+
+def main():
+    """
+    Parses the command line and runs the batch.
+    """
+    parser = argparse.ArgumentParser(
+        prog="batch_runner.py", description="Run one of the tools over many input files.")
+    parser.add_argument("tool", choices=sorted(RESULT_NAMES), help="Tool to run.")
+    parser.add_argument("inputs", nargs="+",
+                        help="Input files, directories or glob patterns.")
+    parser.add_argument("--output-dir", default="results",
+                        help="Directory of the results files (default 'results').")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Number of inputs processed at the same time "
+                             "(default the number of CPUs).")
+    parser.add_argument("--stream", action="store_true",
+                        help="statistics: read the inputs line by line; the exact median "
+                             "still keeps every value.")
+    parser.add_argument("--approximate", action="store_true",
+                        help="statistics: approximate the median with a KLL sketch.")
+    parser.add_argument("--percentiles", nargs="+",
+                        type=compute_statistics.percentile_argument, default=[],
+                        help="statistics: percentiles (0-100) to report.")
+    parser.add_argument("--bits", type=int,
+                        help="convert: width of the two's complement representations.")
+    parser.add_argument("--tokenizer", choices=["simple", "fast"], default="simple",
+                        help="wordcount: tokenizer used.")
+    parser.add_argument("--top", type=int, metavar="K",
+                        help="wordcount: only save the K most frequent words.")
+    parser.add_argument("--store", choices=["dict", "compact"], default="dict",
+                        help="wordcount: counts container.")
+    add_cache_arguments(parser)
+    arguments = parser.parse_args()
+    if arguments.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if arguments.bits is not None and arguments.bits < 1:
+        parser.error("--bits must be at least 1")
+    if arguments.top is not None and arguments.top < 1:
+        parser.error("--top must be at least 1")
+
+    input_files = expand_inputs(arguments.inputs)
+    if not input_files:
+        print("Error: No input files found.")
+        return
+    os.makedirs(arguments.output_dir, exist_ok=True)
+    options = {
+        'stream': arguments.stream,
+        'approximate': arguments.approximate,
+        'percentiles': tuple(arguments.percentiles),
+        'bits': arguments.bits,
+        'tokenizer': arguments.tokenizer,
+        'top': arguments.top,
+        'store': arguments.store,
+        'cache_dir': arguments.cache_dir,
+        'cache_max_bytes': arguments.cache_max_bytes,
+    }
+
+    start_time = time.perf_counter()
+    summaries = asyncio.run(run_batch(arguments.tool, input_files, arguments.output_dir,
+                                      options, min(arguments.jobs, len(input_files))))
+    batch_summary = aggregate(summaries, time.perf_counter() - start_time)
+
+    summary_file = os.path.join(arguments.output_dir, SUMMARY_FILE)
+    with open(summary_file, "w", encoding="utf-8") as file:
+        json.dump(batch_summary, file, indent=2)
+
+    totals = batch_summary['totals']
+    print(f"Files: {totals['files']}, succeeded: {totals['succeeded']}, "
+          f"failed: {totals['failed']}")
+    for key in ('records', 'invalid', 'out_of_range', 'distinct_words'):
+        if key in totals:
+            print(f"Total {key.replace('_', ' ')}: {totals[key]}")
+    print(f"Elapsed time: {totals['elapsed_time']:.3f} s "
+          f"(sum of the runs {totals['cpu_time']:.3f} s)")
+    if 'cache_hits' in totals:
+        print(f"Result cache hits: {totals['cache_hits']}, misses: {totals['cache_misses']}")
+    print(f"Summary saved to {summary_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+generators.py - Deterministic synthetic inputs for the benchmarks.
+
+Numeric files have one integer per line, with a configurable rate of invalid rows, rate
+of values repeated from earlier rows and magnitude range, so they are valid inputs for
+both compute_statistics.py and convert_numbers.py. Text corpora draw their words from a
+vocabulary with Zipfian frequencies, like natural language text, for word_count.py. The
+same parameters and seed always produce the same file, and files are written in chunks,
+so very large inputs do not need to fit in memory.
+
+Usage:
+python benchmarks/generators.py numbers numbers.txt --rows 1000000 --invalid-rate 0.01
+python benchmarks/generators.py text corpus.txt --rows 1000000 --vocabulary 50000
+"""
+import argparse
+import itertools
+import os
+import random
+
+# Number of rows generated and written at a time.
+CHUNK_ROWS = 10000
+
+# Invalid records mixed into the numeric files.
+INVALID_RECORDS = ("abc", "12x", "1.2.3", "--4", "n/a", "0x1G")
+
+# Words written on each line of the text corpora.
+WORDS_PER_LINE = 12
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def numeric_rows(rows, invalid_rate=0.0, duplicate_rate=0.0, magnitude=10 ** 6, seed=0):
+    """
+    Generates the records of a numeric file.
+
+     :param rows: Number of records.
+     :param invalid_rate: Fraction of records that are not valid integers.
+     :param duplicate_rate: Fraction of valid records that repeat an earlier value.
+     :param magnitude: Values are drawn uniformly from [-magnitude, magnitude].
+     :param seed: Seed of the random generator.
+     :return: Generator of the records as strings.
+    """
+    generator = random.Random(seed)
+    seen_values = []
+    for _ in range(rows):
+        draw = generator.random()
+        if draw < invalid_rate:
+            yield generator.choice(INVALID_RECORDS)
+        elif seen_values and draw < invalid_rate + duplicate_rate:
+            yield str(generator.choice(seen_values))
+        else:
+            value = generator.randint(-magnitude, magnitude)
+            # A bounded pool of earlier values keeps memory constant.
+            if len(seen_values) < 4096:
+                seen_values.append(value)
+            yield str(value)
+
+
+def zipf_vocabulary(size, seed=0):
+    """
+    Generates distinct lowercase words of 2 to 10 letters.
+
+     :param size: Number of words.
+     :param seed: Seed of the random generator.
+     :return: List of words; the first ones are the most frequent.
+    """
+    generator = random.Random(seed)
+    words = set()
+    vocabulary = []
+    while len(vocabulary) < size:
+        word = "".join(generator.choice(LETTERS) for _ in range(generator.randint(2, 10)))
+        if word not in words:
+            words.add(word)
+            vocabulary.append(word)
+    return vocabulary
+
+
+def zipf_words(total_words, vocabulary_size=50000, exponent=1.1, seed=0):
+    """
+    Generates the words of a text corpus; the word of rank r appears with a
+    frequency proportional to 1 / r ** exponent.
+
+     :param total_words: Number of words.
+     :param vocabulary_size: Number of distinct words available.
+     :param exponent: Exponent of the Zipf distribution.
+     :param seed: Seed of the random generator.
+     :return: Generator of words.
+    """
+    vocabulary = zipf_vocabulary(vocabulary_size, seed)
+    cumulative_weights = list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, vocabulary_size + 1)))
+    generator = random.Random(seed + 1)
+    for start in range(0, total_words, CHUNK_ROWS):
+        yield from generator.choices(vocabulary, cum_weights=cumulative_weights,
+                                     k=min(CHUNK_ROWS, total_words - start))
+
+
+def write_lines(file_name, lines, items_per_line=1):
+    """
+    Writes the generated items to a file in chunks.
+
+     :param file_name: Name of the file to write.
+     :param lines: Iterable of strings.
+     :param items_per_line: Items joined with a space on each line.
+    """
+    with open(file_name, "w", encoding="utf-8") as file:
+        items = iter(lines)
+        while True:
+            chunk = list(itertools.islice(items, CHUNK_ROWS * items_per_line))
+            if not chunk:
+                break
+            file.write("\n".join(" ".join(chunk[start:start + items_per_line])
+                                 for start in range(0, len(chunk), items_per_line)))
+            file.write("\n")
+
+
+def numeric_file(directory, rows, invalid_rate=0.0, duplicate_rate=0.0, magnitude=10 ** 6,
+                 seed=0):
+    """
+    Returns the path of a numeric file, generating it if it does not exist yet.
+
+     :param directory: Directory where the generated files are kept.
+     :return: Path of the file. The other parameters are those of numeric_rows.
+    """
+    file_name = os.path.join(directory, f"numbers-{rows}-i{invalid_rate:g}-d{duplicate_rate:g}"
+                                        f"-m{magnitude}-s{seed}.txt")
+    if not os.path.exists(file_name):
+        write_lines(file_name, numeric_rows(rows, invalid_rate, duplicate_rate, magnitude, seed))
+    return file_name
+
+
+def text_file(directory, total_words, vocabulary_size=50000, exponent=1.1, seed=0):
+    """
+    Returns the path of a text corpus, generating it if it does not exist yet.
+
+     :param directory: Directory where the generated files are kept.
+     :return: Path of the file. The other parameters are those of zipf_words.
+    """
+    file_name = os.path.join(directory, f"corpus-{total_words}-v{vocabulary_size}"
+                                        f"-z{exponent:g}-s{seed}.txt")
+    if not os.path.exists(file_name):
+        write_lines(file_name, zipf_words(total_words, vocabulary_size, exponent, seed),
+                    WORDS_PER_LINE)
+    return file_name
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark inputs.")
+    parser.add_argument("kind", choices=["numbers", "text"], help="Kind of file.")
+    parser.add_argument("output_file", help="File to write.")
+    parser.add_argument("--rows", type=int, default=100000,
+                        help="Numbers, or words of the corpus (default 100000).")
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="numbers: fraction of invalid records.")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0,
+                        help="numbers: fraction of repeated values.")
+    parser.add_argument("--magnitude", type=int, default=10 ** 6,
+                        help="numbers: values are drawn from [-magnitude, magnitude].")
+    parser.add_argument("--vocabulary", type=int, default=50000,
+                        help="text: number of distinct words.")
+    parser.add_argument("--zipf-exponent", type=float, default=1.1,
+                        help="text: exponent of the word frequencies.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generator.")
+    arguments = parser.parse_args()
+
+    if arguments.kind == "numbers":
+        write_lines(arguments.output_file,
+                    numeric_rows(arguments.rows, arguments.invalid_rate,
+                                 arguments.duplicate_rate, arguments.magnitude, arguments.seed))
+    else:
+        write_lines(arguments.output_file,
+                    zipf_words(arguments.rows, arguments.vocabulary, arguments.zipf_exponent,
+                               arguments.seed),
+                    WORDS_PER_LINE)
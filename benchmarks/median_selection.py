@@ -0,0 +1,95 @@
+"""
+median_selection.py - Compares the exact median and percentiles computed by sorting a copy
+of the data with the selection of order_statistics.py on large synthetic inputs.
+
+Both methods are timed on the same values, their results are checked to be identical and
+the input is checked to be left in its original order.
+
+Usage:
+python benchmarks/median_selection.py [--values 10000000] [--percentiles 90 99 99.9]
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from order_statistics import median_and_quantiles, nearest_rank
+
+
+def synthetic_values(total_values, kind, seed=0):
+    """
+    Generates the values of a benchmark.
+
+     :param total_values: Number of values.
+     :param kind: 'floats' for uniform floats, 'integers' for integers with
+                  many repeated values, or 'sorted' for sorted floats.
+     :param seed: Seed of the random generator.
+     :return: List of numbers.
+    """
+    generator = random.Random(seed)
+    if kind == "integers":
+        return [generator.randint(-1000, 1000) for _ in range(total_values)]
+    if kind == "sorted":
+        # Built in order, like the values parsed from a sorted file, instead of
+        # sorting random values, which scatters them in memory.
+        return list(itertools.accumulate(generator.random() for _ in range(total_values)))
+    return [generator.random() for _ in range(total_values)]
+
+
+def sorted_median_and_quantiles(data, fractions):
+    """
+    Reference implementation: sorts a copy of the data.
+
+     :param data: Non-empty list of numbers.
+     :param fractions: Iterable of fractions between 0 and 1.
+     :return: Tuple of the median and the list with the value of each quantile.
+    """
+    ordered = sorted(data)
+    middle = len(ordered) // 2
+    if len(ordered) % 2 == 0:
+        middle_value = (ordered[middle] + ordered[middle - 1]) / 2
+    else:
+        middle_value = ordered[middle]
+    return middle_value, [ordered[nearest_rank(fraction, len(ordered))]
+                          for fraction in fractions]
+
+
+def timed(function, *arguments):
+    """
+    Runs a function and returns its result and the elapsed seconds.
+    """
+    start_time = time.perf_counter()
+    result = function(*arguments)
+    return result, time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the exact median by sorting and by selection.")
+    parser.add_argument("--values", type=int, default=10 ** 7,
+                        help="Number of values (default 1e7).")
+    parser.add_argument("--kinds", nargs="+", choices=["floats", "integers", "sorted"],
+                        default=["floats", "integers", "sorted"],
+                        help="Distributions of the values (default all).")
+    parser.add_argument("--percentiles", nargs="+", type=float, default=[90, 99, 99.9],
+                        help="Percentiles selected together with the median.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generator.")
+    arguments = parser.parse_args()
+
+    fractions = [percentile / 100 for percentile in arguments.percentiles]
+    print(f"{'values':<10}{'sort s':>10}{'select s':>10}{'speedup':>9}  identical")
+    for kind in arguments.kinds:
+        data = synthetic_values(arguments.values, kind, arguments.seed)
+        original = list(data)
+        expected, sort_seconds = timed(sorted_median_and_quantiles, data, fractions)
+        result, select_seconds = timed(median_and_quantiles, data, fractions)
+        identical = result == expected and data == original
+        print(f"{kind:<10}{sort_seconds:>10.3f}{select_seconds:>10.3f}"
+              f"{sort_seconds / select_seconds:>9.2f}  {'yes' if identical else 'NO'}")
+        if not identical:
+            sys.exit(1)
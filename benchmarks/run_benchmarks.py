@@ -0,0 +1,246 @@
+"""
+run_benchmarks.py - Benchmark suite of compute_statistics.py, convert_numbers.py and
+word_count.py on deterministic synthetic inputs.
+
+Every case runs one target on one generated input size:
+
+- statistics: compute_statistics.calculate_statistics on the parsed numbers.
+- binary / hexadecimal: convert_numbers.convert_to_binary / convert_to_hexadecimal on
+  every parsed number.
+- wordcount: word_count.process_file on a Zipfian text corpus; its rows are words.
+
+Parsing and console output are not timed, only the target. Each case runs in a fresh
+process, so its peak RSS is not affected by the other cases, and is repeated to report
+the p50 and p99 latency of a run and the throughput in rows per second at the p50.
+
+The results are printed and can be written as JSON with --output. With --baseline, the
+p50 of every case is compared with a stored result file and the script exits with status
+1 when a case is slower than the baseline by more than --threshold.
+
+Usage:
+python benchmarks/run_benchmarks.py --sizes 1000 100000 --output results.json
+python benchmarks/run_benchmarks.py --targets statistics --sizes 100000000
+python benchmarks/run_benchmarks.py --baseline results.json --threshold 0.1
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+import compute_statistics
+import convert_numbers
+import word_count
+from generators import numeric_file, text_file
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+TARGETS = ("statistics", "binary", "hexadecimal", "wordcount")
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns the nearest-rank percentile of a sorted list.
+
+     :param sorted_values: Sorted list of numbers.
+     :param fraction: Fraction between 0 and 1.
+    """
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def peak_rss_bytes():
+    """
+    Returns the peak resident set size of the current process in bytes, or
+    None on platforms without the resource module.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kibibytes and macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def prepare(target, rows, options):
+    """
+    Generates the input of a case and returns the callable that is timed.
+
+     :param target: One of TARGETS.
+     :param rows: Size of the input.
+     :param options: Dictionary with the generator options.
+    """
+    if target == "wordcount":
+        file_name = text_file(options['data_dir'], rows, options['vocabulary'],
+                              options['zipf_exponent'], options['seed'])
+        return lambda: word_count.process_file(file_name)
+
+    file_name = numeric_file(options['data_dir'], rows, options['invalid_rate'],
+                             options['duplicate_rate'], options['magnitude'], options['seed'])
+    # The parsers print the report of the invalid records.
+    with contextlib.redirect_stdout(io.StringIO()):
+        if target == "statistics":
+            numbers = compute_statistics.convert_to_numbers(
+                compute_statistics.read_file(file_name))
+        else:
+            numbers = list(convert_numbers.iter_numbers(file_name, {}))
+    if target == "statistics":
+        return lambda: compute_statistics.calculate_statistics(numbers)
+    convert = (convert_numbers.convert_to_binary if target == "binary"
+               else convert_numbers.convert_to_hexadecimal)
+    return lambda: [convert(number) for number in numbers]
+
+
+def run_case(target, rows, repeat, options):
+    """
+    Runs a case. It is executed in its own process.
+
+     :param target: One of TARGETS.
+     :param rows: Size of the input.
+     :param repeat: Number of timed runs.
+     :param options: Dictionary with the generator options.
+     :return: Dictionary with the measurements of the case.
+    """
+    workload = prepare(target, rows, options)
+    seconds = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            workload()
+        seconds.append(time.perf_counter() - start_time)
+    seconds.sort()
+    p50 = percentile(seconds, 0.5)
+    return {
+        'name': f"{target}/{rows}",
+        'target': target,
+        'rows': rows,
+        'repeat': repeat,
+        'p50_seconds': p50,
+        'p99_seconds': percentile(seconds, 0.99),
+        'throughput_rows_per_second': rows / p50 if p50 > 0 else None,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares the p50 of every case with a baseline.
+
+     :param results: List of case results.
+     :param baseline: Result document loaded from the baseline file.
+     :param threshold: Allowed slowdown as a fraction, 0.1 is 10 percent.
+     :return: List of (name, baseline p50, p50, ratio, regressed) tuples for
+              the cases present in both.
+    """
+    baseline_cases = {case['name']: case for case in baseline['cases']}
+    comparisons = []
+    for case in results:
+        reference = baseline_cases.get(case['name'])
+        if reference is None or not reference['p50_seconds']:
+            continue
+        ratio = case['p50_seconds'] / reference['p50_seconds']
+        comparisons.append((case['name'], reference['p50_seconds'], case['p50_seconds'],
+                            ratio, ratio > 1 + threshold))
+    return comparisons
+
+
+def print_results(results):
+    """
+    Prints a table with the case results.
+
+     :param results: List of case results.
+    """
+    print(f"{'case':<26}{'p50 s':>11}{'p99 s':>11}{'rows/s':>14}{'peak RSS MiB':>14}")
+    for case in results:
+        throughput = case['throughput_rows_per_second'] or 0
+        peak = case['peak_rss_bytes']
+        peak_text = f"{peak / (1 << 20):.1f}" if peak is not None else "n/a"
+        print(f"{case['name']:<26}{case['p50_seconds']:>11.4f}{case['p99_seconds']:>11.4f}"
+              f"{throughput:>14,.0f}{peak_text:>14}")
+
+
+def main():
+    """
+    Parses the command line, runs the cases and compares them with the baseline.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the statistics, conversion and word count programs.")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS),
+                        help="Targets to run (default all).")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000],
+                        help="Input sizes in rows, from 1e3 to 1e8 (default 1e3 1e4 1e5).")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case.")
+    parser.add_argument("--data-dir",
+                        default=os.path.join(tempfile.gettempdir(), "benchmark-data"),
+                        help="Directory where the generated inputs are kept and reused.")
+    parser.add_argument("--invalid-rate", type=float, default=0.01,
+                        help="Fraction of invalid numeric records (default 0.01).")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1,
+                        help="Fraction of repeated numeric values (default 0.1).")
+    parser.add_argument("--magnitude", type=int, default=10 ** 6,
+                        help="Numbers are drawn from [-magnitude, magnitude].")
+    parser.add_argument("--vocabulary", type=int, default=50000,
+                        help="Distinct words of the text corpora.")
+    parser.add_argument("--zipf-exponent", type=float, default=1.1,
+                        help="Exponent of the word frequencies.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generators.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare the results with this JSON file.")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Allowed p50 slowdown against the baseline (default 0.1).")
+    arguments = parser.parse_args()
+
+    os.makedirs(arguments.data_dir, exist_ok=True)
+    options = {
+        'data_dir': arguments.data_dir,
+        'invalid_rate': arguments.invalid_rate,
+        'duplicate_rate': arguments.duplicate_rate,
+        'magnitude': arguments.magnitude,
+        'vocabulary': arguments.vocabulary,
+        'zipf_exponent': arguments.zipf_exponent,
+        'seed': arguments.seed,
+    }
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for target in arguments.targets:
+        for rows in arguments.sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results.append(executor.submit(run_case, target, rows, arguments.repeat,
+                                               options).result())
+    print_results(results)
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as file:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'options': options,
+                'cases': results,
+            }, file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline, "r", encoding="utf-8") as file:
+            comparisons = compare(results, json.load(file), arguments.threshold)
+        print(f"\n{'case':<26}{'baseline s':>12}{'p50 s':>11}{'ratio':>8}")
+        for name, reference, current, ratio, regressed in comparisons:
+            print(f"{name:<26}{reference:>12.4f}{current:>11.4f}{ratio:>8.2f}"
+                  f"{'  REGRESSION' if regressed else ''}")
+        if any(regressed for *_, regressed in comparisons):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
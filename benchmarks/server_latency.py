@@ -0,0 +1,109 @@
+"""
+server_latency.py - Measures the latency of small requests to server.py, one at a time
+and pipelined.
+
+A server is started on a temporary Unix-domain socket and every tool is called with a
+small inline payload. The p50 and p99 of the round trip of sequential requests are
+reported, and then the same requests are sent in pipelined groups to report the
+requests per second of a single connection.
+
+Usage:
+python benchmarks/server_latency.py [--records 100] [--requests 2000] [--pipeline 100]
+"""
+import argparse
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from server import Client
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "server.py")
+
+
+def small_requests(records, seed=0):
+    """
+    Builds one small request of every tool.
+
+     :param records: Number of records or words of every request.
+     :param seed: Seed of the random generator.
+     :return: Dictionary of request dictionaries by name.
+    """
+    generator = random.Random(seed)
+    words = ["the", "cat", "and", "hat", "sat", "on", "a", "mat"]
+    return {
+        'statistics': {'tool': "statistics",
+                       'records': [str(generator.gauss(100, 15)) for _ in range(records)]},
+        'convert': {'tool': "convert", 'bits': 32,
+                    'records': [generator.randint(-1000, 1000) for _ in range(records)]},
+        'wordcount': {'tool': "wordcount",
+                      'text': " ".join(generator.choice(words) for _ in range(records))},
+    }
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns the nearest-rank percentile of sorted values.
+    """
+    return sorted_values[max(1, math.ceil(fraction * len(sorted_values))) - 1]
+
+
+def wait_for_server(socket_path, timeout=10.0):
+    """
+    Waits until the server accepts connections.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            Client(socket_path).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the latency of server.py.")
+    parser.add_argument("--records", type=int, default=100,
+                        help="Records or words of every request (default 100).")
+    parser.add_argument("--requests", type=int, default=2000,
+                        help="Requests of every tool (default 2000).")
+    parser.add_argument("--pipeline", type=int, default=100,
+                        help="Requests sent together when pipelining (default 100).")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, "server.sock")
+        process = subprocess.Popen([sys.executable, SERVER_SCRIPT, "--socket", socket_path,
+                                    "serve", "--workers", "1"], stdout=subprocess.DEVNULL)
+        try:
+            wait_for_server(socket_path)
+            print(f"{'tool':<12}{'p50 ms':>9}{'p99 ms':>9}{'pipelined/s':>14}")
+            with Client(socket_path) as client:
+                for name, request in small_requests(arguments.records).items():
+                    latencies = []
+                    for _ in range(arguments.requests):
+                        start_time = time.perf_counter()
+                        response = client.call(**request)
+                        latencies.append(time.perf_counter() - start_time)
+                        if not response['ok']:
+                            sys.exit(f"Error: {response['error']}")
+                    latencies.sort()
+                    start_time = time.perf_counter()
+                    for _ in range(0, arguments.requests, arguments.pipeline):
+                        client.pipeline([request] * arguments.pipeline)
+                    rate = (arguments.requests // arguments.pipeline * arguments.pipeline
+                            / (time.perf_counter() - start_time))
+                    print(f"{name:<12}{percentile(latencies, 0.5) * 1000:>9.3f}"
+                          f"{percentile(latencies, 0.99) * 1000:>9.3f}{rate:>14,.0f}")
+        finally:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,70 @@
+"""
+word_store_memory.py - Compares the memory used per distinct word by a dict and by
+word_store.CompactWordStore when counting a synthetic vocabulary.
+
+The memory is measured with tracemalloc, which sees the str and int objects of the dict as
+well as the buffers of the arrays of the store.
+
+Usage:
+python benchmarks/word_store_memory.py [--words 1000000] [--length 8] [--occurrences 1000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from word_store import CompactWordStore  # pylint: disable=wrong-import-position
+
+
+def synthetic_words(total_words, length):
+    """
+    Generates distinct words of the given length.
+
+     :param total_words: Number of words.
+     :param length: Length of each word.
+     :return: Generator of words.
+    """
+    for index in range(total_words):
+        yield f"w{index:0{length - 1}d}"
+
+
+def measure(store_factory, total_words, length, occurrences):
+    """
+    Counts a synthetic vocabulary and measures the memory kept by the store.
+
+     :param store_factory: Callable that returns an empty store.
+     :param total_words: Number of distinct words.
+     :param length: Length of each word.
+     :param occurrences: Count added to every word; counts above 256 are not
+                         cached small ints, as in real corpora.
+     :return: Tuple (bytes kept by the store, seconds spent counting).
+    """
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    store = store_factory()
+    for word in synthetic_words(total_words, length):
+        store[word] = store.get(word, 0) + occurrences
+    elapsed_time = time.perf_counter() - start_time
+    current_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return current_memory, elapsed_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory per distinct word of the stores.")
+    parser.add_argument("--words", type=int, default=1000000, help="Distinct words.")
+    parser.add_argument("--length", type=int, default=8, help="Length of each word.")
+    parser.add_argument("--occurrences", type=int, default=1000,
+                        help="Count of every word.")
+    arguments = parser.parse_args()
+
+    print(f"{'store':<10}{'bytes/word':>12}{'total MiB':>12}{'seconds':>10}")
+    for name, factory in (("dict", dict), ("compact", CompactWordStore)):
+        memory, seconds = measure(factory, arguments.words, arguments.length,
+                                  arguments.occurrences)
+        print(f"{name:<10}{memory / arguments.words:>12.1f}"
+              f"{memory / (1 << 20):>12.1f}{seconds:>10.2f}")
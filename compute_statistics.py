@@ -11,12 +11,55 @@ Requirements:
 - Invalid data in the file is handled, and errors are displayed without interrupting execution.
 - The execution time, including the calculation time, is displayed at the end.
 
+When NumPy is installed the in-memory exact calculation uses a vectorized backend; it can
+be forced with --backend python or --backend numpy.
+
+--stream reads the file in a single pass without loading its lines, but the exact median
+and mode still keep every value; memory is only bounded together with --approximate and
+--mode-engine bounded.
+
+With --window N the statistics of the last N values are printed every --every values,
+reading the standard input ('-') or following a file that is still being written.
+
+With --cache-dir the results are kept in a result cache (see result_cache.py), and a later
+run with the same options on the unchanged file prints them without reading it.
+
 Usage:
 python compute_statistics.py fileWithData.txt
+python compute_statistics.py fileWithData.txt --stream
+python compute_statistics.py fileWithData.txt --approximate --percentiles 90 99 99.9
+python compute_statistics.py fileWithData.txt --mode-engine bounded --top-modes 5
+python compute_statistics.py fileWithData.txt --workers 4
+python compute_statistics.py fileWithData.txt --metrics metrics.prom --profile run.prof
+python compute_statistics.py fileWithData.txt --cache-dir ~/.cache/statistics
+python compute_statistics.py fileWithData.txt --window 1000 --every 100
+tail -f metrics.log | python compute_statistics.py - --window 1000
+python compute_statistics.py metrics.log --window 1000 --follow
 """
-import sys
-import time
+import argparse
+import heapq
+import math
+import os
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from frequency_sketch import SpaceSavingSketch
+from input_reader import iter_line_batches, iter_lines, split_ranges
+from instrumentation import Metrics, add_arguments, measure, profiling
+from number_parser import DEFAULT_MAX_SAMPLES, ErrorReport, parse_floats
+from order_statistics import median_and_quantiles, quantiles
+from quantile_sketch import KLLSketch, percentile_label
+from result_cache import add_arguments as add_cache_arguments, open_cache
+from rolling_statistics import RollingStatistics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Number of records read and parsed at a time by stream_statistics.
+BATCH_SIZE = 10000
 
 
 def read_file(file_name):
@@ -27,35 +70,99 @@ def read_file(file_name):
      :return: List of values in the file or an empty list if the file is not found.
     """
     try:
-        with open(file_name, "r", encoding="utf-8") as file:
-            return file.read().splitlines()
+        return [line.decode("utf-8") for line in iter_lines(file_name)]
     except FileNotFoundError as exception:
         print(f"Error: File not found - {exception.filename}")
         return []
 
-def convert_to_numbers(data):
+def convert_to_numbers(data, report=None):
     """
     This function converts the records in a list to numbers by 
     validating that the value is a valid number
-    """
-    numbers = []
 
-    for value in data:
-        try:
-            number = float(value)
-            numbers.append(number)
-        except ValueError as exception:
-            print(f"Warning: The record with the value: '{value}' is "
-                  f"not a valid number - {exception}")
+     :param data: List of records as str or bytes.
+     :param report: Optional ErrorReport that receives the invalid records; by
+                    default they are reported on the screen at the end.
+     :return: List of the valid numbers.
+    """
+    if report is not None:
+        return parse_floats(data, report)
 
+    report = ErrorReport()
+    numbers = parse_floats(data, report)
+    report.print_report()
     return numbers
 
-def calculate_statistics(data):
+def check_percentiles(percentiles):
+    """
+    Checks that the requested percentiles are between 0 and 100.
+
+     :param percentiles: Iterable of percentiles.
+     :raises ValueError: If a percentile is out of range or not a number.
+    """
+    for percentile in percentiles:
+        if not 0 <= percentile <= 100:
+            raise ValueError(f"the percentile {percentile:g} is not between 0 and 100")
+
+def percentile_argument(text):
+    """
+    Converts a command line argument to a percentile, for argparse.
+
+     :param text: Text of the argument.
+     :return: The percentile as a float.
+     :raises argparse.ArgumentTypeError: If it is not a number between 0 and 100.
+    """
+    try:
+        percentile = float(text)
+        check_percentiles([percentile])
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid percentile: '{text}' (must be a number between 0 and 100)") from None
+    return percentile
+
+def error_bound_argument(text):
+    """
+    Converts a command line argument to a sketch error bound, for argparse.
+
+     :param text: Text of the argument.
+     :return: The error bound as a float.
+     :raises argparse.ArgumentTypeError: If it is not a number between 0 and 1,
+                                         both excluded.
+    """
+    try:
+        error_bound = float(text)
+    except ValueError:
+        error_bound = math.nan
+    if not 0 < error_bound < 1:
+        raise argparse.ArgumentTypeError(
+            f"invalid error bound: '{text}' (must be a number between 0 and 1, excluded)")
+    return error_bound
+
+def top_frequencies(counter, k):
+    """
+    Returns the k most frequent values of an exact counter.
+
+     :param counter: Counter with the frequency of each value.
+     :param k: Number of values to return.
+     :return: List of (value, count, error) tuples sorted by count, ties broken
+              by the largest value. The error of exact counts is always 0.
+    """
+    top_items = heapq.nlargest(k, counter.items(), key=lambda item: (item[1], item[0]))
+    return [(value, count, 0) for value, count in top_items]
+
+def calculate_statistics(data, quantile_sketch=None, percentiles=(), mode_sketch=None,
+                         top_modes=0):
     """
     Calculates the basic descriptive statistics (mean, median, mode, standard 
     deviation and variance) for a list of numbers.
     
     :param data: List of numbers.
+    :param quantile_sketch: Optional KLLSketch used to approximate the median and
+                            percentiles instead of sorting the data.
+    :param percentiles: Percentiles (0-100) to report besides the median.
+    :param mode_sketch: Optional SpaceSavingSketch used to estimate the mode with
+                        bounded memory instead of counting every distinct value.
+    :param top_modes: Number of most frequent values to report with their counts.
     :return: A dictionary with the statistics data.    
     """
     # Get the total number of records
@@ -65,23 +172,33 @@ def calculate_statistics(data):
     mean = sum(data) / len(data)
 
     # Compute the median.
-    data.sort()
-    if len(data) % 2 == 0:
-        median = (data[len(data) // 2] + data[len(data) // 2 - 1]) / 2
+    fractions = [percentile / 100 for percentile in percentiles]
+    if quantile_sketch is not None:
+        quantile_sketch.update(data)
+        median = quantile_sketch.result()
+        percentile_values = quantile_sketch.quantiles(fractions) if fractions else []
     else:
-        median = data[len(data) // 2]
+        # Selection in expected linear time; the data is not reordered.
+        median, percentile_values = median_and_quantiles(data, fractions)
 
     # Compute the mode.
-    # Calcular la frecuencia de cada elemento
-    counter = Counter(data)
+    if mode_sketch is not None:
+        for value in data:
+            mode_sketch.add(value)
+        mode = mode_sketch.result()
+        top_values = mode_sketch.top_k(top_modes)
+    else:
+        # Calcular la frecuencia de cada elemento
+        counter = Counter(data)
 
-    # Find the maximum frequency
-    max_frequency = max(counter.values())
+        # Find the maximum frequency
+        max_frequency = max(counter.values())
 
-    # Get all elements that have the maximum frequency
-    mode = [value for value, frequency in counter.items() if frequency == max_frequency]
-    #If the result is multimodal we take the maximum value
-    mode = max(mode)
+        # Get all elements that have the maximum frequency
+        mode = [value for value, frequency in counter.items() if frequency == max_frequency]
+        #If the result is multimodal we take the maximum value
+        mode = max(mode)
+        top_values = top_frequencies(counter, top_modes)
 
     # Compute the standard deviation.
     standard_deviation = (sum((x - mean) ** 2 for x in data) / len(data)) ** 0.5
@@ -89,14 +206,6 @@ def calculate_statistics(data):
     # Calculate variance.
     variance = sum((x - mean) ** 2 for x in data) / (len(data) - 1.0)
 
-    # Print the results to the screen.
-    print("Total valid records:", total_valid_records)
-    print("Mean:", mean)
-    print("Median:", median)
-    print("Mode(s):", mode)
-    print("Standard deviation:", standard_deviation)
-    print("Variance:", variance)
-
     statistics_data = {
         'total_records': 0,
         'total_valid_records': total_valid_records,
@@ -106,21 +215,444 @@ def calculate_statistics(data):
         'standard_deviation': standard_deviation,
         'variance': variance
     }
+    if percentiles:
+        statistics_data['percentiles'] = dict(zip(percentiles, percentile_values))
+    if top_modes:
+        statistics_data['top_values'] = top_values
 
     return statistics_data
 
-def write_to_file(file_name, statistic_data):
+def numpy_read_numbers(file_name, metrics=None, report=None):
+    """
+    Reads a file and parses it in bulk into a NumPy float64 array. Invalid
+    records are reported with their line number and skipped.
+
+     :param file_name: Name of the file to read.
+     :param metrics: Optional Metrics object that receives the read and parse times.
+     :param report: Optional ErrorReport that receives the invalid records.
+     :return: Tuple (total_records, values).
+    """
+    with measure(metrics, "read"):
+        lines = list(iter_lines(file_name))
+    with measure(metrics, "parse"):
+        return len(lines), numpy_parse_lines(lines, report)
+
+def numpy_parse_lines(lines, report=None):
+    """
+    Parses the lines of a file into a NumPy float64 array, skipping the
+    invalid records.
+
+     :param lines: List of records as bytes.
+     :param report: Optional ErrorReport that receives the invalid records.
+     :return: NumPy float64 array with the valid numbers.
+    """
+    try:
+        return np.array(lines, dtype=np.float64)
+    except ValueError:
+        pass
+
+    # The bulk conversion failed, so classify the records one by one.
+    return np.array(parse_floats(lines, report), dtype=np.float64)
+
+def numpy_calculate_statistics(values, percentiles=(), top_modes=0):
+    """
+    Vectorized version of calculate_statistics for a NumPy array. The median
+    and percentiles use a partial partition instead of a full sort and the
+    mode uses the counts of np.unique.
+
+     :param values: NumPy float64 array with the valid numbers.
+     :param percentiles: Percentiles (0-100) to report besides the median.
+     :param top_modes: Number of most frequent values to report.
+     :return: A dictionary with the statistics data.
+    """
+    total_valid_records = len(values)
+    if total_valid_records == 0:
+        raise ZeroDivisionError("there are no valid records to analyze")
+    if total_valid_records == 1:
+        raise ZeroDivisionError("the variance needs at least two valid records")
+
+    # Compute the median and the percentiles with a single partition.
+    middle = total_valid_records // 2
+    ranks = [max(1, math.ceil(percentile / 100 * total_valid_records)) - 1
+             for percentile in percentiles]
+    kth = sorted({middle, max(middle - 1, 0), *ranks})
+    partitioned = np.partition(values, kth)
+    if total_valid_records % 2 == 0:
+        median = (partitioned[middle] + partitioned[middle - 1]) / 2
+    else:
+        median = partitioned[middle]
+
+    # Compute the mode. If the result is multimodal we take the maximum value.
+    unique_values, counts = np.unique(values, return_counts=True)
+    mode = unique_values[counts == counts.max()].max()
+
+    statistics_data = {
+        'total_records': 0,
+        'total_valid_records': total_valid_records,
+        'mean': float(values.mean()),
+        'median': float(median),
+        'mode': float(mode),
+        'standard_deviation': float(values.std()),
+        'variance': float(values.var(ddof=1))
+    }
+    if percentiles:
+        statistics_data['percentiles'] = {percentile: float(partitioned[rank])
+                                          for percentile, rank in zip(percentiles, ranks)}
+    if top_modes:
+        # Sort by count and then by value, both descending.
+        order = np.lexsort((unique_values, counts))[::-1][:top_modes]
+        statistics_data['top_values'] = [(float(unique_values[index]), int(counts[index]), 0)
+                                         for index in order]
+
+    return statistics_data
+
+def print_statistics(statistics_data):
+    """
+    Prints the statistics to the screen.
+
+     :param statistics_data: Dictionary with the statistics data.
+    """
+    print("Total valid records:", statistics_data['total_valid_records'])
+    print("Mean:", statistics_data['mean'])
+    print("Median:", statistics_data['median'])
+    print("Mode(s):", statistics_data['mode'])
+    print("Standard deviation:", statistics_data['standard_deviation'])
+    print("Variance:", statistics_data['variance'])
+    for percentile, value in statistics_data.get('percentiles', {}).items():
+        print(f"{percentile_label(percentile)}:", value)
+    for value, count, error in statistics_data.get('top_values', []):
+        print(f"Top value: {value}, count: {count}, error: {error}")
+
+class RunningMoments:
+    """
+    Accumulates the count, mean and sum of squared deviations (M2) of a
+    stream of numbers in a single pass using Welford's algorithm, which
+    avoids the cancellation errors of the naive sum of squares.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        """
+        Adds a value to the accumulator.
+
+         :param value: Number to add.
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        """
+        Merges another accumulator into this one (Chan et al. parallel update).
+
+         :param other: RunningMoments to merge.
+        """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    def standard_deviation(self):
+        """
+        Returns the population standard deviation of the values seen so far.
+        """
+        return (self.m2 / self.count) ** 0.5
+
+    def variance(self):
+        """
+        Returns the sample variance of the values seen so far.
+        """
+        return self.m2 / (self.count - 1.0)
+
+class ExactMedianAccumulator:
+    """
+    Median sub-accumulator that keeps every value, giving the same result as
+    calculate_statistics. Memory grows with the input.
+    """
+
+    def __init__(self):
+        self.values = []
+
+    def add(self, value):
+        """
+        Adds a value to the accumulator.
+
+         :param value: Number to add.
+        """
+        self.values.append(value)
+
+    def merge(self, other):
+        """
+        Merges another accumulator into this one.
+
+         :param other: ExactMedianAccumulator to merge.
+        """
+        self.values.extend(other.values)
+
+    def result(self):
+        """
+        Returns the median of the values seen so far.
+        """
+        return median_and_quantiles(self.values)[0]
+
+    def quantiles(self, fractions):
+        """
+        Returns the quantiles of the values seen so far.
+
+         :param fractions: Iterable of fractions between 0 and 1.
+        """
+        return quantiles(self.values, fractions)
+
+class ExactModeAccumulator:
+    """
+    Mode sub-accumulator that keeps the frequency of every distinct value. If
+    the result is multimodal the maximum value is taken.
+    """
+
+    def __init__(self):
+        self.counter = Counter()
+
+    def add(self, value):
+        """
+        Adds a value to the accumulator.
+
+         :param value: Number to add.
+        """
+        self.counter[value] += 1
+
+    def merge(self, other):
+        """
+        Merges another accumulator into this one.
+
+         :param other: ExactModeAccumulator to merge.
+        """
+        self.counter.update(other.counter)
+
+    def result(self):
+        """
+        Returns the mode of the values seen so far.
+        """
+        max_frequency = max(self.counter.values())
+        return max(value for value, frequency in self.counter.items()
+                   if frequency == max_frequency)
+
+    def top_k(self, k):
+        """
+        Returns the k most frequent values seen so far.
+
+         :param k: Number of values to return.
+        """
+        return top_frequencies(self.counter, k)
+
+class StatisticsPartial:
+    """
+    Mergeable partial result holding everything needed to produce the final
+    statistics of a part of the input: record counts, the running moments,
+    the minimum and maximum, and the median and mode sub-accumulators.
+
+     :param median_accumulator: Median sub-accumulator, exact by default.
+     :param mode_accumulator: Mode sub-accumulator, exact by default.
+     :param max_warnings: Samples of invalid records kept in the error report.
+    """
+
+    def __init__(self, median_accumulator=None, mode_accumulator=None,
+                 max_warnings=DEFAULT_MAX_SAMPLES):
+        if median_accumulator is None:
+            median_accumulator = ExactMedianAccumulator()
+        if mode_accumulator is None:
+            mode_accumulator = ExactModeAccumulator()
+        self.total_records = 0
+        self.moments = RunningMoments()
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.median_accumulator = median_accumulator
+        self.mode_accumulator = mode_accumulator
+        self.report = ErrorReport(max_warnings)
+
+    def parse_records(self, records):
+        """
+        Counts and parses a batch of consecutive records of the file, adding
+        the invalid ones to the error report.
+
+         :param records: List of records as str or bytes.
+         :return: List of the valid numbers.
+        """
+        numbers = parse_floats(records, self.report, self.total_records + 1)
+        self.total_records += len(records)
+        return numbers
+
+    def add_lines(self, lines, metrics=None):
+        """
+        Reads, parses and adds the lines of a file in batches of BATCH_SIZE.
+
+         :param lines: Iterable of records as str or bytes.
+         :param metrics: Optional Metrics object that receives the read, parse
+                         and compute times of every batch.
+        """
+        lines = iter(lines)
+        while True:
+            with measure(metrics, "read"):
+                records = list(islice(lines, BATCH_SIZE))
+            if not records:
+                return
+            with measure(metrics, "parse"):
+                numbers = self.parse_records(records)
+            with measure(metrics, "compute"):
+                for number in numbers:
+                    self.add(number)
+
+    def add(self, number):
+        """
+        Adds a valid number.
+
+         :param number: Number to add.
+        """
+        self.moments.add(number)
+        self.minimum = min(self.minimum, number)
+        self.maximum = max(self.maximum, number)
+        self.median_accumulator.add(number)
+        self.mode_accumulator.add(number)
+
+    def merge(self, other):
+        """
+        Merges another partial result into this one.
+
+         :param other: StatisticsPartial of the next part of the input to merge.
+        """
+        self.report.merge(other.report, self.total_records)
+        self.total_records += other.total_records
+        self.moments.merge(other.moments)
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.median_accumulator.merge(other.median_accumulator)
+        self.mode_accumulator.merge(other.mode_accumulator)
+
+    def to_statistics(self, percentiles=(), top_modes=0):
+        """
+        Produces the final statistics.
+
+         :param percentiles: Percentiles (0-100) to report besides the median.
+         :param top_modes: Number of most frequent values to report.
+         :return: A dictionary with the statistics data.
+        """
+        if self.moments.count == 0:
+            raise ZeroDivisionError("there are no valid records to analyze")
+
+        statistics_data = {
+            'total_records': self.total_records,
+            'total_valid_records': self.moments.count,
+            'mean': self.moments.mean,
+            'median': self.median_accumulator.result(),
+            'mode': self.mode_accumulator.result(),
+            'standard_deviation': self.moments.standard_deviation(),
+            'variance': self.moments.variance(),
+            'minimum': self.minimum,
+            'maximum': self.maximum
+        }
+        if percentiles:
+            statistics_data['percentiles'] = dict(zip(
+                percentiles,
+                self.median_accumulator.quantiles(
+                    [percentile / 100 for percentile in percentiles])))
+        if top_modes:
+            statistics_data['top_values'] = self.mode_accumulator.top_k(top_modes)
+        return statistics_data
+
+def stream_statistics(file_name, median_accumulator=None, mode_accumulator=None,
+                      percentiles=(), top_modes=0, metrics=None, report=None):
+    """
+    Calculates the basic descriptive statistics reading the file one line at a
+    time. Mean, standard deviation and variance are updated in a single pass;
+    median and mode are delegated to pluggable sub-accumulators exposing
+    add(value) and result(), so a bounded-memory estimator can replace the
+    exact ones. The exact defaults keep every value and every distinct value,
+    so memory only stays bounded with a KLLSketch median accumulator and a
+    SpaceSavingSketch mode accumulator (--approximate --mode-engine bounded).
+
+     :param file_name: Name of the file containing the data.
+     :param median_accumulator: Median sub-accumulator, exact by default.
+     :param mode_accumulator: Mode sub-accumulator, exact by default.
+     :param percentiles: Percentiles (0-100) to report, taken from the median
+                         sub-accumulator.
+     :param top_modes: Number of most frequent values to report, taken from the
+                       mode sub-accumulator.
+     :param metrics: Optional Metrics object that receives the read, parse and
+                     compute times of every batch of BATCH_SIZE records.
+     :param report: Optional ErrorReport that receives the invalid records.
+     :return: A dictionary with the statistics data or None if the file is empty.
+    """
+    partial = StatisticsPartial(median_accumulator, mode_accumulator)
+    if report is not None:
+        partial.report = report
+    partial.add_lines(iter_lines(file_name), metrics)
+
+    if partial.total_records == 0:
+        return None
+    with measure(metrics, "compute"):
+        return partial.to_statistics(percentiles, top_modes)
+
+def range_partial(task):
+    """
+    Computes the partial statistics of a byte range of a file. Used as the
+    worker function of parallel_statistics.
+
+     :param task: Tuple (file_name, start, end, partial) where partial is an
+                  empty StatisticsPartial configured with the wanted engines.
+     :return: The filled StatisticsPartial.
+    """
+    file_name, start, end, partial = task
+    partial.add_lines(iter_lines(file_name, start, end))
+    return partial
+
+def parallel_statistics(file_name, workers, median_accumulator=None, mode_accumulator=None,
+                        percentiles=(), top_modes=0, report=None):
+    """
+    Calculates the basic descriptive statistics splitting the file in byte
+    ranges aligned to newlines, computing a StatisticsPartial for each range
+    in a process pool and merging the partial results in file order.
+
+     :param file_name: Name of the file containing the data.
+     :param workers: Number of worker processes.
+     :param median_accumulator: Median sub-accumulator that receives the merged
+                                result, exact by default.
+     :param mode_accumulator: Mode sub-accumulator that receives the merged
+                              result, exact by default.
+     :param percentiles: Percentiles (0-100) to report besides the median.
+     :param top_modes: Number of most frequent values to report.
+     :param report: Optional ErrorReport that receives the invalid records of
+                    all the ranges, with their line numbers in the whole file.
+     :return: A dictionary with the statistics data or None if the file is empty.
+    """
+    partial = StatisticsPartial(median_accumulator, mode_accumulator)
+    if report is not None:
+        partial.report = report
+    # Each worker receives a pickled copy of the still empty partial, so all of
+    # them use the same kind of sub-accumulators.
+    tasks = [(file_name, start, end, partial)
+             for start, end in split_ranges(file_name, workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for range_result in executor.map(range_partial, tasks):
+            partial.merge(range_result)
+
+    if partial.total_records == 0:
+        return None
+    return partial.to_statistics(percentiles, top_modes)
+
+def write_to_file(file_name, statistic_data, elapsed_time=None):
     """
     Writes the statistics to a file.
 
      :param file_name: Name of the file to write to.
-     :param total_records: Total number of records in the file.
-     :param total_valid_records: Total number of valid records in the file.
-     :param mean: Mean of the data.
-     :param median: Median of the data.
-     :param mode: Mode of the data.
-     :param standard_deviation: Standard deviation of the data.
-     :param variance: Variance of the data.
+     :param statistic_data: Dictionary with the statistics data.
+     :param elapsed_time: Optional elapsed time written at the end of the file.
     """
     # Print the results to a file.
     with open(file_name, "w", encoding="utf-8") as file:
@@ -131,50 +663,340 @@ def write_to_file(file_name, statistic_data):
         file.write(f"Mode: {statistic_data['mode']}\n")
         file.write(f"Standard deviation: {statistic_data['standard_deviation']}\n")
         file.write(f"Variance: {statistic_data['variance']}\n")
+        for percentile, value in statistic_data.get('percentiles', {}).items():
+            file.write(f"Percentile {percentile:g}: {value}\n")
+        for value, count, error in statistic_data.get('top_values', []):
+            file.write(f"Top value: {value}, count: {count}, error: {error}\n")
+        if elapsed_time is not None:
+            file.write(f"Elapsed time: {elapsed_time}\n")
+
+def format_window_statistics(total_values, statistics_data):
+    """
+    Returns the line printed for the statistics of a sliding window.
+
+     :param total_values: Valid values read so far.
+     :param statistics_data: Dictionary returned by RollingStatistics.statistics.
+    """
+    return (f"Values: {total_values}, Count: {statistics_data['count']}, "
+            f"Mean: {statistics_data['mean']}, Median: {statistics_data['median']}, "
+            f"Mode: {statistics_data['mode']}, "
+            f"Standard deviation: {statistics_data['standard_deviation']}, "
+            f"Variance: {statistics_data['variance']}")
+
+def window_statistics(file_name, window_size, every=None, follow=False,
+                      output_file="StatisticsResults.txt", metrics=None, report=None):
+    """
+    Calculates the statistics of the last window_size values of a stream and
+    prints them every given number of values, and once more at the end of the
+    input. The lines are also written to the output file as they are printed.
+    A followed file is read until the program is interrupted.
+
+     :param file_name: Name of the file containing the data, '-' for the
+                       standard input.
+     :param window_size: Number of values in the window.
+     :param every: Valid values between two results, window_size by default.
+     :param follow: Wait for new lines at the end of the file, like tail -f.
+     :param output_file: Name of the file where the results are written.
+     :param metrics: Optional Metrics object that receives the read, parse,
+                     compute and write times and the rows counter.
+     :param report: Optional ErrorReport that receives the invalid records.
+     :return: A dictionary with the last statistics data or None if there were
+              no valid values.
+    """
+    if every is None:
+        every = window_size
+    if every < 1:
+        raise ValueError("the interval between results must be at least 1")
+    rolling = RollingStatistics(window_size)
+    total_records = 0
+    total_values = 0
+    since_output = 0
+    statistics_data = None
+
+    def emit():
+        nonlocal statistics_data
+        with measure(metrics, "compute"):
+            statistics_data = rolling.statistics()
+        with measure(metrics, "write"):
+            line = format_window_statistics(total_values, statistics_data)
+            print(line, flush=True)
+            file.write(line + "\n")
+            file.flush()
+
+    batches = iter_line_batches(file_name, follow)
+    if metrics is not None:
+        batches = metrics.timed(batches, "read")
+    with open(output_file, "w", encoding="utf-8") as file:
+        try:
+            for records in batches:
+                with measure(metrics, "parse"):
+                    numbers = parse_floats(records, report, total_records + 1)
+                total_records += len(records)
+                # Split the batch at the values where a result is due.
+                start = 0
+                while start < len(numbers):
+                    end = min(len(numbers), start + every - since_output)
+                    with measure(metrics, "compute"):
+                        rolling.extend(numbers[start:end])
+                    total_values += end - start
+                    since_output += end - start
+                    start = end
+                    if since_output == every and len(rolling):
+                        emit()
+                        since_output = 0
+        except KeyboardInterrupt:
+            pass
+        if since_output and len(rolling):
+            emit()
+
+    if metrics is not None:
+        metrics.count("rows", total_records)
+        metrics.count("invalid_rows", total_records - total_values)
+    return statistics_data
+
+def result_cache_key(result_cache, file_name, stream=False, approximate=False,
+                     error_bound=0.01, percentiles=(), mode_engine="exact", mode_capacity=1000,
+                     top_modes=0, workers=1, use_numpy=False,
+                     max_warnings=DEFAULT_MAX_SAMPLES):
+    """
+    Returns the result cache key of the statistics of a file, built only from
+    the options that change the results. The calculation that runs is part of
+    the key, since the parallel, NumPy, streaming and in-memory sums round the
+    mean and the variance differently; the options of a calculation that does
+    not run, such as the error bound without approximate, are left out.
+
+     :param result_cache: ResultCache where the key is looked up.
+     :param file_name: Name of the file containing the data.
+     :return: Hexadecimal key, or None if the file cannot be cached.
+    """
+    options = {'percentiles': list(percentiles), 'top_modes': top_modes,
+               'max_warnings': max_warnings}
+    if workers > 1:
+        options['workers'] = workers
+    elif use_numpy and not stream:
+        options['calculation'] = "numpy"
+    else:
+        options['calculation'] = "stream" if stream else "memory"
+    if approximate:
+        options['error_bound'] = error_bound
+    if mode_engine == "bounded":
+        options['mode_capacity'] = mode_capacity
+    return result_cache.key("statistics", file_name, options)
+
+def cache_value(statistic_data, report):
+    """
+    Returns the statistics in the form stored by the result cache.
+
+     :param statistic_data: Dictionary with the statistics data.
+     :param report: ErrorReport of the run, printed again on a cache hit.
+     :return: JSON serializable dictionary.
+    """
+    cached_data = dict(statistic_data, warnings=report.lines())
+    if 'percentiles' in cached_data:
+        # JSON object keys are strings, the percentiles are kept as pairs.
+        cached_data['percentiles'] = list(cached_data['percentiles'].items())
+    return cached_data
+
+def print_cached_statistics(cached_data):
+    """
+    Prints the statistics stored by the result cache as a run prints them.
+
+     :param cached_data: Dictionary returned by cache_value.
+     :return: The statistics data.
+    """
+    statistic_data = dict(cached_data)
+    warnings = statistic_data.pop('warnings')
+    if warnings:
+        print("\n".join(warnings))
+    if 'percentiles' in statistic_data:
+        statistic_data['percentiles'] = dict(map(tuple, statistic_data['percentiles']))
+    if 'top_values' in statistic_data:
+        statistic_data['top_values'] = [tuple(item) for item in statistic_data['top_values']]
+    print("Total records to analyze:", statistic_data['total_records'])
+    print_statistics(statistic_data)
+    return statistic_data
 
 # Main function
-def compute_statistics(file_name):
+def compute_statistics(file_name, stream=False, approximate=False, error_bound=0.01,
+                       percentiles=(), sketch_file=None, mode_engine="exact",
+                       mode_capacity=1000, top_modes=0, workers=1, backend="auto",
+                       output_file="StatisticsResults.txt", metrics=None,
+                       max_warnings=DEFAULT_MAX_SAMPLES, window=None, every=None,
+                       follow=False, result_cache=None):
     """
     This function calculates the basic descriptive statistics (mean, 
     median, mode, standard deviation and variance) for the data 
     contained in the specified file.
 
      :param file_name: Name of the file containing the data.
+     :param stream: Read the file line by line instead of loading it in memory.
+     :param approximate: Approximate the median and percentiles with a KLL sketch.
+     :param error_bound: Normalized rank error of the sketch.
+     :param percentiles: Percentiles (0-100) to report besides the median.
+     :param sketch_file: File where the sketch is saved to be merged later.
+     :param mode_engine: 'exact' counts every distinct value, 'bounded' uses a
+                         Space-Saving summary with mode_capacity counters.
+     :param mode_capacity: Number of counters of the bounded mode engine.
+     :param top_modes: Number of most frequent values to report.
+     :param workers: Number of worker processes; more than one splits the file
+                     in byte ranges that are processed in parallel.
+     :param backend: 'numpy', 'python' or 'auto', which picks NumPy when it is
+                     installed. Only the in-memory exact calculation has a
+                     NumPy backend.
+     :param output_file: Name of the file where the results are written.
+     :param metrics: Optional Metrics object that receives the stage timings and
+                     counters of the run.
+     :param max_warnings: Invalid records shown with their line number; the
+                          rest are only counted in the error report.
+     :param window: If given, print the statistics of the last window values
+                    every few values instead of the statistics of the file;
+                    the file can be '-' for the standard input.
+     :param every: Values between two results of the window, window by default.
+     :param follow: Keep reading the file as it grows, until interrupted.
+     :param result_cache: Optional ResultCache; when it has the results of the
+                          same file and options they are printed and written
+                          without reading the file. Not used with window or
+                          sketch_file.
+     :return: A dictionary with the statistics data or None if they could not
+              be calculated; the statistics of the last window with window.
+     :raises ValueError: If a percentile is not between 0 and 100.
     """
-    start_time = time.time()
+    check_percentiles(percentiles)
+    if metrics is None:
+        metrics = Metrics("statistics", file_name)
+    report = ErrorReport(max_warnings)
+    quantile_sketch = KLLSketch(error_bound) if approximate else None
+    mode_sketch = SpaceSavingSketch(mode_capacity) if mode_engine == "bounded" else None
+    if backend == "numpy" and np is None:
+        print("Error: The NumPy backend was requested but NumPy is not installed.")
+        return None
+    use_numpy = (backend != "python" and np is not None and quantile_sketch is None
+                 and mode_sketch is None)
 
     try:
-        # Read the file contents.
-        data = read_file(file_name)
+        cache_key = None
+        if result_cache is not None and window is None and not sketch_file:
+            with metrics.stage("read"):
+                cache_key = result_cache_key(result_cache, file_name, stream, approximate,
+                                             error_bound, percentiles, mode_engine,
+                                             mode_capacity, top_modes, workers, use_numpy,
+                                             max_warnings)
+            cached_data = result_cache.get(cache_key, output_file) if cache_key else None
+            if cached_data is not None:
+                with metrics.stage("write"):
+                    statistic_data = print_cached_statistics(cached_data)
+                result_cache.record(metrics)
+                metrics.finish()
+                print("Elapsed time:", metrics.elapsed_seconds())
+                print(result_cache.statistics())
+                return statistic_data
 
-        # Check if the data list is not empty.
-        if not data:
-            print("Error: Empty data in the file.")
-            return
+        if window is not None:
+            try:
+                statistic_data = window_statistics(file_name, window, every, follow,
+                                                   output_file, metrics, report)
+            finally:
+                report.print_report()
+            if statistic_data is None:
+                print("Error: Empty data in the file.")
+                return None
+            metrics.finish()
+            print("Elapsed time:", metrics.elapsed_seconds())
+            return statistic_data
+
+        if workers > 1:
+            # The workers read, parse and compute their ranges together.
+            try:
+                with metrics.stage("compute"):
+                    statistic_data = parallel_statistics(file_name, workers,
+                                                         median_accumulator=quantile_sketch,
+                                                         mode_accumulator=mode_sketch,
+                                                         percentiles=percentiles,
+                                                         top_modes=top_modes, report=report)
+            finally:
+                report.print_report()
+            if statistic_data is None:
+                print("Error: Empty data in the file.")
+                return None
+            print("Total records to analyze:", statistic_data['total_records'])
+        elif use_numpy and not stream:
+            total_records, values = numpy_read_numbers(file_name, metrics, report)
+            report.print_report()
+            if total_records == 0:
+                print("Error: Empty data in the file.")
+                return None
+            print("Total records to analyze:", total_records)
+            with metrics.stage("compute"):
+                statistic_data = numpy_calculate_statistics(values, percentiles, top_modes)
+            statistic_data['total_records'] = total_records
+        elif stream:
+            try:
+                statistic_data = stream_statistics(file_name,
+                                                   median_accumulator=quantile_sketch,
+                                                   mode_accumulator=mode_sketch,
+                                                   percentiles=percentiles, top_modes=top_modes,
+                                                   metrics=metrics, report=report)
+            finally:
+                report.print_report()
+            if statistic_data is None:
+                print("Error: Empty data in the file.")
+                return None
+            print("Total records to analyze:", statistic_data['total_records'])
+        else:
+            # Read the file contents.
+            with metrics.stage("read"):
+                data = read_file(file_name)
+
+            # Check if the data list is not empty.
+            if not data:
+                print("Error: Empty data in the file.")
+                return None
+
+            total_records = len(data)
+            # Print the results to the screen.
+            print("Total records to analyze:", total_records)
+
+            # Convert the data to numbers.
+            with metrics.stage("parse"):
+                data = convert_to_numbers(data, report)
+            report.print_report()
+            # Calculate the statistics.
+            with metrics.stage("compute"):
+                statistic_data =  calculate_statistics(data, quantile_sketch, percentiles,
+                                                       mode_sketch, top_modes)
+            statistic_data['total_records'] = total_records
 
-        total_records = len(data)
-        # Print the results to the screen.
-        print("Total records to analyze:", total_records)
+        metrics.count("rows", statistic_data['total_records'])
+        metrics.count("invalid_rows", statistic_data['total_records']
+                      - statistic_data['total_valid_records'])
+        metrics.count("bytes", os.path.getsize(file_name))
 
-        # Convert the data to numbers.
-        data = convert_to_numbers(data)
-        # Calculate the statistics.
-        statistic_data =  calculate_statistics(data)
-        statistic_data['total_records'] = total_records
+        with metrics.stage("write"):
+            # Print the results to the screen.
+            print_statistics(statistic_data)
 
-        # Write the results to a file.
-        write_to_file("StatisticsResults.txt", statistic_data)
+            if quantile_sketch is not None and sketch_file:
+                quantile_sketch.save(sketch_file)
 
-        # Get the time elapsed for the execution.
-        end_time = time.time()
-        elapsed_time = end_time - start_time
+            # Get the time elapsed for the execution.
+            elapsed_time = metrics.elapsed_seconds()
+
+            # Write the results and the time elapsed to a file.
+            write_to_file(output_file, statistic_data, elapsed_time)
+
+            if cache_key:
+                result_cache.put(cache_key, cache_value(statistic_data, report), file_name,
+                                 output_file)
+
+        metrics.finish()
 
         # Print the time elapsed to the screen.
         print("Elapsed time:", elapsed_time)
+        if result_cache is not None:
+            result_cache.record(metrics)
+            print(result_cache.statistics())
 
-        # Print the time elapsed to the file.
-        with open("StatisticsResults.txt", "a", encoding="utf-8") as file:
-            file.write(f"Elapsed time: {elapsed_time}\n")
+        return statistic_data
 
     except FileNotFoundError as exception :
         print(f"Error: File not found - {exception .filename}")
@@ -188,9 +1010,67 @@ def compute_statistics(file_name):
         print(f"Error: Type error - {exception}")
     except ZeroDivisionError as exception:
         print(f"Error: Division by zero - {exception}")
+    return None
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python compute_statistics.py fileWithData.txt")
-    else:
-        compute_statistics(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        description="Compute descriptive statistics of a file with numbers.")
+    parser.add_argument("file_name",
+                        help="File with one number per line, '-' for the standard input "
+                             "with --window.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read the file line by line in a single pass. The exact "
+                             "median and mode still keep every value; add --approximate "
+                             "and --mode-engine bounded for bounded memory.")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Approximate the median and percentiles with a KLL sketch.")
+    parser.add_argument("--error-bound", type=error_bound_argument, default=0.01,
+                        help="Normalized rank error of the sketch (default 0.01).")
+    parser.add_argument("--percentiles", nargs="+", type=percentile_argument, default=[],
+                        help="Percentiles (0-100) to report, for example 90 99 99.9.")
+    parser.add_argument("--save-sketch", metavar="SKETCH_FILE",
+                        help="Save the sketch to a JSON file to merge it later.")
+    parser.add_argument("--mode-engine", choices=["exact", "bounded"], default="exact",
+                        help="Count every distinct value or use a bounded Space-Saving summary.")
+    parser.add_argument("--mode-capacity", type=int, default=1000,
+                        help="Number of counters of the bounded mode engine (default 1000).")
+    parser.add_argument("--top-modes", type=int, default=0,
+                        help="Report the K most frequent values with their error bounds.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of processes used to split the file (default 1).")
+    parser.add_argument("--backend", choices=["auto", "python", "numpy"], default="auto",
+                        help="Calculation backend; auto uses NumPy when it is installed.")
+    parser.add_argument("--max-warnings", type=int, default=DEFAULT_MAX_SAMPLES,
+                        help="Invalid records shown with their line number; the rest are "
+                             f"only counted (default {DEFAULT_MAX_SAMPLES}).")
+    parser.add_argument("--window", type=int, metavar="N",
+                        help="Print the statistics of the last N values as they are read.")
+    parser.add_argument("--every", type=int, metavar="K",
+                        help="Values between two results of the window (default N).")
+    parser.add_argument("--follow", action="store_true",
+                        help="With --window, wait for new lines at the end of the file.")
+    add_arguments(parser)
+    add_cache_arguments(parser)
+    arguments = parser.parse_args()
+    if arguments.mode_capacity < 1:
+        parser.error("--mode-capacity must be at least 1")
+    if arguments.top_modes < 0:
+        parser.error("--top-modes must be at least 0")
+    if arguments.window is not None and arguments.window < 1:
+        parser.error("--window must be at least 1")
+    if arguments.every is not None and arguments.every < 1:
+        parser.error("--every must be at least 1")
+    run_metrics = Metrics("statistics", arguments.file_name)
+    with profiling(arguments.profile, arguments.trace_memory, run_metrics):
+        compute_statistics(arguments.file_name, stream=arguments.stream,
+                           approximate=arguments.approximate, error_bound=arguments.error_bound,
+                           percentiles=arguments.percentiles, sketch_file=arguments.save_sketch,
+                           mode_engine=arguments.mode_engine,
+                           mode_capacity=arguments.mode_capacity,
+                           top_modes=arguments.top_modes, workers=arguments.workers,
+                           backend=arguments.backend, metrics=run_metrics,
+                           max_warnings=arguments.max_warnings, window=arguments.window,
+                           every=arguments.every, follow=arguments.follow,
+                           result_cache=open_cache(arguments))
+    if arguments.metrics:
+        run_metrics.save(arguments.metrics)
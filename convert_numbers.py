@@ -8,11 +8,45 @@ Requirements:
 - Invalid data in the file is handled, and errors are displayed without interrupting execution.
 - The execution time, including the calculation time, is displayed at the end.
 
+With --format columnar only the numbers are written, to 'ConvertionResults.bin', as
+fixed-width integer columns; ColumnarResults memory maps that file and renders the binary
+and hexadecimal representations when they are read.
+
+With --cache-dir the results file is kept in a result cache (see result_cache.py), and a
+later run with the same options on the unchanged file restores it without reading the
+input.
+
 Usage:
 python convertNumbers.py fileWithData.txt
+python convertNumbers.py fileWithData.txt --bits 32
+python convertNumbers.py fileWithData.txt --cache-size 100000 --cache-file cache.json
+python convertNumbers.py fileWithData.txt --echo sample --sample-every 10000
+python convertNumbers.py fileWithData.txt --echo none --metrics metrics.json
+python convertNumbers.py fileWithData.txt --format columnar --echo summary
+python convertNumbers.py fileWithData.txt --cache-dir ~/.cache/convert
 """
+import argparse
+import json
+import mmap
+import os
+import struct
 import sys
-import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Sequence
+from itertools import islice
+from operator import itemgetter
+
+from input_reader import iter_lines
+from instrumentation import Metrics, add_arguments, measure, profiling
+from number_parser import DEFAULT_MAX_SAMPLES, ErrorReport, parse_integers
+from result_cache import add_arguments as add_cache_arguments, open_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def read_file(file_name):
     """
@@ -22,223 +56,856 @@ def read_file(file_name):
      :return: List of values in the file or an empty list if the file is not found.
     """
     try:
-        with open(file_name, "r", encoding="utf-8") as file:
-            return file.read().splitlines()
+        return [line.decode("utf-8") for line in iter_lines(file_name)]
     except FileNotFoundError as exception:
         print(f"Error: File not found - {exception.filename}")
         return []
 
-def convert_to_numbers(data):
+def convert_to_numbers(data, report=None):
     """
     This function converts the records in a list to numbers by 
     validating that the value is a valid number
-    """
-    numbers = []
 
-    for value in data:
-        try:
-            number = int(value)
-            numbers.append(number)
-        except ValueError as exception:
-            print(f"Warning: The record with the value: '{value}' is "
-                  f"not a valid number - {exception}")
+    Args:
+        data (list): The records as str or bytes.
+        report (ErrorReport): Optional report that receives the invalid records;
+                              by default they are reported on the screen at the end.
 
+    Returns:
+        list: The valid numbers.
+    """
+    if report is not None:
+        return parse_integers(data, report)
+
+    report = ErrorReport()
+    numbers = parse_integers(data, report)
+    report.print_report()
     return numbers
 
-def decimal_a_binario_complemento_a_2(numero_decimal, numero_bits):
+def iter_numbers(file_path, counts, report=None, batch_size=10000):
     """
-    Convierte un número decimal a binario usando complemento a 2 con algoritmos básicos.
+    Lazily reads and validates the numbers of a file, one batch of lines at a time.
 
-    Parámetros:
-    numero_decimal: El número decimal a convertir.
-    numero_bits: El número de bits a usar en la representación binaria.
-
-    Retorno:
-    Una cadena que representa el número decimal en binario usando complemento a 2.
+    Args:
+        file_path (str): The path to the input file.
+        counts (dict): Dictionary where the 'records' and 'invalid' counters
+                       are updated while the generator is consumed.
+        report (ErrorReport): Optional report that receives the invalid records;
+                              by default they are reported on the screen at the end.
+        batch_size (int): Number of lines parsed together.
+
+    Yields:
+        int: Every valid number of the file.
+    """
+    counts.setdefault('records', 0)
+    counts.setdefault('invalid', 0)
+    print_report = report is None
+    if print_report:
+        report = ErrorReport()
+    lines = iter_lines(file_path)
+    while True:
+        records = list(islice(lines, batch_size))
+        if not records:
+            break
+        yield from parse_numbers(records, counts, report)
+    if print_report:
+        report.print_report()
+
+def parse_numbers(records, counts, report, bits=None):
     """
+    Validates a batch of consecutive records read from a file.
 
-    if numero_decimal >= 0:
-        # Conversión a binario estándar
-        binario = ""
-        while numero_decimal > 0:
-            binario = str(numero_decimal % 2) + binario
-            numero_decimal //= 2
-        # Rellenar con ceros a la izquierda si es necesario
-        binario = binario.zfill(numero_bits)
-    else:
-        # Conversión a complemento a 1
-        binario_complemento_a_1 = ""
-        numero_decimal = abs(numero_decimal)
-        while numero_decimal > 0:
-            binario_complemento_a_1 = str(numero_decimal % 2) + binario_complemento_a_1
-            numero_decimal //= 2
-        # Rellenar con ceros a la izquierda si es necesario
-        binario_complemento_a_1 = binario_complemento_a_1.zfill(numero_bits)
-        # Convertir a complemento a 2 sumando 1
-        binario = ""
-        llevar = 1
-        for i in range(numero_bits):
-            suma = int(binario_complemento_a_1[i]) + llevar
-            llevar = suma // 2
-            binario = str(suma % 2) + binario
-
-    return binario
-
-def sum_with_carry(bit1, bit2, carry):
-    """
-    Realizes the sum of bits considering the carry.
+    Args:
+        records (list): The records as bytes.
+        counts (dict): Dictionary where the 'records' and 'invalid' counters
+                       are updated, and with bits 'out_of_range', the part of
+                       the invalid records that do not fit; 'records' also
+                       gives the line number of the first record of the batch.
+        report (ErrorReport): Report that receives the invalid records and the
+                              numbers that do not fit in the width.
+        bits (int): Optional width of the two's complement representations;
+                    the numbers that do not fit are skipped.
+
+    Returns:
+        list: The valid numbers of the batch.
+    """
+    first_line = counts['records'] + 1
+    counts['records'] += len(records)
+    if bits is None:
+        numbers = parse_integers(records, report, first_line)
+        counts['invalid'] += len(records) - len(numbers)
+        return numbers
+
+    # Every invalid record of the batch is kept, so the line of each valid
+    # number is known when some of them do not fit.
+    batch_report = ErrorReport(len(records))
+    numbers = parse_integers(records, batch_report, first_line)
+    counts['invalid'] += len(records) - len(numbers)
+    lines = range(first_line, first_line + len(records))
+    if len(numbers) < len(records):
+        invalid_lines = {line_number for line_number, _, _ in batch_report.samples}
+        lines = [line_number for line_number in lines if line_number not in invalid_lines]
+    fitting = fitting_numbers(numbers, bits, batch_report, lines)
+    # The numbers that do not fit are invalid records too, as in the report.
+    counts['out_of_range'] = counts.get('out_of_range', 0) + len(numbers) - len(fitting)
+    counts['invalid'] += len(numbers) - len(fitting)
+    batch_report.samples.sort(key=itemgetter(0))
+    report.merge(batch_report)
+    return fitting
+
+# Widths used by the original conversions when no explicit width is given.
+DEFAULT_BINARY_BITS = 10
+DEFAULT_HEXADECIMAL_BITS = 40
+
+def signed_width(number):
+    """
+    Returns the minimum number of bits needed to represent a number in two's complement.
 
     Args:
-        bit1 (int): The first bit.
-        bit2 (int): The second bit.
-        carry (int): The carry from the previous sum.
+        number (int): The number.
 
     Returns:
-        tuple: A tuple containing the result of the sum and the new carry.
+        int: The number of bits, including the sign bit.
+    """
+    if number < 0:
+        return (-number - 1).bit_length() + 1
+    return number.bit_length() + 1
+
+def check_width(bits):
     """
-    # Performs the sum of bits considering the carry
-    result = bit1 ^ bit2 ^ carry
+    Checks that a width of a two's complement representation is valid.
 
-    # Calculates the new carry
-    new_carry = (bit1 & bit2) | ((bit1 ^ bit2) & carry)
+    Args:
+        bits (int): The width of the representation.
 
-    return result, new_carry
+    Raises:
+        ValueError: If the width is smaller than 1 bit.
+    """
+    if bits < 1:
+        raise ValueError(f"Invalid width of {bits} bits, it must be at least 1")
 
-def binary_addition(binary1, binary2):
+def fits_width(number, bits):
     """
-    Adds two binary numbers.
+    Checks whether a number can be represented with the given width, either as a
+    signed two's complement number or as an unsigned number.
 
     Args:
-        binary1 (str): The first binary number.
-        binary2 (str): The second binary number.
+        number (int): The number.
+        bits (int): The width of the representation, at least 1.
 
     Returns:
-        str: The result of the binary addition.
+        bool: True if the number fits.
     """
-    # Ensure both strings have the same length, padding with zeros on the left if necessary
-    length = max(len(binary1), len(binary2))
-    binary1 = binary1.zfill(length)
-    binary2 = binary2.zfill(length)
+    return -(1 << (bits - 1)) <= number < (1 << bits)
+
+def twos_complement(number, bits):
+    """
+    Returns the unsigned value whose bits are the two's complement of a number.
+
+    Args:
+        number (int): The number, between -2**(bits - 1) and 2**bits - 1.
+        bits (int): The width of the representation.
 
-    result = ''
-    carry = 0
+    Returns:
+        int: The number masked to the given width.
 
-    # Iterate from the least significant bit to the most significant bit
-    for i in range(length - 1, -1, -1):
-        bit1 = int(binary1[i])
-        bit2 = int(binary2[i])
+    Raises:
+        ValueError: If the width is smaller than 1 bit or the number does not
+                    fit in it.
+    """
+    check_width(bits)
+    if not fits_width(number, bits):
+        raise ValueError(f"The number {number} does not fit in {bits} bits")
+    return number & ((1 << bits) - 1)
 
-        # Perform binary addition with carry
-        sum_result, carry = sum_with_carry(bit1, bit2, carry)
+def format_binary(number, bits=None):
+    """
+    Converts a number to binary in linear time.
 
-        # Add the result to the beginning of the string
-        result = str(sum_result) + result
+    Args:
+        number (int): The number to be converted.
+        bits (int): The width of the representation (8, 16, 32, 64 or any other). If it
+                    is None, positive numbers use the minimum number of digits and
+                    negative numbers use two's complement with 10 bits, or more bits
+                    when the number does not fit in 10.
 
-    # If there is a final carry, add it to the result
-    if carry:
-        result = '1' + result
+    Returns:
+        str: The binary representation, zero padded to the width when one is given.
+    """
+    if bits is not None:
+        return format(twos_complement(number, bits), f"0{bits}b")
+    if number >= 0:
+        return format(number, "b")
+    width = max(DEFAULT_BINARY_BITS, signed_width(number))
+    return format(twos_complement(number, width), "b")
+
+def format_hexadecimal(number, bits=None):
+    """
+    Converts a number to uppercase hexadecimal in linear time.
 
-    return result
+    Args:
+        number (int): The number to be converted.
+        bits (int): The width of the representation (8, 16, 32, 64 or any other). If it
+                    is None, positive numbers use the minimum number of digits and
+                    negative numbers use two's complement with 40 bits, or the next
+                    multiple of 4 bits when the number does not fit in 40.
 
-def convert_to_binary(number):
+    Returns:
+        str: The hexadecimal representation, zero padded to the width when one is given.
+    """
+    if bits is not None:
+        return format(twos_complement(number, bits), f"0{(bits + 3) // 4}X")
+    if number >= 0:
+        return format(number, "X")
+    width = max(DEFAULT_HEXADECIMAL_BITS, signed_width(number))
+    return format(twos_complement(number, (width + 3) // 4 * 4), "X")
+
+def convert_to_binary(number, bits=None):
     """
     Converts a decimal number to binary.
 
     Args:
         number (int): The decimal number to be converted.
+        bits (int): Optional width of the two's complement representation.
 
     Returns:
         str: The binary representation of the input number.
     """
-    if number == 0:
-        binary_result = '0'
-    else:
-        is_negative = False
+    return format_binary(number, bits)
+
+def convert_to_hexadecimal(number, bits=None):
+    """
+    Converts a decimal number to hexadecimal.
 
-        if number < 0:
-            is_negative = True
-            number = abs(number)
+    Args:
+        number (int): The decimal number to be converted.
+        bits (int): Optional width of the two's complement representation.
+
+    Returns:
+        str: The hexadecimal representation of the input number.
+    """
+    return format_hexadecimal(number, bits)
 
-        # Convert to binary
-        binary_result = ''
-        while number > 0:
-            binary_result = str(number % 2) + binary_result
-            number //= 2
+def convert_batch(numbers, bits=None):
+    """
+    Converts many numbers to binary and hexadecimal at once. Every number is
+    masked to its two's complement width once and both representations are
+    rendered from that value. Fixed widths of up to 64 bits use NumPy when
+    it is installed.
 
-        # Pad with zeros to ensure 32 bits
-        binary_result = '0' * (10 - len(binary_result)) + binary_result
+    Args:
+        numbers (iterable): The integers to be converted.
+        bits (int): Optional width of the two's complement representation.
+
+    Returns:
+        tuple: Two lists with the binary and the hexadecimal representations.
 
-        if is_negative:
-            # Perform two's complement for 32 bits
-            binary_result = ''.join('1' if bit == '0' else '0' for bit in binary_result)
-            binary_result = binary_addition(binary_result, '0000000001')
+    Raises:
+        ValueError: If the width is smaller than 1 bit or a number does not
+                    fit in it.
+    """
+    if bits is not None:
+        check_width(bits)
+    numbers = list(numbers)
+    if bits is not None and np is not None and bits <= 64:
+        try:
+            return numpy_convert_batch(np.array(numbers, dtype=np.int64), bits)
+        except OverflowError:
+            # Unsigned 64-bit values above the int64 range.
+            pass
+
+    binaries = []
+    hexadecimals = []
+    if bits is not None:
+        binary_format = f"0{bits}b"
+        hexadecimal_format = f"0{(bits + 3) // 4}X"
+        for number in numbers:
+            unsigned = twos_complement(number, bits)
+            binaries.append(format(unsigned, binary_format))
+            hexadecimals.append(format(unsigned, hexadecimal_format))
+        return binaries, hexadecimals
+
+    for number in numbers:
+        if number >= 0:
+            binaries.append(format(number, "b"))
+            hexadecimals.append(format(number, "X"))
+            continue
+        # The binary width never exceeds the hexadecimal one, so its bits are
+        # the lowest bits of the hexadecimal value.
+        width = signed_width(number)
+        hexadecimal_bits = (max(DEFAULT_HEXADECIMAL_BITS, width) + 3) // 4 * 4
+        unsigned = number & ((1 << hexadecimal_bits) - 1)
+        binary_bits = max(DEFAULT_BINARY_BITS, width)
+        binaries.append(format(unsigned & ((1 << binary_bits) - 1), "b"))
+        hexadecimals.append(format(unsigned, "X"))
+    return binaries, hexadecimals
+
+def numpy_convert_batch(numbers, bits):
+    """
+    Vectorized conversion of an int64 NumPy array to fixed width binary and
+    hexadecimal strings.
 
-        # Remove leading zeros
-        binary_result = binary_result[binary_result.index('1'):] if '1' in binary_result else '0'
+    Args:
+        numbers (numpy.ndarray): The integers to be converted.
+        bits (int): Width of the two's complement representation, up to 64.
 
-    return binary_result
+    Returns:
+        tuple: Two lists with the binary and the hexadecimal representations.
 
-def convert_to_hexadecimal(number):
+    Raises:
+        ValueError: If the width is smaller than 1 bit or a number does not
+                    fit in it.
     """
-    Converts a decimal number to hexadecimal.
+    check_width(bits)
+    if bits < 64:
+        out_of_range = (numbers < -(1 << (bits - 1))) | (numbers >= (1 << bits))
+        if out_of_range.any():
+            raise ValueError(f"The number {numbers[out_of_range.argmax()]} "
+                             f"does not fit in {bits} bits")
+
+    # Big-endian bytes of the two's complement value, one row per number.
+    unsigned = np.ascontiguousarray(numbers, dtype=np.int64).view(np.uint64)
+    if bits < 64:
+        unsigned = unsigned & np.uint64((1 << bits) - 1)
+    row_bytes = unsigned.astype(">u8").view(np.uint8).reshape(-1, 8)
+
+    bit_matrix = np.unpackbits(row_bytes, axis=1)[:, 64 - bits:] + ord("0")
+    binaries = np.ascontiguousarray(bit_matrix).view(f"S{bits}").ravel()
+
+    digits = (bits + 3) // 4
+    nibbles = np.empty((len(numbers), 16), dtype=np.uint8)
+    nibbles[:, 0::2] = row_bytes >> 4
+    nibbles[:, 1::2] = row_bytes & 0x0F
+    hex_table = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+    hex_matrix = hex_table[nibbles[:, 16 - digits:]]
+    hexadecimals = np.ascontiguousarray(hex_matrix).view(f"S{digits}").ravel()
+
+    return binaries.astype(str).tolist(), hexadecimals.astype(str).tolist()
+
+class ConversionCache:
+    """
+    Bounded least recently used cache of conversions keyed by (number, bits).
 
     Args:
-        number (int): The decimal number to be converted.
+        max_size (int): Maximum number of cached conversions.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, key, conversion):
+        self.entries[key] = conversion
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def convert(self, number, bits=None):
+        """
+        Converts a number to binary and hexadecimal, using the cache when possible.
+
+        Args:
+            number (int): The number to be converted.
+            bits (int): Optional width of the two's complement representation.
+
+        Returns:
+            tuple: The binary and the hexadecimal representations.
+        """
+        key = (number, bits)
+        conversion = self.entries.get(key)
+        if conversion is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return conversion
+        self.misses += 1
+        conversion = (format_binary(number, bits), format_hexadecimal(number, bits))
+        self._store(key, conversion)
+        return conversion
+
+    def convert_batch(self, numbers, bits=None):
+        """
+        Cached version of convert_batch. The distinct numbers that are not in
+        the cache are converted together in a single batch.
+
+        Args:
+            numbers (iterable): The integers to be converted.
+            bits (int): Optional width of the two's complement representation.
+
+        Returns:
+            tuple: Two lists with the binary and the hexadecimal representations.
+        """
+        numbers = list(numbers)
+        found = {}
+        missing = []
+        for number in numbers:
+            key = (number, bits)
+            if key in found:
+                self.hits += 1
+                continue
+            conversion = self.entries.get(key)
+            if conversion is None:
+                self.misses += 1
+                found[key] = None
+                missing.append(number)
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                found[key] = conversion
+
+        if missing:
+            missing_binaries, missing_hexadecimals = convert_batch(missing, bits)
+            for number, binary, hexadecimal in zip(missing, missing_binaries,
+                                                   missing_hexadecimals):
+                found[(number, bits)] = (binary, hexadecimal)
+                self._store((number, bits), (binary, hexadecimal))
+
+        conversions = [found[(number, bits)] for number in numbers]
+        return ([binary for binary, _ in conversions],
+                [hexadecimal for _, hexadecimal in conversions])
+
+    def save(self, file_name):
+        """
+        Writes the cached conversions to a JSON file, oldest first.
+
+        Args:
+            file_name (str): The path to the cache file.
+        """
+        with open(file_name, "w", encoding="utf-8") as cache_file:
+            json.dump([[number, bits, binary, hexadecimal]
+                       for (number, bits), (binary, hexadecimal) in self.entries.items()],
+                      cache_file)
+
+    def load(self, file_name):
+        """
+        Reads the conversions saved by save. A missing file is ignored, so the
+        first run starts with an empty cache.
+
+        Args:
+            file_name (str): The path to the cache file.
+        """
+        try:
+            with open(file_name, "r", encoding="utf-8") as cache_file:
+                saved_entries = json.load(cache_file)
+        except FileNotFoundError:
+            return
+        for number, bits, binary, hexadecimal in saved_entries:
+            self._store((number, bits), (binary, hexadecimal))
+
+    def statistics(self):
+        """
+        Returns a summary of the cache usage.
+
+        Returns:
+            str: The hits, misses, hit rate and size of the cache.
+        """
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return (f"Cache hits: {self.hits}, misses: {self.misses}, "
+                f"hit rate: {hit_rate:.2%}, size: {len(self.entries)}/{self.max_size}")
+
+def fitting_numbers(numbers, bits, report=None, lines=None):
+    """
+    Returns the numbers that fit in the given width. The others are skipped and
+    recorded in the report with the 'out_of_range' error class.
+
+    Args:
+        numbers (list): The integers to be checked.
+        bits (int): The width of the two's complement representations.
+        report (ErrorReport): Optional report that receives the numbers that do
+                              not fit; by default they are reported on the
+                              screen.
+        lines (list): Optional line number of every number; by default their
+                      position, starting at 1.
 
     Returns:
-        str: The hexadecimal representation of the input number.
+        list: The numbers that fit.
+
+    Raises:
+        ValueError: If the width is smaller than 1 bit.
     """
-    number_original = number
-    hexadecimal_result = ''
+    check_width(bits)
+    fitting = [number for number in numbers if fits_width(number, bits)]
+    if len(fitting) == len(numbers):
+        return fitting
+    print_report = report is None
+    if print_report:
+        report = ErrorReport()
+    if lines is None:
+        lines = range(1, len(numbers) + 1)
+    report.extend([(line_number, str(number), 'out_of_range')
+                   for line_number, number in zip(lines, numbers)
+                   if not fits_width(number, bits)])
+    if print_report:
+        report.print_report()
+    return fitting
+
+def convert_fitting(numbers, bits=None, cache=None):
+    """
+    Converts a list of numbers that fit in the given width.
+
+    Args:
+        numbers (list): The integers to be converted.
+        bits (int): Optional width of the two's complement representations.
+        cache (ConversionCache): Optional cache of repeated conversions.
 
-    if number == 0:
-        hexadecimal_result = '0'
+    Returns:
+        list: A list of tuples containing the original number, binary, and hexadecimal
+              representations.
+    """
+    if cache is not None:
+        binaries, hexadecimals = cache.convert_batch(numbers, bits)
     else:
-        if number < 0:
-            number = abs(number)
+        binaries, hexadecimals = convert_batch(numbers, bits)
+    return list(zip(numbers, binaries, hexadecimals))
 
-            # Convert to binary
-            binary_result = ''
-            while number > 0:
-                binary_result = str(number % 2) + binary_result
-                number //= 2
+def iter_number_batches(file_path, bits=None, counts=None, batch_size=10000, metrics=None,
+                        report=None):
+    """
+    Lazy read and parse pipeline. Records are read and parsed in batches of
+    batch_size, and the numbers that do not fit in the given width are skipped.
 
-            # Pad with zeros to ensure 40 bits
-            binary_result = '0' * (40 - len(binary_result)) + binary_result
+    Args:
+        file_path (str): The path to the input file.
+        bits (int): Optional width of the two's complement representations.
+        counts (dict): Optional dictionary updated with the 'records' and
+                       'invalid' counters.
+        batch_size (int): Number of records processed together.
+        metrics (Metrics): Optional Metrics object that receives the read and
+                           parse times of every batch.
+        report (ErrorReport): Optional report that receives the invalid records
+                              and the numbers that do not fit; by default they
+                              are reported on the screen at the end.
+
+    Yields:
+        list: Lists of the valid numbers of every batch.
+    """
+    if counts is None:
+        counts = {}
+    counts.setdefault('records', 0)
+    counts.setdefault('invalid', 0)
+    print_report = report is None
+    if print_report:
+        report = ErrorReport()
+    lines = iter_lines(file_path)
+    while True:
+        with measure(metrics, "read"):
+            records = list(islice(lines, batch_size))
+        if not records:
+            break
+        with measure(metrics, "parse"):
+            numbers = parse_numbers(records, counts, report, bits)
+        yield numbers
+    if print_report:
+        report.print_report()
+
+def iter_conversions(file_path, bits=None, cache=None, counts=None, batch_size=10000,
+                     metrics=None, report=None):
+    """
+    Lazy read, parse and convert pipeline. Records are read, parsed and converted
+    in batches of batch_size, so memory does not grow with the size of the input.
 
-            # Perform two's complement for 32 bits
-            binary_result = ''.join('1' if bit == '0' else '0' for bit in binary_result)
-            binary_result = binary_addition(binary_result, '0' * 39 + '1')
+    Args:
+        file_path (str): The path to the input file.
+        bits (int): Optional width of the two's complement representations.
+        cache (ConversionCache): Optional cache of repeated conversions.
+        counts (dict): Optional dictionary updated with the 'records' and
+                       'invalid' counters.
+        batch_size (int): Number of records processed together.
+        metrics (Metrics): Optional Metrics object that receives the read, parse
+                           and compute times of every batch.
+        report (ErrorReport): Optional report that receives the invalid records;
+                              by default they are reported on the screen at the end.
+
+    Yields:
+        list: Lists of (number, binary, hexadecimal) tuples.
+    """
+    for numbers in iter_number_batches(file_path, bits, counts, batch_size, metrics, report):
+        with measure(metrics, "compute"):
+            results = convert_fitting(numbers, bits, cache)
+        yield results
+
+def format_result(result):
+    """
+    Formats a conversion result as a line of text.
+
+    Args:
+        result (tuple): The number, binary and hexadecimal representations.
+
+    Returns:
+        str: The formatted line, including the line terminator.
+    """
+    return f"Number: {result[0]}, Binary: {result[1]}, Hexadecimal: {result[2]}\n"
+
+def write_results_stream(batches, result_file, echo="all", sample_every=1000):
+    """
+    Writes batches of conversion results to an open file, with one write call
+    per batch, and echoes them to the console.
+
+    Args:
+        batches (iterable): Lists of (number, binary, hexadecimal) tuples.
+        result_file (file): Open text file to write to.
+        echo (str): 'all' prints every row, 'sample' every sample_every-th row,
+                    'summary' and 'none' print no rows.
+        sample_every (int): Interval between printed rows in 'sample' mode.
+
+    Returns:
+        int: The number of results written.
+    """
+    total_results = 0
+    for batch in batches:
+        text = "".join(format_result(result) for result in batch)
+        result_file.write(text)
+        if echo == "all":
+            sys.stdout.write(text)
+        elif echo == "sample":
+            # Rows whose position in the whole output is a multiple of sample_every.
+            first = -total_results % sample_every
+            sys.stdout.write("".join(format_result(result)
+                                     for result in batch[first::sample_every]))
+        total_results += len(batch)
+    return total_results
+
+# Columnar results file: a 16-byte header with the magic, the format version and
+# the --bits width (0 for the default widths), followed by one block per batch.
+# Every block is a 16-byte header with its row count and the byte width of its
+# values, then the values as little-endian two's complement integers of that
+# width, padded to a multiple of 8 bytes so the columns stay aligned when the
+# file is memory mapped.
+COLUMNAR_MAGIC = b"CNVC"
+COLUMNAR_VERSION = 1
+COLUMNAR_HEADER = struct.Struct("<4sBxh8x")
+COLUMNAR_BLOCK = struct.Struct("<QB7x")
+COLUMNAR_ALIGNMENT = 8
+
+# Array typecodes of the widths that are read without a copy; other widths,
+# used by numbers beyond 64 bits, are decoded one value at a time.
+NATIVE_TYPECODES = {array(typecode).itemsize: typecode for typecode in "bhilq"}
+
+def value_width(numbers):
+    """
+    Returns the byte width of the column of a batch: the smallest of 1, 2, 4 or
+    8 bytes that holds all the numbers, or the exact number of bytes needed
+    beyond 64 bits.
+
+    Args:
+        numbers (list): The integers of the batch.
+
+    Returns:
+        int: The width in bytes.
+    """
+    if not numbers:
+        return 1
+    width = (max(signed_width(min(numbers)), signed_width(max(numbers))) + 7) // 8
+    for native_width in (1, 2, 4, 8):
+        if width <= native_width:
+            return native_width
+    return width
+
+def encode_block(numbers):
+    """
+    Encodes a batch of numbers as a block of the columnar format.
+
+    Args:
+        numbers (list): The integers of the batch.
+
+    Returns:
+        bytes: The block header, the values and the padding.
+    """
+    width = value_width(numbers)
+    if width in NATIVE_TYPECODES and sys.byteorder == "little":
+        values = array(NATIVE_TYPECODES[width], numbers).tobytes()
+    else:
+        values = b"".join(number.to_bytes(width, "little", signed=True)
+                          for number in numbers)
+    padding = b"\0" * (-len(values) % COLUMNAR_ALIGNMENT)
+    return COLUMNAR_BLOCK.pack(len(numbers), width) + values + padding
 
-            # Ensure multiple of 4
-            binary_result = binary_result.zfill((len(binary_result) + 3) // 4 * 4)
-            hex_chars = '0123456789ABCDEF'
+def write_results_columnar(batches, result_file, bits=None, echo="all", sample_every=1000):
+    """
+    Writes batches of numbers to an open binary file in the columnar format.
+    Only the numbers are stored; the binary and hexadecimal representations are
+    rendered when the file is read, see ColumnarResults. Rows are only rendered
+    here when they are echoed to the console.
 
-            for i in range(0, len(binary_result), 4):
-                chunk = binary_result[i:i+4]
-                decimal_value = int(chunk, 2)
-                hexadecimal_result += hex_chars[decimal_value]
+    Args:
+        batches (iterable): Lists of the integers to write, already checked to
+                            fit in the given width.
+        result_file (file): Open binary file to write to.
+        bits (int): Optional width of the two's complement representations,
+                    stored in the header.
+        echo (str): 'all' prints every row, 'sample' every sample_every-th row,
+                    'summary' and 'none' print no rows.
+        sample_every (int): Interval between printed rows in 'sample' mode.
 
+    Returns:
+        int: The number of results written.
+    """
+    result_file.write(COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, bits or 0))
+    total_results = 0
+    for numbers in batches:
+        if not numbers:
+            continue
+        result_file.write(encode_block(numbers))
+        if echo == "all":
+            echoed = numbers
+        elif echo == "sample":
+            echoed = numbers[-total_results % sample_every::sample_every]
         else:
-            # Convert to hexadecimal
-            temp_number = abs(number_original)
-            while temp_number > 0:
-                remainder = temp_number % 16
-                if remainder < 10:
-                    hexadecimal_result = str(remainder) + hexadecimal_result
-                else:
-                    hexadecimal_result = chr(ord('A') + remainder - 10) + hexadecimal_result
-                temp_number //= 16
+            echoed = []
+        if echoed:
+            sys.stdout.write("".join(format_result(result)
+                                     for result in convert_fitting(echoed, bits)))
+        total_results += len(numbers)
+    return total_results
+
+class ColumnarResults(Sequence):
+    """
+    Read-only sequence of the numbers of a columnar results file. The file is
+    memory mapped, so opening it does not read or parse the values; only the
+    block headers are scanned. The binary and hexadecimal representations are
+    rendered on demand, exactly as in the text results file.
+
+    Args:
+        file_name (str): The path to the columnar results file.
 
-    return hexadecimal_result
+    Raises:
+        ValueError: If the file is not a columnar results file.
+    """
 
-def process_file(file_path):
+    def __init__(self, file_name):
+        with open(file_name, "rb") as result_file:
+            size = os.fstat(result_file.fileno()).st_size
+            if size < COLUMNAR_HEADER.size:
+                raise ValueError(f"'{file_name}' is not a columnar results file")
+            self._buffer = mmap.mmap(result_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, bits = COLUMNAR_HEADER.unpack_from(self._buffer, 0)
+        if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+            self._buffer.close()
+            raise ValueError(f"'{file_name}' is not a columnar results file")
+        self.bits = bits or None
+        # (first row, row count, width, offset of the values) of every block.
+        self.blocks = []
+        self._first_rows = []
+        total_rows = 0
+        offset = COLUMNAR_HEADER.size
+        while offset < size:
+            count, width = COLUMNAR_BLOCK.unpack_from(self._buffer, offset)
+            offset += COLUMNAR_BLOCK.size
+            self.blocks.append((total_rows, count, width, offset))
+            self._first_rows.append(total_rows)
+            total_rows += count
+            offset += count * width + (-count * width % COLUMNAR_ALIGNMENT)
+        self._length = total_rows
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("result index out of range")
+        first_row, _, width, offset = self.blocks[bisect_right(self._first_rows, index) - 1]
+        start = offset + (index - first_row) * width
+        return int.from_bytes(self._buffer[start:start + width], "little", signed=True)
+
+    def __iter__(self):
+        for block in range(len(self.blocks)):
+            yield from self.block_numbers(block)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception_info):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps the file.
+        """
+        self._buffer.close()
+
+    def column(self, block):
+        """
+        Returns the values of a block without copying them, as a memoryview of
+        the mapped file; it has to be released before closing the results.
+
+        Args:
+            block (int): The index of the block.
+
+        Returns:
+            memoryview: The values, or None for widths without an array typecode.
+        """
+        _, count, width, offset = self.blocks[block]
+        if width not in NATIVE_TYPECODES or sys.byteorder != "little":
+            return None
+        with memoryview(self._buffer) as buffer:
+            return buffer[offset:offset + count * width].cast(NATIVE_TYPECODES[width])
+
+    def block_numbers(self, block):
+        """
+        Returns the values of a block.
+
+        Args:
+            block (int): The index of the block.
+
+        Returns:
+            list: The integers of the block.
+        """
+        _, count, width, offset = self.blocks[block]
+        values = self.column(block)
+        if values is not None:
+            with values:
+                return values.tolist()
+        return [int.from_bytes(self._buffer[start:start + width], "little", signed=True)
+                for start in range(offset, offset + count * width, width)]
+
+    def binary(self, index):
+        """
+        Renders the binary representation of a result.
+
+        Args:
+            index (int): The position of the result.
+
+        Returns:
+            str: The binary representation.
+        """
+        return format_binary(self[index], self.bits)
+
+    def hexadecimal(self, index):
+        """
+        Renders the hexadecimal representation of a result.
+
+        Args:
+            index (int): The position of the result.
+
+        Returns:
+            str: The hexadecimal representation.
+        """
+        return format_hexadecimal(self[index], self.bits)
+
+    def rows(self):
+        """
+        Renders all the results, one block at a time.
+
+        Yields:
+            tuple: The number, binary and hexadecimal representations.
+        """
+        for block in range(len(self.blocks)):
+            yield from convert_fitting(self.block_numbers(block), self.bits)
+
+def process_file(file_path, bits=None, cache=None):
     """
     Reads a file containing a list of numbers, converts each number to binary and hexadecimal,
     and returns the results.
 
     Args:
         file_path (str): The path to the input file.
+        bits (int): Optional width of the two's complement representations.
+        cache (ConversionCache): Optional cache of repeated conversions.
 
     Returns:
         list or None: A list of tuples containing the original number, binary, and hexadecimal 
@@ -258,15 +925,10 @@ def process_file(file_path):
         print("Total records to analyze:", total_records)
 
 
-        numbers = convert_to_numbers(data)
-
-        results = []
-        for number in numbers:
-            binary = convert_to_binary(number)
-            hexadecimal = convert_to_hexadecimal(number)
-            results.append((number, binary, hexadecimal))
-
-        return results
+        report = ErrorReport()
+        numbers = parse_numbers(data, {'records': 0, 'invalid': 0}, report, bits)
+        report.print_report()
+        return convert_fitting(numbers, bits, cache)
 
     except FileNotFoundError:
         print(f"Error: File '{file_path}' not found.")
@@ -291,33 +953,267 @@ def write_results_to_file(results):
                               f"Binary: {result[1]}, "
                               f"Hexadecimal: {result[2]}\n")
 
-def main():
+def echo_cached_results(output_file, output_format="text", echo="all", sample_every=1000):
     """
-    The main function that orchestrates the execution of the program.
+    Prints the rows of a results file restored from the result cache, as
+    write_results_stream and write_results_columnar echo them.
 
-    Parses command line arguments, processes the input file, performs conversions,
-    writes results to a file, and prints the results along with the elapsed time.
+    Args:
+        output_file (str): The path to the results file.
+        output_format (str): 'text' or 'columnar'.
+        echo (str): 'all' prints every row, 'sample' every sample_every-th row,
+                    'summary' and 'none' print no rows.
+        sample_every (int): Interval between printed rows in 'sample' mode.
+    """
+    if echo not in ("all", "sample"):
+        return
+    step = sample_every if echo == "sample" else 1
+    if output_format == "columnar":
+        with ColumnarResults(output_file) as results:
+            for result in islice(results.rows(), 0, None, step):
+                sys.stdout.write(format_result(result))
+        return
+    with open(output_file, "r", encoding="utf-8") as result_file:
+        for line in islice(result_file, 0, None, step):
+            # The last line is the elapsed time of the run that was cached.
+            if line.startswith("Number: "):
+                sys.stdout.write(line)
+
+def summary_line(counts):
+    """
+    Returns the line that summarizes the counters of a run. As in the error
+    report, the invalid records include the numbers that do not fit in the
+    width, which are also shown on their own.
+
+    Args:
+        counts (dict): The counters returned by convert_file.
+
+    Returns:
+        str: The summary line.
+    """
+    out_of_range = ""
+    if 'out_of_range' in counts:
+        out_of_range = f" (out of range: {counts['out_of_range']})"
+    return (f"Total records analyzed: {counts['records']}, invalid: {counts['invalid']}"
+            f"{out_of_range}, converted: {counts['converted']}")
+
+def result_cache_key(result_cache, input_file, bits=None, output_format="text",
+                     max_warnings=DEFAULT_MAX_SAMPLES):
     """
-    start_time = time.time()
+    Returns the result cache key of the conversions of a file, built only from
+    the options that change the results file and the printed report.
+
+    Args:
+        result_cache (ResultCache): The cache where the key is looked up.
+        input_file (str): The path to the input file.
+        bits (int): Optional width of the two's complement representations.
+        output_format (str): 'text' or 'columnar'.
+        max_warnings (int): Invalid records shown with their line number.
 
-    if len(sys.argv) != 2:
-        print("Usage: python convertNumbers.py fileWithData.txt")
-        sys.exit(1)
+    Returns:
+        str: Hexadecimal key, or None if the input cannot be cached.
+    """
+    return result_cache.key("convert", input_file, {
+        'bits': bits, 'output_format': output_format, 'max_warnings': max_warnings})
 
-    input_file = sys.argv[1]
-    conversion_results = process_file(input_file)
+def convert_file(input_file, output_file="ConvertionResults.txt", bits=None, cache=None,
+                 echo="all", sample_every=1000, metrics=None,
+                 max_warnings=DEFAULT_MAX_SAMPLES, output_format="text", result_cache=None):
+    """
+    Converts the numbers of a file and writes the results and the elapsed time to a file.
 
-    if conversion_results is not None:
-        write_results_to_file(conversion_results)
-        for result in conversion_results:
-            print(f"Number: {result[0]}, Binary: {result[1]}, Hexadecimal: {result[2]}")
+    Args:
+        input_file (str): The path to the input file.
+        output_file (str): The path to the results file.
+        bits (int): Optional width of the two's complement representations.
+        cache (ConversionCache): Optional cache of repeated conversions.
+        echo (str): Rows printed on the screen, see write_results_stream.
+        sample_every (int): Interval between printed rows in 'sample' mode.
+        metrics (Metrics): Optional Metrics object that receives the stage timings
+                           and counters; the elapsed time is measured from its creation.
+        max_warnings (int): Invalid records shown with their line number; the
+                            rest are only counted.
+        output_format (str): 'text' writes one line per result and the elapsed
+                             time; 'columnar' writes only the numbers in the
+                             binary format read by ColumnarResults, without
+                             converting them.
+        result_cache (ResultCache): Optional cache of results; when it has the
+                                    results of the same file and options they
+                                    are restored without reading the file.
 
-    end_time = time.time()
-    elapsed_time = end_time - start_time
+    Returns:
+        dict: The 'records', 'invalid' and 'converted' counters, 'out_of_range'
+              with bits, and the 'elapsed_time'.
+
+    Raises:
+        ValueError: If bits is smaller than 1.
+    """
+    if bits is not None:
+        check_width(bits)
+    if metrics is None:
+        metrics = Metrics("convert", input_file)
+
+    cache_key = None
+    if result_cache is not None:
+        with metrics.stage("read"):
+            cache_key = result_cache_key(result_cache, input_file, bits, output_format,
+                                         max_warnings)
+        cached = result_cache.get(cache_key, output_file) if cache_key else None
+        if cached is not None:
+            return convert_cached(cached, output_file, echo, sample_every, metrics,
+                                  output_format, result_cache)
+
+    counts = {'records': 0, 'invalid': 0, 'converted': 0}
+    if bits is not None:
+        counts['out_of_range'] = 0
+    report = ErrorReport(max_warnings)
+    columnar = output_format == "columnar"
+    if columnar:
+        result_file = open(output_file, "wb", buffering=1 << 20)
+    else:
+        result_file = open(output_file, "w", encoding="utf-8", buffering=1 << 20)
+    with result_file:
+        try:
+            # Reading, parsing and converting run lazily inside the write stage
+            # and are subtracted from it.
+            with metrics.stage("write"):
+                if columnar:
+                    counts['converted'] = write_results_columnar(
+                        iter_number_batches(input_file, bits, counts, metrics=metrics,
+                                            report=report),
+                        result_file, bits, echo, sample_every)
+                else:
+                    counts['converted'] = write_results_stream(
+                        iter_conversions(input_file, bits, cache, counts, metrics=metrics,
+                                         report=report),
+                        result_file, echo, sample_every)
+            report.print_report()
+            if counts['records'] == 0:
+                print("Error: Empty data in the file.")
+            elif echo != "none":
+                print(summary_line(counts))
+        except FileNotFoundError:
+            print(f"Error: File '{input_file}' not found.")
+
+        metrics.count("rows", counts['records'])
+        metrics.count("invalid_rows", counts['invalid'])
+        if counts['records']:
+            metrics.count("bytes", os.path.getsize(input_file))
+        elapsed_time = metrics.elapsed_seconds()
+        print(f"Time elapsed: {elapsed_time} seconds")
+        if cache is not None:
+            print(cache.statistics())
+        # Print the time elapsed to the file.
+        if not columnar:
+            result_file.write(f"Elapsed time: {elapsed_time}\n")
+
+    if cache_key and counts['records']:
+        result_cache.put(cache_key, {'counts': counts, 'warnings': report.lines()},
+                         input_file, output_file)
+    if result_cache is not None:
+        result_cache.record(metrics)
+        print(result_cache.statistics())
+    metrics.finish()
+    counts['elapsed_time'] = elapsed_time
+    return counts
+
+def convert_cached(cached, output_file, echo, sample_every, metrics, output_format,
+                   result_cache):
+    """
+    Prints the results of convert_file restored from the result cache.
+
+    Args:
+        cached (dict): The 'counts' and the error report 'warnings' of the run
+                       that was cached.
+        output_file (str): The path to the restored results file.
+        echo (str): Rows printed on the screen, see write_results_stream.
+        sample_every (int): Interval between printed rows in 'sample' mode.
+        metrics (Metrics): Metrics object of the run.
+        output_format (str): 'text' or 'columnar'.
+        result_cache (ResultCache): The cache, whose statistics are printed.
+
+    Returns:
+        dict: The same counters as convert_file.
+    """
+    counts = cached['counts']
+    with metrics.stage("write"):
+        echo_cached_results(output_file, output_format, echo, sample_every)
+        if cached['warnings']:
+            print("\n".join(cached['warnings']))
+        if echo != "none":
+            print(summary_line(counts))
+    elapsed_time = metrics.elapsed_seconds()
     print(f"Time elapsed: {elapsed_time} seconds")
-    # Print the time elapsed to the file.
-    with open("ConvertionResults.txt", "a", encoding="utf-8") as file:
-        file.write(f"Elapsed time: {elapsed_time}\n")
+    result_cache.record(metrics)
+    print(result_cache.statistics())
+    metrics.finish()
+    counts['elapsed_time'] = elapsed_time
+    return counts
+
+def main():
+    """
+    The main function that orchestrates the execution of the program.
+
+    Parses command line arguments, processes the input file, performs conversions,
+    writes results to a file, and prints the results along with the elapsed time.
+    The input is processed as a stream of batches, so memory stays constant.
+    """
+    run_metrics = Metrics("convert")
+
+    parser = argparse.ArgumentParser(
+        prog="convertNumbers.py",
+        description="Convert the numbers of a file to binary and hexadecimal.")
+    parser.add_argument("input_file", help="File with one integer per line.")
+    parser.add_argument("--bits", type=int,
+                        help="Width of the two's complement representation, for example "
+                             "8, 16, 32 or 64. By default positive numbers use the minimum "
+                             "number of digits and negative numbers 10 bits in binary "
+                             "and 40 bits in hexadecimal.")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Cache up to this many conversions of repeated numbers "
+                             "(default 0, no cache).")
+    parser.add_argument("--cache-file",
+                        help="Load the cache from this JSON file and save it back at the "
+                             "end, so later runs start warm.")
+    parser.add_argument("--echo", choices=["all", "sample", "summary", "none"], default="all",
+                        help="Rows printed on the screen: all of them (default), a sample, "
+                             "only the summary or nothing.")
+    parser.add_argument("--sample-every", type=int, default=1000,
+                        help="Print one row out of this many with --echo sample.")
+    parser.add_argument("--max-warnings", type=int, default=DEFAULT_MAX_SAMPLES,
+                        help="Invalid records shown with their line number; the rest are "
+                             f"only counted (default {DEFAULT_MAX_SAMPLES}).")
+    parser.add_argument("--format", choices=["text", "columnar"], default="text",
+                        help="Results file format: text lines in ConvertionResults.txt "
+                             "(default) or the compact binary columnar format in "
+                             "ConvertionResults.bin, rendered when it is read.")
+    add_arguments(parser)
+    add_cache_arguments(parser)
+    arguments = parser.parse_args()
+    if arguments.bits is not None and arguments.bits < 1:
+        parser.error("--bits must be at least 1")
+    if arguments.sample_every < 1:
+        parser.error("--sample-every must be at least 1")
+    run_metrics.input_file = arguments.input_file
+
+    cache = None
+    if arguments.cache_size > 0:
+        cache = ConversionCache(arguments.cache_size)
+        if arguments.cache_file:
+            cache.load(arguments.cache_file)
+
+    with profiling(arguments.profile, arguments.trace_memory, run_metrics):
+        convert_file(arguments.input_file,
+                     output_file=("ConvertionResults.bin" if arguments.format == "columnar"
+                                  else "ConvertionResults.txt"),
+                     bits=arguments.bits, cache=cache,
+                     echo=arguments.echo, sample_every=arguments.sample_every,
+                     metrics=run_metrics, max_warnings=arguments.max_warnings,
+                     output_format=arguments.format, result_cache=open_cache(arguments))
+    if cache is not None and arguments.cache_file:
+        cache.save(arguments.cache_file)
+    if arguments.metrics:
+        run_metrics.save(arguments.metrics)
 
 
 if __name__ == "__main__":
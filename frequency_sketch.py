@@ -0,0 +1,242 @@
+"""
+frequency_sketch.py - Bounded-memory frequency estimators used to find the most frequent
+values of a stream without keeping a counter for every distinct value.
+
+SpaceSavingSketch keeps at most `capacity` monitored values. When a new value arrives and
+the table is full, the value with the smallest count is replaced and the new one inherits
+that count as its error. For every monitored value the true frequency lies between
+count - error and count, and any value whose frequency is above total / capacity is
+guaranteed to be monitored.
+
+CountMinTopK combines a Count-Min sketch with a heap of the k most frequent items seen so
+far. The sketch has `depth` rows of `width` counters; an item is counted in one counter per
+row and its estimate is the smallest of them. Estimates never undercount, and with
+probability at least 1 - exp(-depth) they overcount by at most e / width * total. Memory is
+fixed: width * depth counters plus k heap entries.
+"""
+import hashlib
+import heapq
+import math
+from array import array
+
+
+class SpaceSavingSketch:
+    """
+    Space-Saving heavy hitters summary with a fixed number of counters.
+
+     :param capacity: Maximum number of monitored values.
+    """
+
+    def __init__(self, capacity=1000):
+        if capacity < 1:
+            raise ValueError("the capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # Min-heap of (count, value) entries; entries whose count no longer
+        # matches self.counts are stale and skipped when evicting.
+        self._heap = []
+
+    def _push(self, value):
+        heapq.heappush(self._heap, (self.counts[value], value))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_minimum(self):
+        while True:
+            count, value = heapq.heappop(self._heap)
+            if self.counts.get(value) == count:
+                return count, value
+
+    def add(self, value, count=1):
+        """
+        Adds occurrences of a value to the summary.
+
+         :param value: Value to add.
+         :param count: Number of occurrences.
+        """
+        self.total += count
+        if value in self.counts:
+            self.counts[value] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[value] = count
+            self.errors[value] = 0
+        else:
+            minimum_count, minimum_value = self._pop_minimum()
+            del self.counts[minimum_value]
+            del self.errors[minimum_value]
+            self.counts[value] = minimum_count + count
+            self.errors[value] = minimum_count
+        self._push(value)
+
+    def _missing_count(self):
+        """
+        Returns the most times a value that is not monitored may have
+        occurred: the smallest count when the summary is full, otherwise 0.
+        """
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other):
+        """
+        Merges another summary into this one, keeping the `capacity` values
+        with the largest combined counts.
+
+        A value missing from a full summary may still have occurred up to its
+        minimum count times, so that minimum is added to both the count and
+        the error of every value the summary does not monitor. This keeps
+        count - error <= true frequency <= count after the merge.
+
+         :param other: SpaceSavingSketch to merge.
+        """
+        own_minimum = self._missing_count()
+        other_minimum = other._missing_count()
+        counts = {}
+        errors = {}
+        for value in self.counts.keys() | other.counts.keys():
+            counts[value] = (self.counts.get(value, own_minimum)
+                             + other.counts.get(value, other_minimum))
+            errors[value] = (self.errors.get(value, own_minimum)
+                             + other.errors.get(value, other_minimum))
+        kept = heapq.nlargest(self.capacity, counts.items(), key=lambda item: item[1])
+        self.counts = dict(kept)
+        self.errors = {value: errors[value] for value in self.counts}
+        self.total += other.total
+        self._heap = [(count, value) for value, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def top_k(self, k):
+        """
+        Returns the k most frequent values.
+
+         :param k: Number of values to return.
+         :return: List of (value, count, error) tuples sorted by count, ties
+                  broken by the largest value.
+        """
+        top_items = heapq.nlargest(k, self.counts.items(),
+                                   key=lambda item: (item[1], item[0]))
+        return [(value, count, self.errors[value]) for value, count in top_items]
+
+    def result(self):
+        """
+        Returns the estimated mode. If the result is multimodal the maximum
+        value is taken, as in compute_statistics.calculate_statistics.
+        """
+        if not self.counts:
+            raise ValueError("the summary is empty")
+        return self.top_k(1)[0][0]
+
+    def error_bound(self):
+        """
+        Returns the maximum overestimation of any reported count.
+        """
+        return self.total // self.capacity
+
+
+class CountMinTopK:
+    """
+    Count-Min sketch with a heavy hitters heap of the k most frequent items.
+    Items are strings; they are hashed with BLAKE2b, so sketches built in
+    different processes can be merged.
+
+     :param k: Number of most frequent items to keep.
+     :param width: Counters per row; the overcount is at most e / width * total.
+     :param depth: Number of rows; the bound holds with probability 1 - exp(-depth).
+    """
+
+    def __init__(self, k=10, width=2 ** 16, depth=4):
+        if k < 1 or width < 1 or depth < 1:
+            raise ValueError("k, width and depth must be at least 1")
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.rows = [array("Q", bytes(8 * width)) for _ in range(depth)]
+        self.candidates = {}
+        # Min-heap of (estimate, item) entries; stale entries are skipped.
+        self._heap = []
+
+    def _columns(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + row * second) % self.width for row in range(self.depth)]
+
+    def estimate(self, item):
+        """
+        Returns the estimated count of an item.
+
+         :param item: Item to look up.
+        """
+        return min(row[column] for row, column in zip(self.rows, self._columns(item)))
+
+    def _offer(self, item, estimate):
+        if item in self.candidates or len(self.candidates) < self.k:
+            self.candidates[item] = estimate
+            heapq.heappush(self._heap, (estimate, item))
+        else:
+            minimum_estimate, minimum_item = self._heap[0]
+            while self.candidates.get(minimum_item) != minimum_estimate:
+                heapq.heappop(self._heap)
+                minimum_estimate, minimum_item = self._heap[0]
+            if estimate > minimum_estimate:
+                heapq.heappop(self._heap)
+                del self.candidates[minimum_item]
+                self.candidates[item] = estimate
+                heapq.heappush(self._heap, (estimate, item))
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(value, key) for key, value in self.candidates.items()]
+            heapq.heapify(self._heap)
+
+    def add(self, item, count=1):
+        """
+        Adds occurrences of an item.
+
+         :param item: Item to add.
+         :param count: Number of occurrences.
+        """
+        self.total += count
+        estimate = None
+        for row, column in zip(self.rows, self._columns(item)):
+            row[column] += count
+            if estimate is None or row[column] < estimate:
+                estimate = row[column]
+        self._offer(item, estimate)
+
+    def merge(self, other):
+        """
+        Merges a sketch with the same width and depth into this one.
+
+         :param other: CountMinTopK to merge.
+        """
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("only sketches with the same width and depth can be merged")
+        for row, other_row in zip(self.rows, other.rows):
+            for column, value in enumerate(other_row):
+                if value:
+                    row[column] += value
+        self.total += other.total
+        items = set(self.candidates) | set(other.candidates)
+        estimates = {item: self.estimate(item) for item in items}
+        self.candidates = dict(heapq.nlargest(self.k, estimates.items(),
+                                              key=lambda entry: entry[1]))
+        self._heap = [(value, key) for key, value in self.candidates.items()]
+        heapq.heapify(self._heap)
+
+    def top_k(self):
+        """
+        Returns the most frequent items.
+
+         :return: List of (item, estimated count) tuples, most frequent first.
+        """
+        return sorted(self.candidates.items(), key=lambda entry: entry[1], reverse=True)
+
+    def error_bound(self):
+        """
+        Returns the maximum overcount of any estimate, which holds with
+        probability at least 1 - exp(-depth).
+        """
+        return math.e / self.width * self.total
@@ -0,0 +1,247 @@
+"""
+input_reader.py - Shared input layer for compute_statistics.py, convert_numbers.py and
+word_count.py.
+
+Plain files are memory-mapped and records are returned as bytes slices of the mapping, so
+the file is never read or decoded as a whole and the memory used does not depend on its
+size. Gzip and bzip2 files (detected by their magic bytes) are decompressed as a stream.
+
+Records are either newline-delimited lines (numeric tools) or blocks that end on ASCII
+whitespace, so no word is split between two blocks (word_count). Byte ranges aligned to
+the same boundaries can be computed to process a file in parallel.
+
+Streams such as the standard input or a file that is still being written are read with
+iter_line_batches, which returns the lines as soon as they arrive and can keep following
+the file like tail -f.
+"""
+import bz2
+import gzip
+import mmap
+import os
+import re
+import sys
+import time
+
+# Size of the blocks returned by iter_blocks.
+BLOCK_SIZE = 1 << 20
+
+# Largest read from a stream in iter_line_batches.
+STREAM_BLOCK_SIZE = 1 << 16
+
+# Seconds between the checks of a followed file for new data.
+POLL_INTERVAL = 0.25
+
+# Bytes that separate words. They are ASCII, so they never appear inside a
+# multi-byte UTF-8 character.
+ASCII_WHITESPACE = b" \t\n\r\x0b\x0c"
+
+GZIP_MAGIC = b"\x1f\x8b"
+BZIP2_MAGIC = b"BZh"
+
+
+def compression_of(file_name):
+    """
+    Detects the compression of a file from its first bytes.
+
+     :param file_name: Name of the file.
+     :return: 'gzip', 'bz2' or None for uncompressed files.
+    """
+    with open(file_name, "rb") as file:
+        magic = file.read(3)
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic.startswith(BZIP2_MAGIC):
+        return "bz2"
+    return None
+
+
+def _open_compressed(file_name, compression):
+    if compression == "gzip":
+        return gzip.open(file_name, "rb")
+    return bz2.open(file_name, "rb")
+
+
+def iter_lines(file_name, start=0, end=None):
+    """
+    Iterates over the lines of a file without loading it into memory.
+
+     :param file_name: Name of the file to read.
+     :param start: Byte offset of the first line; it must be the start of a line.
+     :param end: Byte offset where reading stops, the end of the file by default.
+                 Ranges only apply to uncompressed files.
+     :return: Generator of the lines as bytes without the line terminator.
+    """
+    compression = compression_of(file_name)
+    if compression:
+        with _open_compressed(file_name, compression) as stream:
+            for line in stream:
+                yield line.rstrip(b"\r\n")
+        return
+
+    with open(file_name, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return
+        end = size if end is None else min(end, size)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            buffer.seek(start)
+            position = start
+            while position < end:
+                line = buffer.readline()
+                if not line:
+                    break
+                position += len(line)
+                yield line.rstrip(b"\r\n")
+
+
+def iter_blocks(file_name, block_size=BLOCK_SIZE, start=0, end=None):
+    """
+    Iterates over a file in blocks of bytes.
+
+     :param file_name: Name of the file to read.
+     :param block_size: Size of each block.
+     :param start: Byte offset where reading starts.
+     :param end: Byte offset where reading stops, the end of the file by default.
+                 Ranges only apply to uncompressed files.
+     :return: Generator of bytes blocks.
+    """
+    compression = compression_of(file_name)
+    if compression:
+        with _open_compressed(file_name, compression) as stream:
+            for block in iter(lambda: stream.read(block_size), b""):
+                yield block
+        return
+
+    with open(file_name, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return
+        end = size if end is None else min(end, size)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for position in range(start, end, block_size):
+                yield buffer[position:min(position + block_size, end)]
+
+
+def iter_whitespace_blocks(file_name, block_size=BLOCK_SIZE, start=0, end=None):
+    """
+    Iterates over a file in blocks that end on ASCII whitespace, so words are
+    never split between two blocks and every block can be decoded on its own.
+
+     :param file_name: Name of the file to read.
+     :param block_size: Approximate size of each block.
+     :param start: Byte offset where reading starts; it must be a word boundary.
+     :param end: Byte offset where reading stops, the end of the file by default.
+     :return: Generator of bytes blocks.
+    """
+    carry = b""
+    for block in iter_blocks(file_name, block_size, start, end):
+        if carry:
+            block = carry + block
+        cut = max(block.rfind(separator) for separator in ASCII_WHITESPACE)
+        if cut < 0:
+            carry = block
+            continue
+        carry = block[cut + 1:]
+        yield block[:cut + 1]
+    if carry:
+        yield carry
+
+
+def iter_line_batches(file_name, follow=False, poll_interval=POLL_INTERVAL,
+                      block_size=STREAM_BLOCK_SIZE):
+    """
+    Iterates over the lines of a stream in batches, returning the complete lines
+    available after every read instead of waiting for a full block, so slow
+    streams are processed as they arrive.
+
+     :param file_name: Name of the file to read, or '-' for the standard input.
+     :param follow: At the end of the file wait for new lines instead of
+                    stopping, like tail -f; the file is read again from the
+                    start if it is truncated.
+     :param poll_interval: Seconds between the checks for new data when following.
+     :param block_size: Largest number of bytes read at a time.
+     :return: Generator of non-empty lists of lines as bytes without the line
+              terminator.
+    """
+    if file_name == "-":
+        stream = sys.stdin.buffer
+    else:
+        stream = open(file_name, "rb")  # pylint: disable=consider-using-with
+    carry = b""
+    try:
+        while True:
+            block = stream.read1(block_size)
+            if not block:
+                if not follow:
+                    break
+                if stream.seekable() and os.fstat(stream.fileno()).st_size < stream.tell():
+                    stream.seek(0)
+                    carry = b""
+                time.sleep(poll_interval)
+                continue
+            block = carry + block
+            lines = block.split(b"\n")
+            carry = lines.pop()
+            if b"\r" in block:
+                lines = [line.rstrip(b"\r") for line in lines]
+            if lines:
+                yield lines
+        if carry:
+            yield [carry.rstrip(b"\r")]
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+
+def last_boundary(file_name, start, end, separators=ASCII_WHITESPACE):
+    """
+    Finds the end of the last complete record of a byte range.
+
+     :param file_name: Name of the uncompressed file.
+     :param start: Byte offset where the range starts.
+     :param end: Byte offset where the range ends.
+     :param separators: Bytes that end a record, ASCII whitespace by default.
+     :return: The offset right after the last separator of the range, or start
+              if the range has no separator.
+    """
+    if end <= start:
+        return start
+    with open(file_name, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            last = max(buffer.rfind(bytes([separator]), start, end)
+                       for separator in separators)
+    return last + 1 if last >= 0 else start
+
+
+def split_ranges(file_name, parts, separators=b"\n"):
+    """
+    Splits a file in byte ranges of similar size, each one starting right
+    after one of the separator bytes.
+
+     :param file_name: Name of the file to split.
+     :param parts: Number of ranges wanted.
+     :param separators: Bytes that are valid boundaries, newline by default.
+                        Use ASCII_WHITESPACE to split on word boundaries.
+     :return: List of (start, end) byte offsets; it may have fewer than parts
+              elements for small files. Compressed files cannot be split and
+              return a single (0, None) range.
+    """
+    if compression_of(file_name):
+        return [(0, None)]
+
+    size = os.path.getsize(file_name)
+    if size == 0:
+        return []
+    separator_pattern = re.compile(b"[" + re.escape(separators) + b"]")
+    boundaries = [0]
+    with open(file_name, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for part in range(1, parts):
+                position = size * part // parts
+                if position <= boundaries[-1]:
+                    continue
+                # Move to the first byte after the next separator.
+                match = separator_pattern.search(buffer, position - 1)
+                boundaries.append(match.end() if match else size)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
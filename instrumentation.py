@@ -0,0 +1,251 @@
+"""
+instrumentation.py - Per-stage timing, throughput and memory metrics shared by
+compute_statistics.py, convert_numbers.py and word_count.py.
+
+A Metrics object records the time spent in the read, parse, compute and write stages
+with time.perf_counter_ns. Stages can be nested, for example a lazy reader consumed
+while writing; the time of an inner stage is only counted in the inner stage, so the
+stages add up to the measured time and the rest is reported as 'other'. The tools time
+whole batches or blocks instead of single records, so the overhead is negligible.
+
+Besides the stages a run reports its rows, invalid rows, bytes, rows and bytes per
+second and the peak resident memory. Metrics are saved as JSON, or in the Prometheus
+text exposition format when the file name ends in .prom.
+
+The profiling context manager optionally runs cProfile and tracemalloc around a run.
+"""
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Stages reported by the tools, in pipeline order.
+STAGES = ("read", "parse", "compute", "write")
+
+# Functions and allocation sites printed after a profiled run.
+PROFILE_LINES = 20
+
+
+def peak_rss_bytes(who="self"):
+    """
+    Returns the peak resident set size in bytes.
+
+     :param who: 'self' for this process or 'children' for the largest of the
+                 terminated child processes, such as the workers of a pool.
+     :return: The size in bytes, or None where the resource module is missing.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self"
+                               else resource.RUSAGE_CHILDREN)
+    # Linux reports kibibytes and macOS bytes.
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+class Metrics:
+    """
+    Stage timings and counters of one run of a tool.
+
+     :param tool: Name of the tool, used as a label.
+     :param input_file: Name of the input file, used as a label.
+    """
+
+    def __init__(self, tool, input_file=None):
+        self.tool = tool
+        self.input_file = input_file
+        self.stages = {}
+        self.counters = {}
+        self.tracemalloc_peak = None
+        self._stack = []
+        self._start = time.perf_counter_ns()
+        self._end = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Context manager that adds the time spent inside it to a stage, minus
+        the time of the stages nested in it.
+
+         :param name: Name of the stage.
+        """
+        frame = [time.perf_counter_ns(), 0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter_ns() - frame[0]
+            self.stages[name] = self.stages.get(name, 0) + elapsed - frame[1]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def timed(self, iterable, name):
+        """
+        Wraps an iterable so the time spent producing each item is added to a
+        stage. Use it with iterables of blocks or batches, not single records.
+
+         :param iterable: Iterable to wrap.
+         :param name: Name of the stage.
+         :return: Generator of the items of the iterable.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name, value=1):
+        """
+        Adds to a counter such as 'rows', 'invalid_rows' or 'bytes'.
+
+         :param name: Name of the counter.
+         :param value: Amount to add.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self):
+        """
+        Stops the clock of the run; later calls keep the first end time.
+        """
+        if self._end is None:
+            self._end = time.perf_counter_ns()
+
+    def elapsed_seconds(self):
+        """
+        Returns the seconds since the run started, or until finish was called.
+        """
+        end = self._end if self._end is not None else time.perf_counter_ns()
+        return (end - self._start) / 1e9
+
+    def to_dict(self):
+        """
+        Returns the metrics as a JSON serializable dictionary.
+        """
+        elapsed_seconds = self.elapsed_seconds()
+        stages = {name: self.stages[name] / 1e9
+                  for name in (*STAGES, *sorted(set(self.stages) - set(STAGES)))
+                  if name in self.stages}
+        stages['other'] = max(0.0, elapsed_seconds - sum(stages.values()))
+        metrics_data = {
+            'tool': self.tool,
+            'input_file': self.input_file,
+            'elapsed_seconds': elapsed_seconds,
+            'stage_seconds': stages,
+        }
+        metrics_data.update(self.counters)
+        for name in ('rows', 'bytes'):
+            if name in self.counters and elapsed_seconds > 0:
+                metrics_data[f"{name}_per_second"] = self.counters[name] / elapsed_seconds
+        metrics_data['peak_rss_bytes'] = peak_rss_bytes()
+        metrics_data['peak_children_rss_bytes'] = peak_rss_bytes("children")
+        if self.tracemalloc_peak is not None:
+            metrics_data['tracemalloc_peak_bytes'] = self.tracemalloc_peak
+        return metrics_data
+
+    def to_prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        metrics_data = self.to_dict()
+        input_file = str(self.input_file).replace("\\", "\\\\").replace('"', '\\"')
+        labels = f'tool="{self.tool}",input="{input_file}"'
+        lines = ["# HELP run_stage_seconds Time spent in each stage of the run.",
+                 "# TYPE run_stage_seconds gauge"]
+        for name, seconds in metrics_data['stage_seconds'].items():
+            lines.append(f'run_stage_seconds{{{labels},stage="{name}"}} {seconds:.9f}')
+        for name, value in metrics_data.items():
+            if name in ('tool', 'input_file', 'stage_seconds') or value is None:
+                continue
+            lines.append(f"# TYPE run_{name} gauge")
+            lines.append(f"run_{name}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, file_name):
+        """
+        Writes the metrics to a file, in the Prometheus text format if its name
+        ends in .prom and as JSON otherwise.
+
+         :param file_name: Name of the file to write to.
+        """
+        with open(file_name, "w", encoding="utf-8") as file:
+            if os.path.splitext(file_name)[1] == ".prom":
+                file.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), file, indent=2)
+
+
+def measure(metrics, name):
+    """
+    Returns metrics.stage(name), or a context manager that does nothing when
+    there are no metrics to record.
+
+     :param metrics: Metrics object or None.
+     :param name: Name of the stage.
+    """
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.stage(name)
+
+
+@contextlib.contextmanager
+def profiling(profile_file=None, trace_memory=False, metrics=None):
+    """
+    Context manager that profiles the code run inside it.
+
+     :param profile_file: If given, run cProfile, save the statistics to this
+                          file (readable with pstats or snakeviz) and print the
+                          functions with the largest cumulative time.
+     :param trace_memory: Trace the allocations with tracemalloc and print the
+                          lines that allocated the most memory still in use.
+     :param metrics: Optional Metrics object that receives the tracemalloc peak.
+    """
+    profiler = cProfile.Profile() if profile_file else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+            print(f"Profile saved to {profile_file}")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if metrics is not None:
+                metrics.tracemalloc_peak = peak
+            print(f"Traced memory peak: {peak} bytes")
+            for statistic in snapshot.statistics("lineno")[:PROFILE_LINES]:
+                print(statistic)
+
+
+def add_arguments(parser):
+    """
+    Adds the --metrics, --profile and --trace-memory options to a parser.
+
+     :param parser: argparse.ArgumentParser of a tool.
+    """
+    parser.add_argument("--metrics", metavar="METRICS_FILE",
+                        help="Write per-stage timings, throughput and peak memory to this "
+                             "file, in Prometheus text format if it ends in .prom and as "
+                             "JSON otherwise.")
+    parser.add_argument("--profile", metavar="PROFILE_FILE",
+                        help="Run with cProfile and save the statistics to this file.")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Trace allocations with tracemalloc and print the largest.")
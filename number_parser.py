@@ -0,0 +1,222 @@
+"""
+number_parser.py - Shared fast-path parser of numeric records used by compute_statistics.py
+and convert_numbers.py.
+
+Records are parsed in batches. A clean batch is converted with a single map() call. When
+a batch has invalid records it is split in chunks of CHUNK_SIZE records and the clean
+chunks are still converted with map(). In the chunks with errors every record is
+pre-classified with a cheap byte-level check of its last byte: a number can only end
+with a digit, a dot, whitespace or the last letter of inf, nan or infinity. Records like
+'n/a', '12x' or '0x1G' are rejected without calling float() or int() and paying for the
+exception; only the plausible records take the float()/int() path.
+
+The results are exactly the ones float() and int() give, including the retry with the
+decoded text of bytes records.
+
+Invalid records are not printed one by one. They are collected in an ErrorReport that
+counts them by error class and keeps the first samples with their line numbers, and the
+report is printed once at the end.
+"""
+import sys
+from collections import Counter
+from operator import itemgetter
+
+# Samples kept by default by an ErrorReport.
+DEFAULT_MAX_SAMPLES = 10
+
+# Characters of a sample shown in the report.
+SAMPLE_LENGTH = 80
+
+# Descriptions of the error classes.
+ERROR_CLASSES = {
+    'empty': "empty record",
+    'non_numeric': "not a number",
+    'not_integer': "not an integer",
+    'malformed': "malformed number",
+    'out_of_range': "does not fit in the requested width",
+}
+
+# Records are converted in chunks of this size when a batch has invalid records.
+CHUNK_SIZE = 64
+
+# Last characters a number can end with: digits, a dot, whitespace and the last letter
+# of inf, nan and infinity. Non-ASCII characters are also plausible.
+_PLAUSIBLE_ENDS = "0123456789. \t\n\r\x0b\x0c\x1c\x1d\x1e\x1ffFnNyY"
+PLAUSIBLE_ENDS = {bytes: {character.encode() for character in _PLAUSIBLE_ENDS},
+                  str: set(_PLAUSIBLE_ENDS)}
+
+
+class ErrorReport:
+    """
+    Aggregated report of the invalid records of a file: the count of each
+    error class and the first samples with their line numbers.
+
+     :param max_samples: Maximum number of samples kept.
+    """
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.counts = {}
+        self.samples = []
+
+    @property
+    def total(self):
+        """
+        Returns the number of invalid records.
+        """
+        return sum(self.counts.values())
+
+    def add(self, line_number, record, error_class):
+        """
+        Records an invalid record.
+
+         :param line_number: Line of the record, starting at 1.
+         :param record: Record as str or bytes.
+         :param error_class: One of the keys of ERROR_CLASSES.
+        """
+        self.counts[error_class] = self.counts.get(error_class, 0) + 1
+        if len(self.samples) < self.max_samples:
+            self._add_sample(line_number, record, error_class)
+
+    def _add_sample(self, line_number, record, error_class):
+        if isinstance(record, bytes):
+            record = record.decode("utf-8", "replace")
+        if len(record) > SAMPLE_LENGTH:
+            record = record[:SAMPLE_LENGTH] + "..."
+        self.samples.append((line_number, record, error_class))
+
+    def extend(self, invalid_records):
+        """
+        Records several invalid records at once.
+
+         :param invalid_records: List of (line_number, record, error_class) tuples.
+        """
+        for error_class, count in Counter(map(itemgetter(2), invalid_records)).items():
+            self.counts[error_class] = self.counts.get(error_class, 0) + count
+        for line_number, record, error_class in invalid_records[
+                :max(self.max_samples - len(self.samples), 0)]:
+            self._add_sample(line_number, record, error_class)
+
+    def merge(self, other, line_offset=0):
+        """
+        Merges the report of a later part of the file into this one.
+
+         :param other: ErrorReport to merge.
+         :param line_offset: Lines before the part of the file of the other
+                             report, added to the line numbers of its samples.
+        """
+        for error_class, count in other.counts.items():
+            self.counts[error_class] = self.counts.get(error_class, 0) + count
+        free_samples = self.max_samples - len(self.samples)
+        self.samples.extend((line_number + line_offset, record, error_class)
+                            for line_number, record, error_class
+                            in other.samples[:max(free_samples, 0)])
+
+    def lines(self):
+        """
+        Returns the lines of text of the report; none if there are no errors.
+        """
+        if not self.counts:
+            return []
+        classes = ", ".join(f"{error_class}: {count}"
+                            for error_class, count in sorted(self.counts.items()))
+        report_lines = [f"Warning: {self.total} invalid records ({classes})"]
+        for line_number, record, error_class in self.samples:
+            report_lines.append(f"Warning: The record with the value: '{record}' at line "
+                                f"{line_number} is not a valid number - "
+                                f"{ERROR_CLASSES[error_class]}")
+        if self.total > len(self.samples):
+            report_lines.append(f"Warning: {self.total - len(self.samples)} more invalid "
+                                f"records not shown")
+        return report_lines
+
+    def print_report(self, file=None):
+        """
+        Prints the report with a single write.
+
+         :param file: Open text file, the standard output by default.
+        """
+        report_lines = self.lines()
+        if report_lines:
+            (file or sys.stdout).write("\n".join(report_lines) + "\n")
+
+
+def _convert_slow(record, converter):
+    """
+    Converts a plausible record that float() or int() rejected, returning
+    (number, None) or (None, error_class).
+    """
+    try:
+        # float() and int() only accept ASCII digits in bytes, so retry with
+        # the text.
+        if isinstance(record, bytes) and not record.isascii():
+            return converter(record.decode("utf-8")), None
+    except ValueError:
+        pass
+    if converter is int:
+        try:
+            float(record)
+            return None, 'not_integer'
+        except ValueError:
+            pass
+    return None, 'malformed'
+
+
+def _parse(records, converter, report, first_line):
+    try:
+        return list(map(converter, records))
+    except ValueError:
+        pass
+
+    numbers = []
+    invalid_records = []
+    ends = PLAUSIBLE_ENDS[type(records[0])]
+    for start in range(0, len(records), CHUNK_SIZE):
+        chunk = records[start:start + CHUNK_SIZE]
+        try:
+            numbers += list(map(converter, chunk))
+            continue
+        except ValueError:
+            pass
+
+        for line_number, record in enumerate(chunk, start=first_line + start):
+            tail = record[-1:]
+            if tail in ends or not tail.isascii():
+                try:
+                    numbers.append(converter(record))
+                    continue
+                except ValueError:
+                    number, error_class = _convert_slow(record, converter)
+            else:
+                number, error_class = None, 'non_numeric' if tail else 'empty'
+            if error_class is None:
+                numbers.append(number)
+            else:
+                invalid_records.append((line_number, record, error_class))
+    if report is not None:
+        report.extend(invalid_records)
+    return numbers
+
+
+def parse_floats(records, report=None, first_line=1):
+    """
+    Parses a batch of records as floats, skipping the invalid ones.
+
+     :param records: List of records as str or bytes.
+     :param report: Optional ErrorReport that receives the invalid records.
+     :param first_line: Line number of the first record of the batch.
+     :return: List of the valid numbers.
+    """
+    return _parse(records, float, report, first_line)
+
+
+def parse_integers(records, report=None, first_line=1):
+    """
+    Parses a batch of records as integers, skipping the invalid ones.
+
+     :param records: List of records as str or bytes.
+     :param report: Optional ErrorReport that receives the invalid records.
+     :param first_line: Line number of the first record of the batch.
+     :return: List of the valid numbers.
+    """
+    return _parse(records, int, report, first_line)
@@ -0,0 +1,203 @@
+"""
+order_statistics.py - Exact order statistics (median and nearest-rank quantiles) used by
+compute_statistics.py without sorting the data.
+
+The values at the requested ranks are found with introselect: a quickselect that
+partitions the values around a pivot and only keeps working on the parts that contain a
+requested rank, so the expected time is linear instead of the O(n log n) of a sort.
+Several ranks, such as the two middle values and the percentiles, are selected in the
+same pass, and the part above the pivot is not built when no rank falls in it.
+
+Every pass compares each value of the part, so large parts are narrowed as in the
+Floyd-Rivest algorithm: a sorted random sample gives a window of
+values that almost surely contains the ranks, and a single pass keeps only the values of
+the window, usually a small fraction of them. When the ranks are far apart the sample
+gives instead a pivot between them. Small parts use the median of three random values
+as the pivot and, as in introselect, a part that is still too large after 2 * log2(n)
+partitions is sorted, so the worst case stays O(n log n). Data that is already sorted is
+detected first and indexed directly, and small data is simply sorted.
+
+The partitions are new lists, so the caller's data is never reordered. The results are
+the same as indexing the sorted data.
+"""
+import itertools
+import math
+import operator
+import random
+
+# Parts with at most this many values are sorted instead of partitioned.
+SORT_THRESHOLD = 32
+
+# Data with at most this many values is sorted: the sort runs in C and is faster
+# than partitioning in Python below a few thousand values.
+SMALL_DATA_SIZE = 2048
+
+# Parts with at least this many values are narrowed with a random sample.
+SAMPLE_THRESHOLD = 65536
+
+# Largest random sample sorted to estimate the window of the ranks.
+MAX_SAMPLE_SIZE = 100000
+
+_random = random.Random(0)
+
+
+def nearest_rank(fraction, count):
+    """
+    Returns the 0-based rank of a quantile with the nearest-rank method.
+
+     :param fraction: Fraction between 0 and 1.
+     :param count: Number of values.
+    """
+    return max(1, math.ceil(fraction * count)) - 1
+
+
+def _median_of_three(values):
+    first, second, third = (values[_random.randrange(len(values))] for _ in range(3))
+    if first > second:
+        first, second = second, first
+    if second > third:
+        second = third
+    return first if first > second else second
+
+
+def _sample_bounds(values, ranks):
+    """
+    Estimates from a sorted random sample a window [lower, upper] of values
+    that should contain all the ranks, or a pivot that splits the ranks in two
+    groups when they are too far apart. Returns (lower, upper, pivot) with None
+    for the unused values.
+    """
+    sample = sorted(_random.sample(values, min(MAX_SAMPLE_SIZE,
+                                                round(len(values) ** (2 / 3)))))
+    scale = len(sample) / len(values)
+    margin = math.ceil(math.sqrt(len(sample) * math.log(len(values))))
+    lower_index = math.floor(ranks[0] * scale) - margin
+    upper_index = math.ceil(ranks[-1] * scale) + margin
+    if len(ranks) == 1 or upper_index - lower_index <= len(sample) // 4:
+        return (sample[lower_index] if lower_index >= 0 else None,
+                sample[upper_index] if upper_index < len(sample) else None, None)
+    # Split at the largest gap between consecutive ranks.
+    gap, split = max((ranks[index + 1] - ranks[index], index)
+                     for index in range(len(ranks) - 1))
+    return None, None, sample[int((ranks[split] + gap / 2) * scale)]
+
+
+def _select(values, ranks, offset, depth, results):
+    """
+    Stores in results the values of the part at the given sorted ranks, which
+    are relative to the part; offset is the rank of the first value of the part.
+    """
+    if len(values) <= SORT_THRESHOLD or depth == 0:
+        ordered = sorted(values)
+        for rank in ranks:
+            results[rank + offset] = ordered[rank]
+        return
+
+    if len(values) < SAMPLE_THRESHOLD:
+        pivot = _median_of_three(values)
+    else:
+        lower, upper, pivot = _sample_bounds(values, ranks)
+        if pivot is None:
+            # Keep only the values of the window, usually a small fraction.
+            if lower is None:
+                window = [value for value in values if value <= upper]
+                below = 0
+            elif upper is None:
+                window = [value for value in values if lower <= value]
+                below = len(values) - len(window)
+            else:
+                window = [value for value in values if lower <= value <= upper]
+                below = len([value for value in values if value < lower])
+            if (below <= ranks[0] and ranks[-1] < below + len(window)
+                    and len(window) < len(values)):
+                _select(window, [rank - below for rank in ranks], offset + below,
+                        depth - 1, results)
+                return
+            # The sample was unlucky, partition around a value of the window.
+            pivot = _median_of_three(window) if window else _median_of_three(values)
+
+    lows = [value for value in values if value < pivot]
+    if ranks[-1] < len(lows):
+        _select(lows, ranks, offset, depth - 1, results)
+        return
+    highs = [value for value in values if value > pivot]
+    # Values equal to the pivot are not copied: they fill the ranks between both parts.
+    equal_end = len(values) - len(highs)
+
+    low_ranks = [rank for rank in ranks if rank < len(lows)]
+    high_ranks = [rank - equal_end for rank in ranks if rank >= equal_end]
+    for rank in ranks:
+        if len(lows) <= rank < equal_end:
+            results[rank + offset] = pivot
+    if low_ranks:
+        _select(lows, low_ranks, offset, depth - 1, results)
+    if high_ranks:
+        _select(highs, high_ranks, offset + equal_end, depth - 1, results)
+
+
+def select(data, ranks):
+    """
+    Returns the values that would be at the given positions of the sorted data,
+    without sorting or modifying the data.
+
+     :param data: Sequence of numbers.
+     :param ranks: Iterable of 0-based ranks, each lower than len(data).
+     :return: List with the value of each rank, in the order of ranks.
+    """
+    ranks = list(ranks)
+    for rank in ranks:
+        if not 0 <= rank < len(data):
+            raise IndexError(f"rank {rank} out of range for {len(data)} values")
+    if not ranks:
+        return []
+    if len(data) <= SMALL_DATA_SIZE:
+        ordered = sorted(data)
+        return [ordered[rank] for rank in ranks]
+    # Input that is already sorted, which a sort handles in linear time, is
+    # detected with a pass that stops at the first value out of order.
+    if all(map(operator.le, data, itertools.islice(data, 1, None))):
+        return [data[rank] for rank in ranks]
+    results = {}
+    _select(data, sorted(set(ranks)), 0, 2 * max(1, len(data).bit_length()), results)
+    return [results[rank] for rank in ranks]
+
+
+def median_and_quantiles(data, fractions=()):
+    """
+    Returns the median and the nearest-rank quantiles of the data, selected in a
+    single pass.
+
+     :param data: Non-empty sequence of numbers.
+     :param fractions: Iterable of fractions between 0 and 1.
+     :return: Tuple of the median and the list with the value of each quantile.
+    """
+    middle = len(data) // 2
+    middle_ranks = [middle - 1, middle] if len(data) % 2 == 0 else [middle]
+    values = select(data, middle_ranks + [nearest_rank(fraction, len(data))
+                                          for fraction in fractions])
+    if len(data) % 2 == 0:
+        middle_value = (values[0] + values[1]) / 2
+    else:
+        middle_value = values[0]
+    return middle_value, values[len(middle_ranks):]
+
+
+def median(data):
+    """
+    Returns the median of the data; the mean of the two middle values when the
+    count is even.
+
+     :param data: Non-empty sequence of numbers.
+    """
+    return median_and_quantiles(data)[0]
+
+
+def quantiles(data, fractions):
+    """
+    Returns the nearest-rank quantiles of the data.
+
+     :param data: Non-empty sequence of numbers.
+     :param fractions: Iterable of fractions between 0 and 1.
+     :return: List with the value of each quantile.
+    """
+    return select(data, [nearest_rank(fraction, len(data)) for fraction in fractions])
@@ -0,0 +1,240 @@
+"""
+quantile_sketch.py - An approximate quantile sketch (KLL) used by compute_statistics.py to
+report the median and other percentiles without storing or sorting the whole dataset.
+
+The sketch keeps a hierarchy of compactors. Items on level h stand for 2**h input values;
+when a level is full it is sorted and every other item is promoted to the next level. With
+k items on the top level the normalized rank error is roughly 1.7 / k, so the sketch is
+configured with the error bound instead of k. Sketches are mergeable and can be saved to
+and loaded from JSON files, so partial results computed separately can be combined later.
+
+Usage:
+python quantile_sketch.py partialSketch1.json partialSketch2.json [--percentiles 50 90 99]
+"""
+import argparse
+import json
+import math
+import random
+
+# Ratio between the capacities of two consecutive compactors.
+CAPACITY_RATIO = 2 / 3
+
+# Empirical constant relating k with the normalized rank error.
+ERROR_CONSTANT = 1.7
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch with a configurable normalized rank error.
+
+     :param error_bound: Maximum expected rank error as a fraction of the count.
+     :param seed: Optional seed for the random compactions.
+    """
+
+    def __init__(self, error_bound=0.01, seed=None):
+        if not 0 < error_bound < 1:
+            raise ValueError("the error bound must be between 0 and 1")
+        self.error_bound = error_bound
+        self.k = max(8, math.ceil(ERROR_CONSTANT / error_bound))
+        self.count = 0
+        self.compactors = [[]]
+        self.size = 0
+        self.max_size = self._capacity(0)
+        self._random = random.Random(seed)
+
+    def _capacity(self, height):
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(CAPACITY_RATIO ** depth * self.k)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(height) for height in range(len(self.compactors)))
+
+    def _compress(self):
+        for height, compactor in enumerate(self.compactors):
+            if len(compactor) >= self._capacity(height):
+                if height + 1 >= len(self.compactors):
+                    self._grow()
+                compactor.sort()
+                offset = self._random.randint(0, 1)
+                self.compactors[height + 1].extend(compactor[offset::2])
+                compactor.clear()
+                self.size = sum(len(level) for level in self.compactors)
+                if self.size < self.max_size:
+                    break
+
+    def add(self, value):
+        """
+        Adds a value to the sketch.
+
+         :param value: Number to add.
+        """
+        self.compactors[0].append(value)
+        self.count += 1
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def update(self, values):
+        """
+        Adds every value of an iterable to the sketch.
+
+         :param values: Iterable of numbers.
+        """
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """
+        Merges another sketch into this one.
+
+         :param other: KLLSketch to merge.
+        """
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for height, compactor in enumerate(other.compactors):
+            self.compactors[height].extend(compactor)
+        self.count += other.count
+        self.size = sum(len(level) for level in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+
+    def _weighted_items(self):
+        items = []
+        for height, compactor in enumerate(self.compactors):
+            weight = 2 ** height
+            items.extend((value, weight) for value in compactor)
+        items.sort()
+        return items
+
+    def quantiles(self, fractions):
+        """
+        Returns the approximate quantiles of the values seen so far.
+
+         :param fractions: Iterable of fractions between 0 and 1.
+         :return: List with the value of each quantile.
+        """
+        if self.count == 0:
+            raise ValueError("the sketch is empty")
+        items = self._weighted_items()
+        total_weight = sum(weight for _, weight in items)
+        results = []
+        for fraction in fractions:
+            target = max(1, math.ceil(fraction * total_weight))
+            cumulative_weight = 0
+            for value, weight in items:
+                cumulative_weight += weight
+                if cumulative_weight >= target:
+                    break
+            results.append(value)
+        return results
+
+    def quantile(self, fraction):
+        """
+        Returns the approximate quantile of the values seen so far.
+
+         :param fraction: Fraction between 0 and 1, 0.5 is the median.
+        """
+        return self.quantiles([fraction])[0]
+
+    def result(self):
+        """
+        Returns the approximate median, so the sketch can be used as the
+        median sub-accumulator of compute_statistics.stream_statistics.
+        """
+        return self.quantile(0.5)
+
+    def to_dict(self):
+        """
+        Returns a JSON serializable representation of the sketch.
+        """
+        return {
+            'error_bound': self.error_bound,
+            'count': self.count,
+            'compactors': self.compactors
+        }
+
+    @classmethod
+    def from_dict(cls, sketch_data, seed=None):
+        """
+        Builds a sketch from the representation returned by to_dict.
+
+         :param sketch_data: Dictionary with the sketch data.
+         :param seed: Optional seed for the random compactions.
+        """
+        sketch = cls(sketch_data['error_bound'], seed)
+        sketch.compactors = [list(level) for level in sketch_data['compactors']]
+        sketch.count = sketch_data['count']
+        sketch.size = sum(len(level) for level in sketch.compactors)
+        sketch.max_size = sum(sketch._capacity(height)
+                              for height in range(len(sketch.compactors)))
+        return sketch
+
+    def save(self, file_name):
+        """
+        Writes the sketch to a JSON file.
+
+         :param file_name: Name of the file to write to.
+        """
+        with open(file_name, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Reads a sketch from a JSON file written by save.
+
+         :param file_name: Name of the file to read.
+        """
+        with open(file_name, "r", encoding="utf-8") as file:
+            return cls.from_dict(json.load(file))
+
+
+def merge_sketches(file_names):
+    """
+    Loads and merges the sketches saved in several files.
+
+     :param file_names: Names of the sketch files.
+     :return: The merged KLLSketch.
+    """
+    merged_sketch = None
+    for file_name in file_names:
+        sketch = KLLSketch.load(file_name)
+        if merged_sketch is None:
+            merged_sketch = sketch
+        else:
+            merged_sketch.merge(sketch)
+    return merged_sketch
+
+
+def percentile_label(percentile):
+    """
+    Returns the label used for a percentile, for example 'p90' or 'p99.9'.
+
+     :param percentile: Percentile between 0 and 100.
+    """
+    return f"p{percentile:g}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge saved quantile sketches and print their quantiles.")
+    parser.add_argument("sketch_files", nargs="+", help="Sketch files to merge.")
+    parser.add_argument("--percentiles", nargs="+", type=float, default=[50, 90, 99, 99.9],
+                        help="Percentiles to report.")
+    parser.add_argument("--output", help="Write the merged sketch to this file.")
+    arguments = parser.parse_args()
+
+    try:
+        result_sketch = merge_sketches(arguments.sketch_files)
+        print("Total valid records:", result_sketch.count)
+        for label_percentile, value_percentile in zip(
+                arguments.percentiles,
+                result_sketch.quantiles(p / 100 for p in arguments.percentiles)):
+            print(f"{percentile_label(label_percentile)}: {value_percentile}")
+        if arguments.output:
+            result_sketch.save(arguments.output)
+    except FileNotFoundError as exception:
+        print(f"Error: File not found - {exception.filename}")
+    except (KeyError, ValueError) as exception:
+        print(f"Error: Invalid sketch file - {exception}")
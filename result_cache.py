@@ -0,0 +1,271 @@
+"""
+result_cache.py - Content-addressed cache of the results of compute_statistics.py,
+convert_numbers.py and word_count.py, so unchanged inputs are not processed again.
+
+An entry is keyed by the tool, the options that change its results and a hash of the
+input file, and stores a JSON value with what the tool needs to print its results plus a
+copy of the results file it wrote. A hit restores the results file and the tool prints
+the stored results without reading the input.
+
+The inputs are hashed with BLAKE2b, updated block by block so memory does not grow with
+the file. The digest of every input is remembered with its size and modification time,
+and while they do not change the file is not read again. A file modified less than
+RACY_SECONDS before it was hashed could still change without a visible change of its
+modification time, so its digest is not remembered.
+
+The entries live in a local directory. Every hit refreshes the modification time of its
+entry, and after every store the least recently used entries are deleted until the
+directory fits in its size limit. Files are written to a temporary name and renamed, so
+concurrent runs, such as the workers of batch_runner.py, never read a partial entry.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# Version of the layout of the entries, part of every key.
+CACHE_VERSION = 3
+
+# Default limit of the size of the cache directory.
+DEFAULT_MAX_BYTES = 1 << 30
+
+# Bytes of the input read at a time while hashing it.
+HASH_BLOCK_SIZE = 1 << 20
+
+# Digests of files modified less than this many seconds before they were hashed are not
+# remembered, since a later change within the resolution of the file system clock
+# would keep the same size and modification time.
+RACY_SECONDS = 2
+
+
+def file_digest(file_name):
+    """
+    Returns the BLAKE2b digest of the contents of a file.
+
+     :param file_name: Name of the file.
+     :return: Hexadecimal digest.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_name, "rb") as file:
+        while True:
+            block = file.read(HASH_BLOCK_SIZE)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+
+
+def _write_atomic(file_name, data=None, source=None):
+    """
+    Writes data, or a copy of the source file, to a temporary file next to
+    file_name and renames it to file_name.
+    """
+    descriptor, temporary_name = tempfile.mkstemp(dir=os.path.dirname(file_name),
+                                                  suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            if source is None:
+                file.write(data)
+            else:
+                with open(source, "rb") as source_file:
+                    shutil.copyfileobj(source_file, file, HASH_BLOCK_SIZE)
+        os.replace(temporary_name, file_name)
+    except BaseException:
+        os.unlink(temporary_name)
+        raise
+
+
+class ResultCache:
+    """
+    Cache of the results of the tools in a local directory, bounded in size
+    with least recently used eviction.
+
+     :param directory: Directory of the cache, created when it does not exist.
+     :param max_bytes: Limit of the size of the stored entries.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._inputs = {}
+        os.makedirs(os.path.join(directory, "entries"), mode=0o700, exist_ok=True)
+        os.makedirs(os.path.join(directory, "inputs"), mode=0o700, exist_ok=True)
+
+    def _entry_path(self, key, extension):
+        return os.path.join(self.directory, "entries", f"{key}.{extension}")
+
+    def input_digest(self, file_name):
+        """
+        Returns the digest of an input file, reusing the one computed by an
+        earlier run while the size and modification time of the file match.
+
+         :param file_name: Name of the input file.
+         :return: Hexadecimal digest, or None if it is not a regular file.
+        """
+        try:
+            status = os.stat(file_name)
+        except OSError:
+            return None
+        if not os.path.isfile(file_name):
+            return None
+        path = os.path.abspath(file_name)
+        signature = [status.st_size, status.st_mtime_ns]
+        record_name = os.path.join(self.directory, "inputs", hashlib.blake2b(
+            path.encode("utf-8", "surrogateescape"), digest_size=16).hexdigest() + ".json")
+        try:
+            with open(record_name, "r", encoding="utf-8") as record_file:
+                record = json.load(record_file)
+            if record['path'] == path and record['signature'] == signature:
+                self._inputs[path] = signature
+                return record['digest']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        digest = file_digest(file_name)
+        self._inputs[path] = signature
+        if time.time_ns() - status.st_mtime_ns >= RACY_SECONDS * 10 ** 9:
+            _write_atomic(record_name, json.dumps(
+                {'path': path, 'signature': signature, 'digest': digest}).encode("utf-8"))
+        return digest
+
+    def key(self, tool, input_file, options):
+        """
+        Returns the key of the results of a tool on an input.
+
+         :param tool: Name of the tool.
+         :param input_file: Name of the input file.
+         :param options: JSON serializable dictionary of the options that
+                         change the results.
+         :return: Hexadecimal key, or None if the input cannot be cached, for
+                  example the standard input.
+        """
+        digest = self.input_digest(input_file)
+        if digest is None:
+            return None
+        description = json.dumps([CACHE_VERSION, tool, options, digest], sort_keys=True)
+        return hashlib.blake2b(description.encode("utf-8"), digest_size=20).hexdigest()
+
+    def get(self, key, results_file=None):
+        """
+        Returns the value stored for a key, restoring the stored results file,
+        and counts the hit or miss.
+
+         :param key: Key returned by key().
+         :param results_file: Name of the file where the stored results file
+                              is copied.
+         :return: The stored value, or None on a miss.
+        """
+        entry_name = self._entry_path(key, "json")
+        try:
+            with open(entry_name, "r", encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+            if results_file is not None:
+                shutil.copyfile(self._entry_path(key, "results"), results_file)
+            os.utime(entry_name)
+        except (OSError, ValueError):
+            # Missing, or evicted by a concurrent run.
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['value']
+
+    def put(self, key, value, input_file, results_file=None):
+        """
+        Stores the results of a run, unless the input changed while it ran,
+        and evicts the least recently used entries above the size limit.
+
+         :param key: Key returned by key().
+         :param value: JSON serializable value returned by get().
+         :param input_file: Name of the input file, checked again.
+         :param results_file: Optional results file written by the run.
+        """
+        try:
+            status = os.stat(input_file)
+        except OSError:
+            return
+        if self._inputs.get(os.path.abspath(input_file)) != [status.st_size,
+                                                             status.st_mtime_ns]:
+            return
+        if results_file is not None:
+            _write_atomic(self._entry_path(key, "results"), source=results_file)
+        _write_atomic(self._entry_path(key, "json"),
+                      json.dumps({'value': value}).encode("utf-8"))
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the stored entries fit
+        in max_bytes.
+        """
+        entries_directory = os.path.join(self.directory, "entries")
+        entries = {}
+        for directory_entry in os.scandir(entries_directory):
+            key, extension = os.path.splitext(directory_entry.name)
+            if extension == ".tmp":
+                # Being written by a concurrent run.
+                continue
+            try:
+                status = directory_entry.stat()
+            except OSError:
+                continue
+            size, last_use = entries.get(key, (0, 0))
+            if extension == ".json":
+                last_use = status.st_mtime_ns
+            entries[key] = (size + status.st_size, last_use)
+
+        total_bytes = sum(size for size, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total_bytes <= self.max_bytes:
+                break
+            for extension in ("json", "results"):
+                try:
+                    os.unlink(self._entry_path(key, extension))
+                except FileNotFoundError:
+                    pass
+            total_bytes -= size
+            self.evictions += 1
+
+    def statistics(self):
+        """
+        Returns a summary of the lookups of this run.
+        """
+        return f"Result cache hits: {self.hits}, misses: {self.misses}"
+
+    def record(self, metrics):
+        """
+        Adds the hits and misses of this run to the counters of a Metrics object.
+
+         :param metrics: Metrics object or None.
+        """
+        if metrics is not None:
+            metrics.count("cache_hits", self.hits)
+            metrics.count("cache_misses", self.misses)
+
+
+def open_cache(arguments):
+    """
+    Returns the ResultCache selected on the command line, or None.
+
+     :param arguments: Namespace parsed by a parser with add_arguments.
+    """
+    if not arguments.cache_dir:
+        return None
+    return ResultCache(arguments.cache_dir, arguments.cache_max_bytes)
+
+
+def add_arguments(parser):
+    """
+    Adds the --cache-dir and --cache-max-bytes options to a parser.
+
+     :param parser: argparse.ArgumentParser of a tool.
+    """
+    parser.add_argument("--cache-dir",
+                        help="Reuse the results of earlier runs on the same input and "
+                             "options stored in this directory.")
+    parser.add_argument("--cache-max-bytes", type=int, default=DEFAULT_MAX_BYTES,
+                        help="Size limit of the result cache; the least recently used "
+                             f"results are evicted (default {DEFAULT_MAX_BYTES}).")
@@ -0,0 +1,312 @@
+"""
+rolling_statistics.py - Sliding window statistics (mean, median, mode, standard deviation
+and variance of the last N values) used by compute_statistics.py --window.
+
+RollingStatistics keeps the window in a deque and maintains:
+
+- The sum and the sum of squares of the deviations from a reference value, updated with
+  the values that enter and leave the window, so the mean and variance cost O(1) per
+  value. The sums are recomputed from the window every time it has been fully replaced,
+  which bounds the rounding error and keeps the amortized cost O(1).
+- While the statistics are requested often, a SortedWindow, a list of sorted blocks of
+  bounded size indexed by their maximums, so adding or removing a value costs a
+  bisection over the blocks plus an insertion in a small block, O(log N), and the median
+  is found by walking the block lengths. The frequency of every value and the set of
+  values of every frequency are kept with it, so the mode is read from the set of the
+  highest frequency.
+
+When more than 1 / SELECT_RATIO of the window changes between two requests, selecting
+the median and counting the window again at the request is cheaper than updating the
+structures value by value, so they are dropped and rebuilt when requests become frequent
+again. A request costs O(N) then, amortized over the values added since the previous
+one.
+"""
+import math
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, deque
+from itertools import accumulate, islice
+
+from order_statistics import median_and_quantiles
+
+# Target size of the blocks of a SortedWindow; blocks are split at twice this size.
+BLOCK_LOAD = 512
+
+# The median is selected from the window instead of keeping a SortedWindow up
+# to date when more than 1 / SELECT_RATIO of the window changes between two
+# requests of the statistics.
+SELECT_RATIO = 10
+
+
+class SortedWindow:
+    """
+    Sorted multiset of numbers with O(log N) insertion and deletion, stored as a
+    list of sorted blocks of at most 2 * BLOCK_LOAD values.
+    """
+
+    def __init__(self):
+        self._blocks = []
+        self._maximums = []
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def rebuild(self, values):
+        """
+        Replaces the contents with the given values.
+
+         :param values: Iterable of numbers.
+        """
+        ordered = sorted(values)
+        self._blocks = [ordered[start:start + BLOCK_LOAD]
+                        for start in range(0, len(ordered), BLOCK_LOAD)]
+        self._maximums = [block[-1] for block in self._blocks]
+        self._length = len(ordered)
+
+    def add(self, value):
+        """
+        Adds a value.
+
+         :param value: Number to add.
+        """
+        self.update([value], [])
+
+    def remove(self, value):
+        """
+        Removes one occurrence of a value, which must be present.
+
+         :param value: Number to remove.
+        """
+        self.update([], [value])
+
+    def update(self, added, removed):
+        """
+        Adds and removes batches of values; the same as calling add and remove
+        for each of them, without the cost of a call per value.
+
+         :param added: List of numbers to add.
+         :param removed: List of numbers to remove, which must be present.
+        """
+        blocks = self._blocks
+        maximums = self._maximums
+        find = bisect_left
+        for value in removed:
+            index = find(maximums, value)
+            block = blocks[index]
+            position = find(block, value)
+            del block[position]
+            if position == len(block):
+                if block:
+                    maximums[index] = block[-1]
+                else:
+                    del blocks[index]
+                    del maximums[index]
+        self._length -= len(removed)
+
+        split_size = 2 * BLOCK_LOAD
+        for value in added:
+            index = find(maximums, value)
+            if index < len(maximums):
+                block = blocks[index]
+                insort(block, value)
+            elif maximums:
+                index -= 1
+                block = blocks[index]
+                block.append(value)
+                maximums[index] = value
+            else:
+                block = [value]
+                blocks.append(block)
+                maximums.append(value)
+            if len(block) > split_size:
+                blocks.insert(index + 1, block[BLOCK_LOAD:])
+                del block[BLOCK_LOAD:]
+                maximums.insert(index + 1, maximums[index])
+                maximums[index] = block[-1]
+        self._length += len(added)
+
+    def maximum(self):
+        """
+        Returns the largest value.
+        """
+        return self._maximums[-1]
+
+    def __getitem__(self, rank):
+        """
+        Returns the value at a 0-based rank of the sorted values.
+        """
+        ends = list(accumulate(map(len, self._blocks)))
+        index = bisect_right(ends, rank)
+        if rank < 0 or index == len(ends):
+            raise IndexError("rank out of range")
+        return self._blocks[index][rank - (ends[index - 1] if index else 0)]
+
+
+class RollingStatistics:
+    """
+    Mean, median, mode, standard deviation and variance of the last values of a
+    stream.
+
+     :param window_size: Number of values in the window.
+    """
+
+    def __init__(self, window_size):
+        if window_size < 1:
+            raise ValueError("the window size must be at least 1")
+        self.window_size = window_size
+        self.window = deque(maxlen=window_size)
+        # Sorted copy of the window, frequency of each value and set of values
+        # of each frequency; None while statistics are requested rarely.
+        # _added and _removed hold their pending updates.
+        self.sorted_window = None
+        self.counts = None
+        self.by_frequency = None
+        self._added = []
+        self._removed = []
+        self._since_statistics = 0
+        self._reference = 0.0
+        self._sum = 0.0
+        self._sum_of_squares = 0.0
+        self._evicted = 0
+
+    def __len__(self):
+        return len(self.window)
+
+    def _recompute_sums(self):
+        # Deviations from the current mean keep the sum of squares small.
+        self._reference = math.fsum(self.window) / len(self.window)
+        reference = self._reference
+        deviations = [value - reference for value in self.window]
+        self._sum = math.fsum(deviations)
+        self._sum_of_squares = math.fsum([deviation * deviation for deviation in deviations])
+        self._evicted = 0
+
+    def extend(self, values):
+        """
+        Adds a batch of values to the window, dropping the oldest ones. NaN
+        values are skipped, since they have no place in the order.
+
+         :param values: List of numbers.
+        """
+        values = [value for value in values if value == value]
+        if len(values) > self.window_size:
+            values = values[-self.window_size:]
+        if not values:
+            return
+        window = self.window
+        if not window:
+            self._reference = values[0]
+        evicted_count = max(0, len(window) + len(values) - self.window_size)
+        evicted = list(islice(window, evicted_count))
+        window.extend(values)
+        self._since_statistics += len(values)
+
+        if self.sorted_window is not None:
+            self._added += values
+            self._removed += evicted
+            if len(self._added) * SELECT_RATIO >= self.window_size:
+                # Selecting the median and counting the window again is cheaper
+                # than the pending updates.
+                self.sorted_window = self.counts = self.by_frequency = None
+                self._added = []
+                self._removed = []
+
+        self._evicted += evicted_count
+        if self._evicted >= self.window_size:
+            self._recompute_sums()
+            return
+        reference = self._reference
+        added = [value - reference for value in values]
+        removed = [value - reference for value in evicted]
+        self._sum += sum(added) - sum(removed)
+        self._sum_of_squares += (sum([deviation * deviation for deviation in added])
+                                 - sum([deviation * deviation for deviation in removed]))
+
+    def _synchronize(self):
+        """
+        Applies the pending updates to the sorted window and the frequencies,
+        or builds them when the statistics are being requested often.
+        """
+        if self.sorted_window is None:
+            if self._since_statistics * SELECT_RATIO < self.window_size:
+                self.sorted_window = SortedWindow()
+                self.sorted_window.rebuild(self.window)
+                self.counts = dict(Counter(self.window))
+                self.by_frequency = {}
+                for value, frequency in self.counts.items():
+                    self.by_frequency.setdefault(frequency, set()).add(value)
+            return
+        self.sorted_window.update(self._added, self._removed)
+        counts = self.counts
+        by_frequency = self.by_frequency
+        for value in self._removed:
+            frequency = counts[value]
+            by_frequency[frequency].discard(value)
+            if frequency > 1:
+                counts[value] = frequency - 1
+                by_frequency.setdefault(frequency - 1, set()).add(value)
+            else:
+                del counts[value]
+        get = counts.get
+        for value in self._added:
+            frequency = get(value, 0) + 1
+            counts[value] = frequency
+            if frequency > 1:
+                by_frequency[frequency - 1].discard(value)
+            by_frequency.setdefault(frequency, set()).add(value)
+        self._added = []
+        self._removed = []
+
+    def _mode(self, counts):
+        if len(counts) == len(self.window):
+            # Every value is distinct, the most common case with measurements.
+            if self.sorted_window is not None:
+                return self.sorted_window.maximum()
+            return max(counts)
+        if self.sorted_window is not None:
+            # The sets of the frequencies that are no longer used are dropped
+            # here, so the highest one is found without scanning the counts.
+            by_frequency = self.by_frequency
+            while not by_frequency[max(by_frequency)]:
+                del by_frequency[max(by_frequency)]
+            return max(by_frequency[max(by_frequency)])
+        max_frequency = max(counts.values())
+        return max(value for value, frequency in counts.items()
+                   if frequency == max_frequency)
+
+    def statistics(self):
+        """
+        Returns the statistics of the values in the window.
+
+         :return: A dictionary with the count, mean, median, mode, standard
+                  deviation and variance; the mode is the largest of the most
+                  frequent values and the variance is 0 for a single value.
+        """
+        count = len(self.window)
+        if count == 0:
+            raise ZeroDivisionError("the window is empty")
+        self._synchronize()
+        self._since_statistics = 0
+        sorted_window = self.sorted_window
+        if sorted_window is not None:
+            middle = count // 2
+            if count % 2 == 0:
+                median = (sorted_window[middle - 1] + sorted_window[middle]) / 2
+            else:
+                median = sorted_window[middle]
+            counts = self.counts
+        else:
+            values = list(self.window)
+            median = median_and_quantiles(values)[0]
+            counts = Counter(values)
+        mode = self._mode(counts)
+        mean_deviation = self._sum / count
+        squared_deviations = max(0.0, self._sum_of_squares - self._sum * mean_deviation)
+        return {
+            'count': count,
+            'mean': self._reference + mean_deviation,
+            'median': median,
+            'mode': mode,
+            'standard_deviation': (squared_deviations / count) ** 0.5,
+            'variance': squared_deviations / (count - 1) if count > 1 else 0.0,
+        }
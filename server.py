@@ -0,0 +1,549 @@
+"""
+server.py - Long-running server that answers statistics, number conversion and word count
+requests over a Unix-domain socket, or a TCP port on the loopback interface, so a
+computation does not pay for a new interpreter and its imports, and the results are
+returned to the client instead of being written to shared files in the working directory.
+
+The protocol is newline-delimited JSON. Every request is a JSON object on its own line
+with the tool and either inline data or the path of a file that the server reads:
+
+{"id": 1, "tool": "statistics", "records": ["1", "2.5", "x"], "percentiles": [90]}
+{"id": 2, "tool": "convert", "records": [10, -3], "bits": 8}
+{"id": 3, "tool": "wordcount", "text": "the cat and the hat", "top": 10}
+{"id": 4, "tool": "statistics", "file": "/data/values.txt"}
+{"id": 5, "tool": "status"}
+
+Files are only read for requests received on the Unix-domain socket, which only the user
+that started the server can connect to. The TCP port is open to every local user, so its
+requests must carry their data inline.
+
+Every response is one line with the id of the request and either "result" or "error".
+Any error of a request, including an unexpected exception, is returned in its response
+instead of closing the connection:
+
+{"id": 1, "ok": true, "result": {...}}
+{"id": 2, "ok": false, "error": "..."}
+
+Requests are pipelined: a client can send many of them without waiting, and the responses
+of a connection are written in the order of its requests. Small inline requests are
+answered in the server process, which avoids any inter-process round trip and shares a
+warm ConversionCache between all the requests; files and large payloads are sent to a
+pool of worker processes, each with its own warm cache, so they do not block the small
+requests of other clients.
+
+Usage:
+python server.py serve --workers 4
+python server.py serve --port 8765 --cache-size 1000000
+python server.py call statistics --records 1 2 3 4 --percentiles 90
+python server.py call wordcount --file book.txt --top 10
+python server.py call status
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from compute_statistics import calculate_statistics, check_percentiles, percentile_argument
+from convert_numbers import ConversionCache, check_width, fits_width
+from input_reader import iter_lines
+from number_parser import DEFAULT_MAX_SAMPLES, ErrorReport, parse_floats, parse_integers
+from word_count import count_block_fast, count_range, select_top
+
+# Socket used when neither --socket nor --port is given.
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "number-tools.sock")
+
+# Inline requests with more records than this, or more bytes of text, are sent to the
+# worker pool instead of being answered in the server process.
+INLINE_RECORDS = 20000
+INLINE_TEXT_BYTES = 1 << 20
+
+# Largest request line accepted.
+MAX_REQUEST_BYTES = 1 << 28
+
+# Requests of a connection in flight before the server stops reading from it.
+PIPELINE_DEPTH = 1024
+
+# Default size of the conversion cache of the server and of every worker.
+DEFAULT_CACHE_SIZE = 100000
+
+TOOLS = ("statistics", "convert", "wordcount", "status")
+
+# Conversion cache of a worker process, created by init_worker.
+_worker_cache = None
+
+
+def read_records(request):
+    """
+    Returns the records of a request: its inline records, or the lines of its
+    file as bytes.
+
+     :param request: Dictionary of the request.
+    """
+    if "file" in request:
+        return list(iter_lines(request["file"]))
+    return [record if isinstance(record, str) else str(record)
+            for record in request.get("records", [])]
+
+
+def statistics_result(request):
+    """
+    Computes the statistics of a request.
+
+     :param request: Dictionary with 'records' or 'file' and optionally
+                     'percentiles' and 'top_modes'.
+     :return: Dictionary with the statistics data and the error report.
+    """
+    percentiles = request.get("percentiles", ())
+    check_percentiles(percentiles)
+    records = read_records(request)
+    report = ErrorReport(request.get("max_warnings", DEFAULT_MAX_SAMPLES))
+    numbers = parse_floats(records, report)
+    if not numbers:
+        raise ValueError("no valid numbers in the data")
+    statistics_data = calculate_statistics(numbers, percentiles=percentiles,
+                                           top_modes=request.get("top_modes", 0))
+    statistics_data['total_records'] = len(records)
+    if 'percentiles' in statistics_data:
+        statistics_data['percentiles'] = [[percentile, value] for percentile, value
+                                          in statistics_data['percentiles'].items()]
+    statistics_data['warnings'] = report.lines()
+    return statistics_data
+
+
+def convert_result(request, cache):
+    """
+    Converts the numbers of a request to binary and hexadecimal.
+
+     :param request: Dictionary with 'records' or 'file' and optionally 'bits'.
+     :param cache: ConversionCache shared by the requests of the process.
+     :return: Dictionary with the counters, the [number, binary, hexadecimal]
+              results, the numbers that do not fit in the width and the error
+              report.
+    """
+    records = read_records(request)
+    bits = request.get("bits")
+    if bits is not None:
+        check_width(bits)
+    report = ErrorReport(request.get("max_warnings", DEFAULT_MAX_SAMPLES))
+    numbers = parse_integers(records, report)
+    skipped = []
+    if bits is not None:
+        fitting = [number for number in numbers if fits_width(number, bits)]
+        if len(fitting) < len(numbers):
+            skipped = [number for number in numbers if not fits_width(number, bits)]
+        numbers = fitting
+    binaries, hexadecimals = cache.convert_batch(numbers, bits)
+    return {
+        'records': len(records),
+        'invalid': len(records) - len(numbers) - len(skipped),
+        'converted': len(numbers),
+        'results': [list(result) for result in zip(numbers, binaries, hexadecimals)],
+        'skipped': skipped,
+        'warnings': report.lines(),
+    }
+
+
+def wordcount_result(request):
+    """
+    Counts the words of a request with the fast tokenizer.
+
+     :param request: Dictionary with 'text' or 'file' and optionally 'top'.
+     :return: Dictionary with the [word, count] pairs in order of first
+              appearance, or most frequent first with 'top'.
+    """
+    if "file" in request:
+        words = count_range(request["file"], tokenizer="fast")
+    else:
+        words = {}
+        count_block_fast(request.get("text", "").encode("utf-8"), words)
+    if request.get("top"):
+        words = select_top(words, request["top"])
+    return {'distinct_words': len(words), 'words': [list(item) for item in words.items()]}
+
+
+def compute(request, cache):
+    """
+    Computes the result of a statistics, convert or wordcount request.
+
+     :param request: Dictionary of the request.
+     :param cache: ConversionCache used by the convert requests.
+     :return: Dictionary with the result.
+    """
+    tool = request.get("tool")
+    if tool == "statistics":
+        return statistics_result(request)
+    if tool == "convert":
+        return convert_result(request, cache)
+    if tool == "wordcount":
+        return wordcount_result(request)
+    raise ValueError(f"unknown tool {tool!r}, expected one of {', '.join(TOOLS)}")
+
+
+def init_worker(cache_size):
+    """
+    Creates the conversion cache of a worker process.
+
+     :param cache_size: Maximum number of cached conversions.
+    """
+    global _worker_cache  # pylint: disable=global-statement
+    _worker_cache = ConversionCache(cache_size)
+
+
+def worker_compute(request):
+    """
+    Computes a request in a worker process. Returns (result, None) or
+    (None, error message), so errors do not need to be pickled.
+
+     :param request: Dictionary of the request.
+    """
+    try:
+        return compute(request, _worker_cache), None
+    except Exception as exception:  # pylint: disable=broad-except
+        return None, error_message(exception)
+
+
+def error_message(exception):
+    """
+    Returns the message of an error sent to the client.
+
+     :param exception: The exception raised by a request.
+    """
+    if isinstance(exception, FileNotFoundError):
+        return f"file not found - {exception.filename}"
+    if isinstance(exception, ZeroDivisionError):
+        return f"division by zero - {exception}"
+    return str(exception) or type(exception).__name__
+
+
+def is_small(request):
+    """
+    Returns True if a request is answered in the server process.
+
+     :param request: Dictionary of the request.
+    """
+    return ("file" not in request
+            and len(request.get("records", ())) <= INLINE_RECORDS
+            and len(request.get("text", "")) <= INLINE_TEXT_BYTES)
+
+
+class Server:
+    """
+    Server of the tools. Keeps the warm state shared by the requests: the
+    conversion cache of the server process, the worker pool and the counters
+    reported by the status tool.
+
+     :param workers: Number of worker processes; 0 answers every request in
+                     the server process.
+     :param cache_size: Maximum number of conversions cached by the server and
+                        by every worker.
+    """
+
+    def __init__(self, workers=os.cpu_count() or 1, cache_size=DEFAULT_CACHE_SIZE):
+        self.workers = workers
+        self.cache = ConversionCache(cache_size)
+        self.executor = None
+        if workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                                initargs=(cache_size,))
+        self.counters = {'connections': 0, 'requests': 0, 'inline': 0, 'pooled': 0,
+                         'errors': 0}
+        self.start_time = time.perf_counter()
+
+    def status(self):
+        """
+        Returns the counters of the server.
+        """
+        return dict(self.counters, workers=self.workers, cache=self.cache.statistics(),
+                    uptime_seconds=time.perf_counter() - self.start_time)
+
+    def submit(self, line, allow_files=True):
+        """
+        Starts a request and returns a future of its response line. Small
+        requests are computed right away, the others in the worker pool.
+
+         :param line: Request line as bytes.
+         :param allow_files: Accept requests that read a file of the server.
+        """
+        loop = asyncio.get_running_loop()
+        self.counters['requests'] += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("the request must be a JSON object")
+            request_id = request.get("id")
+            if "file" in request and not allow_files:
+                raise ValueError("file requests are only accepted on the Unix-domain socket")
+            if request.get("tool") == "status":
+                result = self.status()
+            elif self.executor is None or is_small(request):
+                self.counters['inline'] += 1
+                result = compute(request, self.cache)
+            else:
+                self.counters['pooled'] += 1
+                pending = loop.run_in_executor(self.executor, worker_compute, request)
+                return asyncio.ensure_future(self._pooled_response(request_id, pending))
+            response = self.response(request_id, result)
+        except Exception as exception:  # pylint: disable=broad-except
+            # Any error of a request is returned to its client, so it never
+            # closes the connection of the other requests in flight.
+            response = self.response(request_id, error=error_message(exception))
+        future = loop.create_future()
+        future.set_result(response)
+        return future
+
+    async def _pooled_response(self, request_id, pending):
+        try:
+            result, error = await pending
+        except Exception as exception:  # pylint: disable=broad-except
+            # A worker died and the pool is broken, or the request could not
+            # be sent to it.
+            result, error = None, f"worker failed - {error_message(exception)}"
+        return self.response(request_id, result, error)
+
+    def response(self, request_id, result=None, error=None):
+        """
+        Returns the response line of a request.
+
+         :param request_id: The id of the request, echoed in the response.
+         :param result: Result of the request.
+         :param error: Error message, if the request failed.
+        """
+        if error is None:
+            response = {'id': request_id, 'ok': True, 'result': result}
+        else:
+            self.counters['errors'] += 1
+            response = {'id': request_id, 'ok': False, 'error': error}
+        return json.dumps(response, separators=(",", ":")).encode("utf-8") + b"\n"
+
+    async def handle_connection(self, reader, writer, allow_files=True):
+        """
+        Serves a connection: reads its requests as they arrive and writes the
+        responses in the same order.
+
+         :param reader: asyncio.StreamReader of the connection.
+         :param writer: asyncio.StreamWriter of the connection.
+         :param allow_files: Accept requests that read a file of the server.
+        """
+        self.counters['connections'] += 1
+        responses = asyncio.Queue(PIPELINE_DEPTH)
+
+        async def write_responses():
+            while True:
+                future = await responses.get()
+                if future is None:
+                    break
+                writer.write(await future)
+                # Several responses that are ready go out in a single send.
+                if responses.empty():
+                    await writer.drain()
+
+        writer_task = asyncio.ensure_future(write_responses())
+        try:
+            while not writer_task.done():
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as exception:
+                    line = exception.partial
+                except asyncio.LimitOverrunError:
+                    await responses.put(asyncio.ensure_future(self._error_line(
+                        f"request longer than {MAX_REQUEST_BYTES} bytes")))
+                    break
+                if not line.strip():
+                    if reader.at_eof():
+                        break
+                    continue
+                await responses.put(self.submit(line, allow_files))
+            await responses.put(None)
+            await writer_task
+        except ConnectionError:
+            writer_task.cancel()
+        finally:
+            writer.close()
+
+    async def _error_line(self, error):
+        return self.response(None, error=error)
+
+    def close(self):
+        """
+        Stops the worker pool.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+
+async def serve(server, socket_path=DEFAULT_SOCKET, port=None):
+    """
+    Accepts connections until the task is cancelled.
+
+     :param server: Server that answers the requests.
+     :param socket_path: Path of the Unix-domain socket, used when port is None.
+     :param port: TCP port on the loopback interface.
+    """
+    if port is not None:
+        # Any local user can connect to the port, so it does not read files.
+        listener = await asyncio.start_server(
+            functools.partial(server.handle_connection, allow_files=False), "127.0.0.1", port,
+            limit=MAX_REQUEST_BYTES)
+        address = f"127.0.0.1:{port}"
+    else:
+        if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            os.unlink(socket_path)
+        # Only the user that started the server can connect. The socket is
+        # created with these permissions, so no other user can connect
+        # between its creation and the chmod.
+        previous_umask = os.umask(0o077)
+        try:
+            listener = await asyncio.start_unix_server(server.handle_connection, socket_path,
+                                                       limit=MAX_REQUEST_BYTES)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(socket_path, 0o600)
+        address = socket_path
+    print(f"Listening on {address} with {server.workers} workers", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        if port is None and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+class Client:
+    """
+    Blocking client of the server. Requests can be sent one at a time with
+    call or pipelined with pipeline.
+
+     :param socket_path: Path of the Unix-domain socket, used when port is None.
+     :param port: TCP port of the server on the loopback interface.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, port=None):
+        if port is not None:
+            self.socket = socket.create_connection(("127.0.0.1", port))
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(socket_path)
+        self.file = self.socket.makefile("rb")
+        self.next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception_info):
+        self.close()
+
+    def close(self):
+        """
+        Closes the connection.
+        """
+        self.file.close()
+        self.socket.close()
+
+    def pipeline(self, requests):
+        """
+        Sends several requests at once and waits for all the responses.
+
+         :param requests: List of request dictionaries; an 'id' is added to
+                          the ones without it.
+         :return: List of response dictionaries, in the order of requests.
+        """
+        lines = []
+        for request in requests:
+            if "id" not in request:
+                request = dict(request, id=self.next_id)
+                self.next_id += 1
+            lines.append(json.dumps(request, separators=(",", ":")).encode("utf-8") + b"\n")
+        self.socket.sendall(b"".join(lines))
+        responses = []
+        for _ in lines:
+            line = self.file.readline()
+            if not line:
+                raise ConnectionError("the server closed the connection")
+            responses.append(json.loads(line))
+        return responses
+
+    def call(self, tool, **fields):
+        """
+        Sends a request and waits for its response.
+
+         :param tool: 'statistics', 'convert', 'wordcount' or 'status'.
+         :param fields: Other fields of the request, such as records or file.
+         :return: Response dictionary with 'ok' and 'result' or 'error'.
+        """
+        return self.pipeline([dict(fields, tool=tool)])[0]
+
+
+def main():
+    """
+    Parses the command line and runs the server or a single request.
+    """
+    parser = argparse.ArgumentParser(
+        prog="server.py", description="Serve the tools over a local socket.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET,
+                        help=f"Path of the Unix-domain socket (default {DEFAULT_SOCKET}).")
+    parser.add_argument("--port", type=int,
+                        help="Use this TCP port on 127.0.0.1 instead of a Unix socket.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Run the server.")
+    serve_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                              help="Worker processes for files and large requests; 0 "
+                                   "answers everything in the server process (default the "
+                                   "number of CPUs).")
+    serve_parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                              help="Conversions cached by the server and by every worker "
+                                   f"(default {DEFAULT_CACHE_SIZE}).")
+    call_parser = commands.add_parser("call", help="Send a request and print the response.")
+    call_parser.add_argument("tool", choices=TOOLS, help="Tool to run.")
+    call_parser.add_argument("--file",
+                             help="File read by the server; only with the Unix socket.")
+    call_parser.add_argument("--records", nargs="+", help="Inline records.")
+    call_parser.add_argument("--text", help="Inline text of wordcount.")
+    call_parser.add_argument("--percentiles", nargs="+", type=percentile_argument,
+                             help="statistics: percentiles (0-100) to report.")
+    call_parser.add_argument("--bits", type=int,
+                             help="convert: width of the two's complement representations.")
+    call_parser.add_argument("--top", type=int, metavar="K",
+                             help="wordcount: only return the K most frequent words.")
+    arguments = parser.parse_args()
+    if arguments.command == "call" and arguments.bits is not None and arguments.bits < 1:
+        parser.error("--bits must be at least 1")
+
+    if arguments.command == "serve":
+        if arguments.workers < 0:
+            parser.error("--workers must be at least 0")
+        server = Server(arguments.workers, arguments.cache_size)
+        try:
+            asyncio.run(serve(server, arguments.socket, arguments.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        return
+
+    fields = {name: getattr(arguments, name)
+              for name in ("file", "records", "text", "percentiles", "bits", "top")
+              if getattr(arguments, name) is not None}
+    if fields.get("file"):
+        fields["file"] = os.path.abspath(fields["file"])
+    try:
+        with Client(arguments.socket, arguments.port) as client:
+            response = client.call(arguments.tool, **fields)
+    except OSError as exception:
+        print(f"Error: Cannot connect to the server - {exception}")
+        sys.exit(1)
+    print(json.dumps(response, indent=2))
+    if not response['ok']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Tests of the columnar results format against the text results of the same input.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from convert_numbers import (ColumnarResults, convert_file, convert_fitting, fits_width,
+                             format_result, write_results_columnar)
+
+NUMBERS = ([0, 1, -1, 127, -128, 128, -129, 32767, -32768, 65536, -65537, 2 ** 31,
+            -2 ** 31 - 1, 2 ** 40, 2 ** 63 - 1, -2 ** 63]
+           + list(range(-3000, 3000, 7)))
+WIDE_NUMBERS = [2 ** 64, -2 ** 70, 2 ** 100 + 3, 5]
+
+
+@pytest.mark.parametrize("bits", [None, 8, 16, 64])
+def test_columnar_round_trip(tmp_path, bits):
+    numbers = [number for number in NUMBERS if bits is None or fits_width(number, bits)]
+    # Several blocks of different widths, including an empty one.
+    batches = [numbers[:5], [], numbers[5:300], numbers[300:]]
+    result_name = tmp_path / "results.bin"
+    with open(result_name, "wb") as result_file:
+        assert write_results_columnar(batches, result_file, bits, echo="none") == len(numbers)
+
+    with ColumnarResults(result_name) as results:
+        assert results.bits == bits
+        assert len(results) == len(numbers)
+        assert list(results) == numbers
+        assert [results[index] for index in range(-1, -len(numbers), -97)] == \
+            [numbers[index] for index in range(-1, -len(numbers), -97)]
+        assert list(results.rows()) == convert_fitting(numbers, bits)
+        assert results.binary(7) == convert_fitting([numbers[7]], bits)[0][1]
+        assert results.hexadecimal(7) == convert_fitting([numbers[7]], bits)[0][2]
+        with pytest.raises(IndexError):
+            results[len(numbers)]  # pylint: disable=pointless-statement
+
+
+def test_columnar_round_trip_of_wide_numbers(tmp_path):
+    result_name = tmp_path / "results.bin"
+    with open(result_name, "wb") as result_file:
+        write_results_columnar([WIDE_NUMBERS], result_file, echo="none")
+    with ColumnarResults(result_name) as results:
+        assert list(results) == WIDE_NUMBERS
+        assert list(results.rows()) == convert_fitting(WIDE_NUMBERS)
+
+
+@pytest.mark.parametrize("bits", [None, 8])
+def test_columnar_file_matches_text_file(tmp_path, bits):
+    input_name = tmp_path / "numbers.txt"
+    lines = [str(number) for number in NUMBERS + WIDE_NUMBERS] + ["abc", "", "1.5"]
+    input_name.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    text_name = tmp_path / "results.txt"
+    columnar_name = tmp_path / "results.bin"
+
+    text_counts = convert_file(str(input_name), str(text_name), bits, echo="none")
+    columnar_counts = convert_file(str(input_name), str(columnar_name), bits, echo="none",
+                                   output_format="columnar")
+
+    for counts in (text_counts, columnar_counts):
+        del counts['elapsed_time']
+    assert columnar_counts == text_counts
+    text_lines = text_name.read_text(encoding="utf-8").splitlines(keepends=True)
+    with ColumnarResults(columnar_name) as results:
+        assert [format_result(row) for row in results.rows()] == text_lines[:-1]
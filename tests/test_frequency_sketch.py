@@ -0,0 +1,54 @@
+"""
+Tests of the bounds of the frequency sketches after merging.
+"""
+import os
+import random
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from frequency_sketch import SpaceSavingSketch
+
+
+def build_sketch(values, capacity):
+    sketch = SpaceSavingSketch(capacity)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def assert_bounds(sketch, values):
+    true_counts = Counter(values)
+    assert sketch.total == len(values)
+    for value, count, error in sketch.top_k(sketch.capacity):
+        assert count - error <= true_counts[value] <= count
+
+
+def test_merge_adds_minimum_of_full_summary():
+    first_values = [1.0] * 8 + [2.0]
+    second_values = [1.0] * 4 + [3.0] * 5 + [4.0]
+    first = build_sketch(first_values, 2)
+    second = build_sketch(second_values, 2)
+    first.merge(second)
+    assert_bounds(first, first_values + second_values)
+    assert first.top_k(1)[0][0] == 1.0
+
+
+def test_merge_keeps_bounds_on_random_streams():
+    generator = random.Random(0)
+    for capacity in (1, 3, 10):
+        parts = [[generator.choice(range(30)) for _ in range(generator.randint(0, 200))]
+                 for _ in range(4)]
+        merged = build_sketch(parts[0], capacity)
+        for part in parts[1:]:
+            merged.merge(build_sketch(part, capacity))
+        assert_bounds(merged, [value for part in parts for value in part])
+
+
+def test_merge_of_partial_summaries_is_exact():
+    first = build_sketch([1, 1, 2], 10)
+    second = build_sketch([2, 3], 10)
+    first.merge(second)
+    assert sorted(first.top_k(10)) == [(1, 2, 0), (2, 2, 0), (3, 1, 0)]
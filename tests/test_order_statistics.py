@@ -0,0 +1,56 @@
+"""
+Tests of the exact order statistics against indexing the sorted data.
+"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from order_statistics import (SAMPLE_THRESHOLD, SMALL_DATA_SIZE, median, nearest_rank,
+                              quantiles, select)
+
+SIZES = [1, 2, 33, SMALL_DATA_SIZE + 1, SAMPLE_THRESHOLD + 1001]
+
+
+def datasets(size, generator):
+    yield [generator.random() for _ in range(size)]
+    yield [generator.randint(0, 5) for _ in range(size)]
+    yield list(range(size))
+    yield list(range(size, 0, -1))
+    yield [7.0] * size
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_select_matches_sorted(size):
+    generator = random.Random(size)
+    for data in datasets(size, generator):
+        original = list(data)
+        ordered = sorted(data)
+        ranks = [0, size - 1, size // 2] + [generator.randrange(size) for _ in range(20)]
+        assert select(data, ranks) == [ordered[rank] for rank in ranks]
+        assert data == original
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_quantiles_and_median_match_sorted(size):
+    generator = random.Random(size + 1)
+    fractions = [0, 0.01, 0.25, 0.5, 0.9, 0.999, 1]
+    for data in datasets(size, generator):
+        ordered = sorted(data)
+        assert quantiles(data, fractions) == [ordered[nearest_rank(fraction, size)]
+                                              for fraction in fractions]
+        middle = size // 2
+        expected = (ordered[middle] if size % 2
+                    else (ordered[middle - 1] + ordered[middle]) / 2)
+        assert median(data) == expected
+
+
+def test_select_rejects_ranks_out_of_range():
+    with pytest.raises(IndexError):
+        select([1, 2, 3], [3])
+    with pytest.raises(IndexError):
+        select([1, 2, 3], [-1])
@@ -0,0 +1,52 @@
+"""
+Tests of the rank error of the KLL sketch, alone and merged.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from quantile_sketch import KLLSketch
+
+FRACTIONS = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+
+def assert_rank_error(sketch, values, error_bound):
+    # The values are 0 .. n - 1, so a value is its own rank; the bound is
+    # probabilistic, so the check allows twice the configured error.
+    count = len(values)
+    assert sketch.count == count
+    for fraction, value in zip(FRACTIONS, sketch.quantiles(FRACTIONS)):
+        assert abs(value - fraction * count) <= 2 * error_bound * count + 1
+
+
+def test_rank_error_within_bound():
+    for seed, error_bound in enumerate((0.05, 0.01)):
+        values = list(range(50000))
+        random.Random(seed).shuffle(values)
+        sketch = KLLSketch(error_bound, seed=seed)
+        sketch.update(values)
+        assert sketch.size < len(values) // 10
+        assert_rank_error(sketch, values, error_bound)
+
+
+def test_merged_sketches_keep_the_bound():
+    values = list(range(60000))
+    random.Random(7).shuffle(values)
+    error_bound = 0.02
+    merged = KLLSketch(error_bound, seed=0)
+    for part in range(4):
+        sketch = KLLSketch(error_bound, seed=part + 1)
+        sketch.update(values[part::4])
+        merged.merge(sketch)
+    assert_rank_error(merged, values, error_bound)
+
+
+def test_saved_sketch_gives_the_same_quantiles():
+    sketch = KLLSketch(0.05, seed=3)
+    sketch.update(range(10000))
+    restored = KLLSketch.from_dict(sketch.to_dict())
+    assert restored.count == sketch.count
+    assert restored.quantiles(FRACTIONS) == sketch.quantiles(FRACTIONS)
@@ -0,0 +1,95 @@
+"""
+Tests of the invalidation of the result cache when the input changes.
+"""
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from convert_numbers import convert_file
+from result_cache import ResultCache
+
+OLD_TIME = 1_000_000_000
+
+
+def word_counts(file_name):
+    with open(file_name, "r", encoding="utf-8") as input_file:
+        return dict(Counter(input_file.read().split()))
+
+
+def write_old(path, text, timestamp=OLD_TIME):
+    # An old modification time lets the cache remember the digest of the input.
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, (timestamp, timestamp))
+
+
+def test_changed_input_misses(tmp_path):
+    input_name = tmp_path / "words.txt"
+    write_old(input_name, "to be or not to be\n")
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = cache.key("count", str(input_name), {'top': 10})
+    cache.put(key, word_counts(input_name), str(input_name))
+    assert cache.get(key) == word_counts(input_name)
+
+    # A new cache reuses the remembered digest of the unchanged input.
+    reopened = ResultCache(str(tmp_path / "cache"))
+    assert reopened.key("count", str(input_name), {'top': 10}) == key
+    assert reopened.key("count", str(input_name), {'top': 5}) != key
+
+    # Same size, different content and modification time.
+    write_old(input_name, "to be or not to go\n", OLD_TIME + 1)
+    new_key = reopened.key("count", str(input_name), {'top': 10})
+    assert new_key != key
+    assert reopened.get(new_key) is None
+    assert (reopened.hits, reopened.misses) == (0, 1)
+    reopened.put(new_key, word_counts(input_name), str(input_name))
+    assert reopened.get(new_key) == {'to': 2, 'be': 1, 'or': 1, 'not': 1, 'go': 1}
+
+
+def test_input_changed_during_the_run_is_not_stored(tmp_path):
+    input_name = tmp_path / "words.txt"
+    write_old(input_name, "a b c\n")
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = cache.key("count", str(input_name), {})
+    write_old(input_name, "a b c d\n")
+    cache.put(key, word_counts(input_name), str(input_name))
+    assert cache.get(key) is None
+
+
+def test_cached_conversion_matches_a_recount(tmp_path):
+    input_name = tmp_path / "numbers.txt"
+    cached_name = tmp_path / "cached.txt"
+    fresh_name = tmp_path / "fresh.txt"
+    cache = ResultCache(str(tmp_path / "cache"))
+
+    for text in ("1\n2\nx\n300\n", "1\n2\n-7\n300\n40000\n"):
+        write_old(input_name, text)
+        for _ in range(2):
+            counts = convert_file(str(input_name), str(cached_name), 16, echo="none",
+                                  result_cache=cache)
+        expected = convert_file(str(input_name), str(fresh_name), 16, echo="none")
+        for result in (counts, expected):
+            del result['elapsed_time']
+        assert counts == expected
+        # The elapsed time on the last line differs.
+        assert (cached_name.read_text(encoding="utf-8").splitlines()[:-1]
+                == fresh_name.read_text(encoding="utf-8").splitlines()[:-1])
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    input_name = tmp_path / "words.txt"
+    write_old(input_name, "a\n")
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=100)
+    keys = [cache.key("count", str(input_name), {'top': top}) for top in range(3)]
+    for timestamp, key in enumerate(keys):
+        cache.put(key, "x" * 30, str(input_name))
+        os.utime(cache._entry_path(key, "json"),  # pylint: disable=protected-access
+                 (OLD_TIME + timestamp, OLD_TIME + timestamp))
+    cache.put(cache.key("count", str(input_name), {'top': 3}), "x" * 30, str(input_name))
+    assert cache.evictions == 2
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) == "x" * 30
@@ -0,0 +1,57 @@
+"""
+Tests of RollingStatistics against a recomputation of the whole window.
+"""
+import math
+import os
+import random
+import statistics
+import sys
+from collections import Counter
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from rolling_statistics import RollingStatistics
+
+
+def brute_force(window):
+    counts = Counter(window)
+    highest = max(counts.values())
+    return {
+        'count': len(window),
+        'mean': statistics.fmean(window),
+        'median': statistics.median(window),
+        'mode': max(value for value, count in counts.items() if count == highest),
+        'standard_deviation': statistics.pstdev(window),
+        'variance': statistics.variance(window) if len(window) > 1 else 0.0,
+    }
+
+
+@pytest.mark.parametrize("integers", [True, False])
+def test_rolling_statistics_match_brute_force(integers):
+    generator = random.Random(1)
+    for _ in range(100):
+        window_size = generator.randint(1, 60)
+        rolling = RollingStatistics(window_size)
+        values = []
+        for _ in range(30):
+            batch = [generator.randint(0, 9) if integers else generator.gauss(1e6, 1)
+                     for _ in range(generator.randint(0, 80))]
+            rolling.extend(batch)
+            values += batch
+            if not values or generator.random() < 0.3:
+                continue
+            expected = brute_force(values[-window_size:])
+            result = rolling.statistics()
+            assert result['count'] == expected['count']
+            assert result['median'] == expected['median']
+            assert result['mode'] == expected['mode']
+            for key in ('mean', 'standard_deviation', 'variance'):
+                assert math.isclose(result[key], expected[key], rel_tol=1e-9, abs_tol=1e-6)
+
+
+def test_window_size_must_be_positive():
+    with pytest.raises(ValueError):
+        RollingStatistics(0)
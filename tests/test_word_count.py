@@ -0,0 +1,79 @@
+"""
+Tests that the simple and fast tokenizers of word_count.py give the same counts.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from word_count import incremental_count, process_file
+
+TEXT = (
+    "The cat and THE hat. The (cat) sat: on the mat!\n"
+    "\"Quoted\", [bracketed] {braced} words; what? ... -- ()\n"
+    "Ünïcödé ÜNÏCÖDÉ straße STRASSE café Café, naïve. ÉCOLE école\n"
+    "日本語 テキスト 日本語! emoji 🙂 🙂, Ωmega ΩMEGA İstanbul\n"
+    "non breaking　ideographic spaces\ttabs\r\nend\x0bof\x0cline\n"
+) * 7 + "last word without a newline"
+
+BLOCK_SIZES = [1, 7, 64, 1 << 20]
+
+
+@pytest.fixture(name="text_file")
+def fixture_text_file(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_bytes(TEXT.encode("utf-8"))
+    return str(path)
+
+
+@pytest.mark.parametrize("block_size", BLOCK_SIZES)
+@pytest.mark.parametrize("workers", [1, 3])
+def test_fast_tokenizer_matches_simple(text_file, block_size, workers):
+    expected = list(process_file(text_file, tokenizer="simple").items())
+    simple = process_file(text_file, workers, "simple", block_size=block_size)
+    fast = process_file(text_file, workers, "fast", block_size=block_size)
+    assert list(simple.items()) == expected
+    assert list(fast.items()) == expected
+
+
+def test_simple_tokenizer_counts(text_file):
+    counts = process_file(text_file, tokenizer="simple")
+    assert counts["the"] == 4 * 7
+    assert counts["cat"] == 2 * 7
+    assert counts["ünïcödé"] == 2 * 7
+    assert counts["日本語"] == 2 * 7
+    assert counts["breaking"] == 7
+    assert counts[""] == 2 * 7
+    assert counts["newline"] == 1
+
+
+def test_incremental_count_matches_full_count_after_append(tmp_path):
+    path = tmp_path / "log.txt"
+    index = str(tmp_path / "index.sqlite")
+    path.write_text("the cat and the hat\n" * 1000 + "unfinished")
+    incremental_count(str(path), index)
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("word sat on the mat\n" * 10)
+    counts = incremental_count(str(path), index)
+    assert list(counts.items()) == list(process_file(str(path)).items())
+
+
+def test_incremental_count_recounts_rewrite_in_the_middle(tmp_path, capsys):
+    path = tmp_path / "log.txt"
+    index = str(tmp_path / "index.sqlite")
+    text = bytearray(b"alpha beta gamma delta\n" * 20000)
+    path.write_bytes(bytes(text))
+    incremental_count(str(path), index)
+
+    # Same size, one word changed far from both ends of the file
+    middle = text.index(b"beta", len(text) // 2)
+    text[middle:middle + 4] = b"BETO"
+    path.write_bytes(bytes(text))
+    capsys.readouterr()
+    counts = incremental_count(str(path), index)
+    assert "recounting" in capsys.readouterr().out
+    assert counts["beto"] == 1
+    assert list(counts.items()) == list(process_file(str(path)).items())
@@ -11,50 +11,428 @@ Requirements:
 - The execution time, including the calculation time, is displayed at the end.
 
 Usage:
-python convertNumbers.py fileWithData.txt
+python wordCount.py fileWithData.txt
+python wordCount.py fileWithData.txt --workers 4
+python wordCount.py fileWithData.txt --tokenizer fast
+python wordCount.py fileWithData.txt --top 100
+python wordCount.py fileWithData.txt --top 100 --approximate
+python wordCount.py fileWithData.txt --index counts.sqlite
+python wordCount.py fileWithData.txt --store compact
+python wordCount.py fileWithData.txt --metrics metrics.json --profile run.prof
+python wordCount.py fileWithData.txt --cache-dir ~/.cache/wordcount
+
+With --top K only the K most frequent words are printed and saved; they are selected with a
+heap instead of sorting the whole dictionary. With --approximate the words are not kept in
+a dictionary at all: a Count-Min sketch (frequency_sketch.CountMinTopK) with fixed memory
+estimates the counts, which never undercount and overcount by at most e / width * N with
+probability 1 - exp(-depth), where N is the number of words.
+
+With --index the counts of an append-only file are kept in a SQLite index together with the
+offset processed so far and a hash of all the bytes before it, and later runs only count
+the bytes appended since then. If the file was rewritten or truncated it is recounted from the start.
+
+With --cache-dir the results file is kept in a result cache (see result_cache.py), and a
+later run with the same options on the unchanged file restores it without counting again.
 """
-import time
-import sys
+import argparse
+import hashlib
+import heapq
+import math
+import os
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from frequency_sketch import CountMinTopK
+from input_reader import (ASCII_WHITESPACE, BLOCK_SIZE, compression_of, iter_blocks,
+                          iter_whitespace_blocks, last_boundary, split_ranges)
+from instrumentation import Metrics, add_arguments, measure, profiling
+from result_cache import add_arguments as add_cache_arguments, open_cache
+from word_store import CompactWordStore
+
+# Bytes read at a time while hashing the processed part of the file for its fingerprint
+FINGERPRINT_BLOCK_SIZE = 1 << 20
+
+# Characters removed from both ends of every word
+PUNCTUATION = '.,!?()[]{}":;'
+
+# Translation table that folds ASCII uppercase letters to lowercase
+ASCII_LOWERCASE_TABLE = bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+                                        b"abcdefghijklmnopqrstuvwxyz")
 
-def process_file(file_path):
+def count_block_fast(block, word_count_dictionary):
     """
-    Process the file and get word frequencies
+    Count the words of a block of bytes with the fast tokenizer
+
+    ASCII blocks are case folded with one translate call and every block is
+    split once; the raw tokens are counted by Counter in C. Punctuation
+    stripping, decoding and lowercasing then run once per distinct token
+    instead of once per occurrence, so the counts and their order of first
+    appearance are the same as with the simple tokenizer.
+
+    :param block: Bytes that start and end on word boundaries
+    :param word_count_dictionary: Dictionary of word frequencies, updated in place
+    """
+    if block.isascii():
+        block = block.translate(ASCII_LOWERCASE_TABLE)
+    for raw_token, count in Counter(block.split()).items():
+        # str.split also splits on non-ASCII whitespace
+        for dirty_word in raw_token.decode('utf-8').split():
+            clean_word = dirty_word.strip(PUNCTUATION).lower()
+            word_count_dictionary[clean_word] = word_count_dictionary.get(clean_word, 0) + count
+
+def count_range(file_path, start=0, end=None, tokenizer="simple", store="dict",
+                metrics=None, block_size=BLOCK_SIZE):
+    """
+    Count the words of a byte range of the file
 
     :param file_path: Path to the file to process
-    :return: Dictionary of word frequencies
+    :param start: Byte offset where counting starts, it must be a word boundary
+    :param end: Byte offset where counting stops, the end of the file by default
+    :param tokenizer: 'simple' cleans every word, 'fast' uses count_block_fast
+    :param store: 'dict' or 'compact' to use a CompactWordStore; with the
+                  compact store every block is counted in a small dict first
+                  and then added to the store once per distinct word
+    :param metrics: Optional Metrics object that receives the read, parse and
+                    compute times of every block; the fast tokenizer parses
+                    and counts in one step, reported as compute
+    :param block_size: Approximate size of the blocks read from the file
+    :return: Dictionary of word frequencies in order of first appearance
     """
     # Dictionary to store word frequencies
-    word_count_dictionary = {}
+    word_count_dictionary = CompactWordStore() if store == "compact" else {}
 
-    try:
-        # Open file and iterate through lines
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                # Split line into words
-                words = line.split()
+    # Iterate through memory-mapped blocks that never split a word
+    blocks = iter_whitespace_blocks(file_path, block_size, start, end)
+    if metrics is not None:
+        blocks = metrics.timed(blocks, "read")
+    for block in blocks:
+        block_counts = {} if store == "compact" else word_count_dictionary
+        if tokenizer == "fast":
+            with measure(metrics, "compute"):
+                count_block_fast(block, block_counts)
+        else:
+            # Split block into words
+            with measure(metrics, "parse"):
+                words = block.decode('utf-8').split()
+            with measure(metrics, "compute"):
                 for dirty_word in words:
                     # Clean up word (remove punctuation and convert to lowercase)
-                    clean_word = dirty_word.strip('.,!?()[]{}":;')
+                    clean_word = dirty_word.strip(PUNCTUATION)
                     clean_word = clean_word.lower()
 
                     # Update word count
-                    word_count_dictionary[clean_word] = word_count_dictionary.get(clean_word, 0) + 1
+                    block_counts[clean_word] = block_counts.get(clean_word, 0) + 1
+
+        if store == "compact":
+            with measure(metrics, "compute"):
+                for word, count in block_counts.items():
+                    word_count_dictionary.add(word, count)
+
+    return word_count_dictionary
+
+def count_range_task(task):
+    """
+    Worker function of the process pool
+
+    :param task: Tuple (file_path, start, end, tokenizer, store, metrics, block_size)
+    :return: Dictionary of word frequencies of the range
+    """
+    return count_range(*task)
+
+def merge_counts(left, right):
+    """
+    Merge two dictionaries of word frequencies
+
+    :param left: Dictionary of the earlier part of the file, updated in place
+    :param right: Dictionary of the later part of the file
+    :return: The merged dictionary, which keeps the order of first appearance
+    """
+    for word, count in right.items():
+        left[word] = left.get(word, 0) + count
+    return left
+
+def tree_reduce(dictionaries):
+    """
+    Merge a list of dictionaries of word frequencies pairwise, level by level
+
+    :param dictionaries: Dictionaries in file order
+    :return: The merged dictionary
+    """
+    if not dictionaries:
+        return {}
+    while len(dictionaries) > 1:
+        merged = [merge_counts(dictionaries[index], dictionaries[index + 1])
+                  for index in range(0, len(dictionaries) - 1, 2)]
+        if len(dictionaries) % 2:
+            merged.append(dictionaries[-1])
+        dictionaries = merged
+    return dictionaries[0]
+
+def process_file(file_path, workers=1, tokenizer="simple", store="dict", metrics=None,
+                 block_size=BLOCK_SIZE):
+    """
+    Process the file and get word frequencies
+
+    :param file_path: Path to the file to process
+    :param workers: Number of processes; with more than one the file is split
+                    in byte ranges on whitespace that are counted in parallel
+    :param tokenizer: 'simple' or 'fast', both give the same counts
+    :param store: 'dict' or 'compact' to keep the counts in a CompactWordStore,
+                  which needs much less memory for large vocabularies
+    :param metrics: Optional Metrics object; with several workers the whole
+                    parallel count is reported as compute
+    :param block_size: Approximate size of the blocks read from the file
+    :return: Dictionary of word frequencies
+    """
+    try:
+        if workers <= 1:
+            return count_range(file_path, tokenizer=tokenizer, store=store, metrics=metrics,
+                               block_size=block_size)
+
+        tasks = [(file_path, start, end, tokenizer, store, None, block_size)
+                 for start, end in split_ranges(file_path, workers, ASCII_WHITESPACE)]
+        with measure(metrics, "compute"), ProcessPoolExecutor(max_workers=workers) as executor:
+            return tree_reduce(list(executor.map(count_range_task, tasks)))
 
     except FileNotFoundError:
         # Handle file not found error
         print(f"Error: File '{file_path}' not found.")
         return None
 
-    return word_count_dictionary
+def select_top(word_count_dictionary, top):
+    """
+    Select the most frequent words with a heap
+
+    :param word_count_dictionary: Dictionary of word frequencies
+    :param top: Number of words to select
+    :return: Dictionary with the top words, most frequent first; ties keep the
+             order of first appearance
+    """
+    return dict(heapq.nlargest(top, word_count_dictionary.items(), key=lambda item: item[1]))
+
+def sketch_range(file_path, start=0, end=None, top=10, width=2 ** 16, depth=4):
+    """
+    Estimate the most frequent words of a byte range of the file with fixed memory
+
+    Every block is counted exactly with the fast tokenizer and then added to
+    the sketch, so memory is bounded by the block size and the sketch size.
+
+    :param file_path: Path to the file to process
+    :param start: Byte offset where counting starts, it must be a word boundary
+    :param end: Byte offset where counting stops, the end of the file by default
+    :param top: Number of words to keep
+    :param width: Counters per row of the sketch
+    :param depth: Rows of the sketch
+    :return: CountMinTopK sketch of the range
+    """
+    sketch = CountMinTopK(top, width, depth)
+    for block in iter_whitespace_blocks(file_path, start=start, end=end):
+        block_counts = {}
+        count_block_fast(block, block_counts)
+        for word, count in block_counts.items():
+            sketch.add(word, count)
+    return sketch
+
+def sketch_range_task(task):
+    """
+    Worker function of the process pool in approximate mode
+
+    :param task: Tuple (file_path, start, end, top, width, depth)
+    :return: CountMinTopK sketch of the range
+    """
+    return sketch_range(*task)
 
-def save_results(word_count_dictionary, elpsed_time):
+def approximate_top_words(file_path, top, workers=1, width=2 ** 16, depth=4):
+    """
+    Estimate the most frequent words of the file with a Count-Min sketch
+
+    :param file_path: Path to the file to process
+    :param top: Number of words to report
+    :param workers: Number of processes; their sketches are merged
+    :param width: Counters per row of the sketch
+    :param depth: Rows of the sketch
+    :return: Tuple (dictionary of estimated frequencies, error bound) or None
+             if the file is not found
+    """
+    try:
+        if workers <= 1:
+            sketch = sketch_range(file_path, top=top, width=width, depth=depth)
+        else:
+            tasks = [(file_path, start, end, top, width, depth)
+                     for start, end in split_ranges(file_path, workers, ASCII_WHITESPACE)]
+            sketch = CountMinTopK(top, width, depth)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for range_sketch in executor.map(sketch_range_task, tasks):
+                    sketch.merge(range_sketch)
+    except FileNotFoundError:
+        # Handle file not found error
+        print(f"Error: File '{file_path}' not found.")
+        return None
+
+    return dict(sketch.top_k()), sketch.error_bound()
+
+def update_fingerprint(digest, file_path, start, end):
+    """
+    Add a byte range of the file to a fingerprint
+
+    The whole processed part of the file is hashed, so a rewrite anywhere in
+    it is detected; hashing it is much cheaper than tokenizing it again.
+
+    :param digest: BLAKE2b object updated in place
+    :param file_path: Path to the file
+    :param start: Byte offset where hashing starts
+    :param end: Byte offset where hashing stops
+    :return: The digest object
+    """
+    for block in iter_blocks(file_path, FINGERPRINT_BLOCK_SIZE, start, end):
+        digest.update(block)
+    return digest
+
+def incremental_count(file_path, index_path, tokenizer="simple"):
+    """
+    Count the words of an append-only file using a persistent SQLite index
+
+    The index stores the counts of the file up to the last word boundary seen,
+    that offset and a BLAKE2b fingerprint of all the bytes before it. Only the
+    bytes after the offset are counted and added to the index; an unfinished
+    word at the end of the file is counted for this run but left out of the
+    index.
+
+    :param file_path: Path to the file to process
+    :param index_path: Path to the SQLite index, created if it does not exist
+    :param tokenizer: 'simple' or 'fast'
+    :return: Dictionary of word frequencies or None if the file is not found
+    """
+    try:
+        size = os.path.getsize(file_path)
+        if compression_of(file_path):
+            print("Warning: Compressed files cannot be counted incrementally, "
+                  "counting the whole file.")
+            return count_range(file_path, tokenizer=tokenizer)
+    except FileNotFoundError:
+        # Handle file not found error
+        print(f"Error: File '{file_path}' not found.")
+        return None
+
+    connection = sqlite3.connect(index_path)
+    try:
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS state "
+                               "(id INTEGER PRIMARY KEY CHECK (id = 0), "
+                               "offset INTEGER NOT NULL, fingerprint TEXT NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS words "
+                               "(word TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+            state = connection.execute("SELECT offset, fingerprint FROM state").fetchone()
+
+            offset = 0
+            digest = hashlib.blake2b(digest_size=16)
+            if state is not None:
+                offset, fingerprint = state
+                if (offset > size or fingerprint != update_fingerprint(
+                        digest, file_path, 0, offset).hexdigest()):
+                    print("Warning: The file was rewritten or truncated, recounting it.")
+                    connection.execute("DELETE FROM words")
+                    offset = 0
+                    digest = hashlib.blake2b(digest_size=16)
+
+            boundary = last_boundary(file_path, offset, size)
+            new_counts = count_range(file_path, offset, boundary, tokenizer)
+            # Existing words keep their row, so ORDER BY rowid is the order of
+            # first appearance
+            connection.executemany(
+                "INSERT INTO words (word, count) VALUES (?, ?) "
+                "ON CONFLICT (word) DO UPDATE SET count = count + excluded.count",
+                new_counts.items())
+            # The digest of the verified prefix is extended with the new bytes
+            connection.execute(
+                "INSERT OR REPLACE INTO state VALUES (0, ?, ?)",
+                (boundary, update_fingerprint(digest, file_path, offset, boundary).hexdigest()))
+
+            word_count_dictionary = dict(
+                connection.execute("SELECT word, count FROM words ORDER BY rowid"))
+    finally:
+        connection.close()
+
+    print(f"Counted {boundary - offset} new bytes, {offset} bytes came from the index.")
+    return merge_counts(word_count_dictionary,
+                        count_range(file_path, boundary, size, tokenizer))
+
+def count_words(file_path, workers=1, tokenizer="simple", top=None, approximate=False,
+                sketch_width=2 ** 16, sketch_depth=4, index_path=None, store="dict",
+                metrics=None):
+    """
+    Count the words of a file with the options of the command line
+
+    :param file_path: Path to the file to be processed
+    :param workers: Number of processes
+    :param tokenizer: 'simple' or 'fast'
+    :param top: Only keep the top most frequent words
+    :param approximate: Estimate the top words with a Count-Min sketch (requires top)
+    :param sketch_width: Counters per row of the sketch
+    :param sketch_depth: Rows of the sketch
+    :param index_path: SQLite index used to count only the appended bytes
+    :param store: 'dict' or 'compact'
+    :param metrics: Optional Metrics object that receives the stage timings and
+                    the number of words counted
+    :return: Dictionary of word frequencies, or None if the file cannot be read
+    """
+    if approximate:
+        with measure(metrics, "compute"):
+            approximate_result = approximate_top_words(file_path, top, workers,
+                                                       sketch_width, sketch_depth)
+        if approximate_result is None:
+            return None
+        word_count, error_bound = approximate_result
+        print(f"Approximate counts, overcount of at most {error_bound:.1f} "
+              f"with probability {1 - math.exp(-sketch_depth):.4f}")
+        return word_count
+
+    if index_path:
+        with measure(metrics, "compute"):
+            word_count = incremental_count(file_path, index_path, tokenizer)
+    else:
+        word_count = process_file(file_path, workers, tokenizer, store, metrics)
+        if word_count is not None and metrics is not None:
+            metrics.count("rows", sum(word_count.values()))
+    if word_count is not None and top:
+        with measure(metrics, "compute"):
+            word_count = select_top(word_count, top)
+    return word_count
+
+def result_cache_key(result_cache, file_path, top=None, approximate=False,
+                     sketch_width=2 ** 16, sketch_depth=4, workers=1):
+    """
+    Get the result cache key of the counts of a file
+
+    Only the options that change the counts are part of the key: the
+    tokenizer and the store give the same counts, and the exact counts do not
+    depend on the number of workers. The merged sketches of the approximate
+    mode do, so the workers are only kept with approximate.
+
+    :param result_cache: ResultCache where the key is looked up
+    :param file_path: Path to the file to be processed
+    :param top: Only keep the top most frequent words
+    :param approximate: Estimate the top words with a Count-Min sketch
+    :param sketch_width: Counters per row of the sketch
+    :param sketch_depth: Rows of the sketch
+    :param workers: Number of processes
+    :return: Hexadecimal key, or None if the file cannot be cached
+    """
+    options = {'top': top}
+    if approximate:
+        options.update(sketch_width=sketch_width, sketch_depth=sketch_depth,
+                       workers=max(workers, 1))
+    return result_cache.key("wordcount", file_path, options)
+
+def save_results(word_count_dictionary, elpsed_time, result_file_path='WordCountResults.txt'):
     """
     Save the word frequencies to a file and print elapsed time
 
     :param word_count: Dictionary of word frequencies
     :param elapsed_time: Elapsed time for execution
+    :param result_file_path: Path to the results file
     """
-    result_file_path = 'WordCountResults.txt'
 
     # Open result file and write word frequencies
     with open(result_file_path, 'w', encoding='utf-8') as result_file:
@@ -67,27 +445,102 @@ def save_results(word_count_dictionary, elpsed_time):
     # Print message about results file
     print(f"Results saved to {result_file_path}")
 
+def print_saved_results(result_file_path='WordCountResults.txt'):
+    """
+    Print the word frequencies of a results file, as they are printed when counted
+
+    :param result_file_path: Path to a file written by save_results
+    """
+    with open(result_file_path, 'r', encoding='utf-8') as result_file:
+        text = result_file.read()
+    # The file ends with a blank line and the elapsed time of the run that wrote it
+    print(text[:text.rfind("\nElapsed Time:")], end="")
+    print(f"Results saved to {result_file_path}")
+
 if __name__ == "__main__":
-    # Check for the correct number of command line arguments
-    if len(sys.argv) != 2:
-        print("Usage: python wordCount.py fileWithData.txt")
-        sys.exit(1)
+    # Parse the command line arguments
+    parser = argparse.ArgumentParser(
+        prog="wordCount.py", description="Count the distinct words of a file.")
+    parser.add_argument("input_file", help="Text file to process.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of processes used to count the file (default 1).")
+    parser.add_argument("--tokenizer", choices=["simple", "fast"], default="simple",
+                        help="Clean every word (simple) or count raw tokens per block "
+                             "first (fast); both give the same counts.")
+    parser.add_argument("--top", type=int, metavar="K",
+                        help="Only print and save the K most frequent words.")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Estimate the top words with a fixed memory Count-Min sketch "
+                             "(requires --top).")
+    parser.add_argument("--sketch-width", type=int, default=2 ** 16,
+                        help="Counters per row of the sketch (default 65536).")
+    parser.add_argument("--sketch-depth", type=int, default=4,
+                        help="Rows of the sketch (default 4).")
+    parser.add_argument("--index", metavar="INDEX_FILE",
+                        help="SQLite index used to only count the bytes appended since the "
+                             "previous run.")
+    parser.add_argument("--store", choices=["dict", "compact"], default="dict",
+                        help="Keep the counts in a dict or in a compact arena-backed store "
+                             "that uses much less memory per distinct word.")
+    add_arguments(parser)
+    add_cache_arguments(parser)
+    arguments = parser.parse_args()
+    for name in ("top", "sketch_width", "sketch_depth"):
+        if getattr(arguments, name) is not None and getattr(arguments, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+    if arguments.approximate and not arguments.top:
+        parser.error("--approximate requires --top")
 
     # Record start time for execution duration
-    start_time = time.time()
-    INPUT_FILE = sys.argv[1]
+    run_metrics = Metrics("wordcount", arguments.input_file)
+
+    # The incremental index already avoids counting the file again
+    result_cache = None if arguments.index else open_cache(arguments)
+
+    with profiling(arguments.profile, arguments.trace_memory, run_metrics):
+        cache_key = None
+        if result_cache is not None:
+            with run_metrics.stage("read"):
+                cache_key = result_cache_key(result_cache, arguments.input_file,
+                                             arguments.top, arguments.approximate,
+                                             arguments.sketch_width, arguments.sketch_depth,
+                                             arguments.workers)
+
+        if cache_key and result_cache.get(cache_key, 'WordCountResults.txt') is not None:
+            # Print the stored results without counting the file
+            with run_metrics.stage("write"):
+                print_saved_results()
+            run_metrics.finish()
+            print(f"\nElapsed Time: {run_metrics.elapsed_seconds():.5f} seconds")
+        else:
+            # Process the file and get word frequencies
+            word_count = count_words(arguments.input_file, arguments.workers,
+                                     arguments.tokenizer, arguments.top, arguments.approximate,
+                                     arguments.sketch_width, arguments.sketch_depth,
+                                     arguments.index, arguments.store, run_metrics)
+
+            if word_count is not None:
+                run_metrics.count("bytes", os.path.getsize(arguments.input_file))
+
+                # Calculate elapsed time
+                elapsed_time = run_metrics.elapsed_seconds()
 
-    # Process the file and get word frequencies
-    word_count = process_file(INPUT_FILE)
+                with run_metrics.stage("write"):
+                    # Print results on the screen
+                    for word, count in word_count.items():
+                        print(f"{word}: {count}")
 
-    if word_count is not None:
-        # Calculate elapsed time
-        elapsed_time = time.time() - start_time
+                    # Save results to a file
+                    save_results(word_count, elapsed_time)
+                    if cache_key:
+                        result_cache.put(cache_key, {'distinct_words': len(word_count)},
+                                         arguments.input_file, 'WordCountResults.txt')
+                run_metrics.finish()
+                print(f"\nElapsed Time: {elapsed_time:.5f} seconds")
 
-        # Print results on the screen
-        for word, count in word_count.items():
-            print(f"{word}: {count}")
+        if result_cache is not None:
+            result_cache.record(run_metrics)
+            print(result_cache.statistics())
 
-        # Save results to a file
-        save_results(word_count, elapsed_time)
-        print(f"\nElapsed Time: {elapsed_time:.5f} seconds")
+    if arguments.metrics:
+        run_metrics.save(arguments.metrics)
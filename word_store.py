@@ -0,0 +1,136 @@
+"""
+word_store.py - Compact word frequency store used by word_count.py for very large
+vocabularies.
+
+A dict keeps one str object, one int object and one hash table entry per distinct word,
+which costs more than 100 bytes per word. CompactWordStore interns the UTF-8 bytes of the
+words into a single contiguous bytearray and keeps the offsets, lengths, hashes and counts
+in typed arrays, with an open-addressing (linear probing) index of 32-bit entry numbers.
+Only the bytes of the words plus 32 to 40 bytes per word are needed.
+
+It behaves like a read-only mapping of words to counts that also supports item assignment
+and add(), which is everything word_count needs from its dictionary. Words keep the order
+in which they were first added. The hash is CRC-32, so stores can be pickled between
+processes.
+"""
+from array import array
+from collections.abc import Mapping
+from zlib import crc32
+
+# Maximum ratio between entries and index slots before the index grows.
+MAX_LOAD_FACTOR = 0.5
+
+
+class CompactWordStore(Mapping):
+    """
+    Word to count mapping backed by a bytes arena and typed arrays.
+
+     :param capacity: Initial number of index slots, rounded up to a power of two.
+    """
+
+    def __init__(self, capacity=1024):
+        size = 1
+        while size < capacity:
+            size *= 2
+        self._arena = bytearray()
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._hashes = array("I")
+        self._counts = array("Q")
+        self._slots = array("i", [-1]) * size
+        self._mask = size - 1
+
+    def _find(self, key, key_hash):
+        """
+        Returns (slot, entry) for an encoded word; entry is -1 and slot is the
+        free slot where it would be inserted if the word is not stored.
+        """
+        slot = key_hash & self._mask
+        while True:
+            entry = self._slots[slot]
+            if entry < 0:
+                return slot, -1
+            if self._hashes[entry] == key_hash:
+                offset = self._offsets[entry]
+                if self._arena[offset:offset + self._lengths[entry]] == key:
+                    return slot, entry
+            slot = (slot + 1) & self._mask
+
+    def _grow(self):
+        size = 2 * len(self._slots)
+        self._slots = array("i", [-1]) * size
+        self._mask = size - 1
+        for entry, key_hash in enumerate(self._hashes):
+            slot = key_hash & self._mask
+            while self._slots[slot] >= 0:
+                slot = (slot + 1) & self._mask
+            self._slots[slot] = entry
+
+    def _insert(self, slot, key, key_hash, count):
+        entry = len(self._counts)
+        self._offsets.append(len(self._arena))
+        self._lengths.append(len(key))
+        self._hashes.append(key_hash)
+        self._counts.append(count)
+        self._arena += key
+        self._slots[slot] = entry
+        if len(self._counts) > MAX_LOAD_FACTOR * len(self._slots):
+            self._grow()
+
+    def add(self, word, count=1):
+        """
+        Adds occurrences of a word.
+
+         :param word: Word to add.
+         :param count: Number of occurrences.
+        """
+        key = word.encode("utf-8")
+        key_hash = crc32(key)
+        slot, entry = self._find(key, key_hash)
+        if entry >= 0:
+            self._counts[entry] += count
+        else:
+            self._insert(slot, key, key_hash, count)
+
+    def __setitem__(self, word, count):
+        key = word.encode("utf-8")
+        key_hash = crc32(key)
+        slot, entry = self._find(key, key_hash)
+        if entry >= 0:
+            self._counts[entry] = count
+        else:
+            self._insert(slot, key, key_hash, count)
+
+    def __getitem__(self, word):
+        key = word.encode("utf-8")
+        entry = self._find(key, crc32(key))[1]
+        if entry < 0:
+            raise KeyError(word)
+        return self._counts[entry]
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _word(self, entry):
+        offset = self._offsets[entry]
+        return self._arena[offset:offset + self._lengths[entry]].decode("utf-8")
+
+    def __iter__(self):
+        for entry in range(len(self._counts)):
+            yield self._word(entry)
+
+    def items(self):
+        """
+        Iterates over the (word, count) pairs in order of first appearance.
+        """
+        for entry, count in enumerate(self._counts):
+            yield self._word(entry), count
+
+    def memory_usage(self):
+        """
+        Returns the number of bytes used by the arena, the arrays and the index.
+        """
+        return (len(self._arena)
+                + sum(values.itemsize * len(values)
+                      for values in (self._offsets, self._lengths, self._hashes,
+                                     self._counts, self._slots)))